@@ -0,0 +1,114 @@
+import threading
+import time
+
+# ==========================
+# ACCOUNT SNAPSHOT CACHE
+# ==========================
+#
+# Balances are fetched once per tick and every consumer in that tick
+# (run_bot, can_buy_eth, place_sell_order, send_performance_update) reads the
+# same snapshot. Orders and fill events invalidate it so the next read
+# refreshes. If a refresh fails, the last good snapshot is served for the
+# rest of the tick (only the very first fetch can raise).
+#
+#   ACCOUNT.begin_tick()       -> start of a loop iteration
+#   ACCOUNT.balance("ETH")     -> cached read (refreshes if invalid)
+#   ACCOUNT.invalidate()       -> after place_buy_order / place_sell_order
+
+
+class AccountState:
+    def __init__(self, fetch_balances, max_age=None):
+        # fetch_balances() -> {"USD": 50.0, "ETH": 0.05, ...}
+        # max_age: also refresh when the snapshot is older than this (seconds)
+        self.fetch_balances = fetch_balances
+        self.max_age = max_age
+
+        self._lock = threading.Lock()
+        self._balances = None      # current snapshot, None once invalidated
+        self._last_good = None     # survives invalidation, for failed refreshes
+        self._fetched_at = 0.0
+
+        self.hits = 0
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.total_refresh_time = 0.0
+        self.max_refresh_time = 0.0
+
+    def begin_tick(self):
+        self.invalidate()
+
+    def invalidate(self):
+        with self._lock:
+            self._balances = None
+
+    def on_fill(self, *_):
+        # Hook for order/fill events
+        self.invalidate()
+
+    def snapshot(self):
+        with self._lock:
+            if self._balances is not None and (
+                self.max_age is None or time.monotonic() - self._fetched_at <= self.max_age
+            ):
+                self.hits += 1
+                return self._balances
+
+            start = time.perf_counter()
+            try:
+                balances = dict(self.fetch_balances())
+            except Exception:
+                self.refresh_errors += 1
+                if self._last_good is not None:
+                    # Serve the last good snapshot rather than fail the tick
+                    self._balances = self._last_good
+                    return self._balances
+                raise
+            elapsed = time.perf_counter() - start
+
+            self.refreshes += 1
+            self.total_refresh_time += elapsed
+            if elapsed > self.max_refresh_time:
+                self.max_refresh_time = elapsed
+
+            self._balances = self._last_good = balances
+            self._fetched_at = time.monotonic()
+            return balances
+
+    def balance(self, currency):
+        return float(self.snapshot().get(currency, 0.0))
+
+    def stats(self):
+        with self._lock:
+            reads = self.hits + self.refreshes
+            return {
+                "hits": self.hits,
+                "refreshes": self.refreshes,
+                "refresh_errors": self.refresh_errors,
+                "hit_rate": self.hits / reads if reads else 0.0,
+                "avg_refresh_ms": (self.total_refresh_time / self.refreshes * 1000) if self.refreshes else 0.0,
+                "max_refresh_ms": self.max_refresh_time * 1000,
+            }
+
+
+def coinbase_balances(client, call=None):
+    # Balance fetcher for a coinbase RESTClient: available balance per
+    # currency, following the accounts cursor. `call` lets the caller route
+    # through TRANSPORT.call.
+    call = call or (lambda fn, **kwargs: fn(**kwargs))
+    balances = {}
+    cursor = None
+
+    while True:
+        kwargs = {"limit": 250}
+        if cursor:
+            kwargs["cursor"] = cursor
+        resp = call(client.get_accounts, **kwargs)
+
+        for account in resp.accounts:
+            available = account.available_balance
+            value = available["value"] if isinstance(available, dict) else available.value
+            balances[account.currency] = balances.get(account.currency, 0.0) + float(value)
+
+        if not getattr(resp, "has_next", False):
+            return balances
+        cursor = resp.cursor
@@ -0,0 +1,330 @@
+import argparse
+import os
+from collections import Counter
+
+import numpy as np
+
+from indicators import ema_batch
+from strategy import (
+    BUY_SIZE_PARAMS,
+    UnifiedVarianceEngine,
+    check_buy,
+    get_adaptive_buy_size,
+    risk_kwargs,
+)
+
+# ==========================
+# BACKTEST DEFAULTS (mirror eth_bot_backup.py)
+# ==========================
+
+WINDOW = 20
+BUY_COOLDOWN_SECONDS = 180
+VARIANCE_DROP_REQUIRED = 0.005
+START_USD = 50.00
+START_BASE = 0.0
+
+TIME_COLUMNS = ("timestamp", "time", "ts", "start")
+PRICE_COLUMNS = ("close", "price", "amount")
+
+
+# ==========================
+# DATA LOADING
+# ==========================
+
+def _pick(names, candidates, what, path):
+    lowered = {n.lower(): n for n in names}
+    for c in candidates:
+        if c in lowered:
+            return lowered[c]
+    raise ValueError(f"{path}: no {what} column (looked for {', '.join(candidates)})")
+
+
+def _normalize(timestamps, prices):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Millisecond epochs -> seconds
+    if len(timestamps) and np.nanmedian(timestamps) > 1e11:
+        timestamps = timestamps / 1000.0
+
+    keep = np.isfinite(prices) & np.isfinite(timestamps)
+    timestamps, prices = timestamps[keep], prices[keep]
+
+    if len(timestamps) > 1 and np.any(np.diff(timestamps) < 0):
+        order = np.argsort(timestamps, kind="stable")
+        timestamps, prices = timestamps[order], prices[order]
+
+    return timestamps, prices
+
+
+def load_ticks(path):
+    # Returns (timestamps, prices) as float64 arrays, sorted by time.
+    #   .csv      header row with a time column and close/price column
+    #   .parquet  same columns (needs pyarrow)
+    #   .npz      arrays named like the CSV columns
+    #   .npy      1-D prices, or 2-D [timestamp, price] rows
+    #   .ticks    one day of the tick journal
+    ext = os.path.splitext(path)[1].lower()
+
+    if ext == ".npy":
+        arr = np.load(path, mmap_mode="r")
+        if arr.ndim == 1:
+            return _normalize(np.arange(len(arr), dtype=np.float64), arr)
+        return _normalize(arr[:, 0], arr[:, 1])
+
+    if ext == ".ticks":
+        # Tick journal file (see journal.py)
+        from journal import read_journal
+        records = read_journal(path)
+        return _normalize(records["time"], records["price"])
+
+    if ext == ".npz":
+        with np.load(path) as data:
+            t = _pick(data.files, TIME_COLUMNS, "time", path)
+            p = _pick(data.files, PRICE_COLUMNS, "price", path)
+            return _normalize(data[t], data[p])
+
+    if ext == ".parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Reading parquet files requires pyarrow (pip install pyarrow)")
+        names = pq.read_schema(path).names
+        t = _pick(names, TIME_COLUMNS, "time", path)
+        p = _pick(names, PRICE_COLUMNS, "price", path)
+        table = pq.read_table(path, columns=[t, p])
+        return _normalize(table.column(t).to_numpy(), table.column(p).to_numpy())
+
+    if ext == ".csv":
+        with open(path) as f:
+            names = [n.strip() for n in f.readline().split(",")]
+        t = names.index(_pick(names, TIME_COLUMNS, "time", path))
+        p = names.index(_pick(names, PRICE_COLUMNS, "price", path))
+        data = np.loadtxt(path, delimiter=",", skiprows=1, usecols=(t, p), ndmin=2)
+        return _normalize(data[:, 0], data[:, 1])
+
+    raise ValueError(f"Unsupported data file: {path}")
+
+
+# ==========================
+# BACKTEST
+# ==========================
+
+def run_backtest(
+    timestamps,
+    prices,
+    engine_params=None,
+    window=WINDOW,
+    usd_balance=START_USD,
+    base_balance=START_BASE,
+    cooldown_seconds=BUY_COOLDOWN_SECONDS,
+    variance_drop_required=VARIANCE_DROP_REQUIRED,
+    fee_rate=0.0,
+    risk_params=None,
+    variance=None,
+):
+    # risk_params: overrides for the get_adaptive_* constants (see strategy.py)
+    # variance: precomputed ema_batch variance for `window`, so callers that
+    # replay the same prices many times (sweeps) only compute it once
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    engine = UnifiedVarianceEngine(**(engine_params or {}))
+    size_kwargs = risk_kwargs(risk_params, BUY_SIZE_PARAMS)
+
+    # --- VECTORIZED: EMA, variance, engine thresholds ---
+    if variance is None:
+        _, variance, _ = ema_batch(prices, window)
+    start = window - 1
+    ts = timestamps[start:]
+    px = prices[start:]
+    var = variance[start:]
+
+    buy_base, sell_th = engine.threshold_series(var)
+
+    lo, hi = engine.buy_clamp_min, engine.buy_clamp_max
+    # Exposure is in [0, 1], so the live buy threshold lies between the
+    # clamped base and the clamped 2x base. Ticks outside both signal bands
+    # can never trade and are skipped without touching the stateful loop.
+    buy_bound = np.maximum(
+        np.maximum(lo, np.minimum(buy_base, hi)),
+        np.maximum(lo, np.minimum(buy_base * 2, hi)),
+    )
+    buy_bound[:2] = buy_base[:2]
+    candidates = np.flatnonzero((var <= buy_bound) | (var >= sell_th))
+
+    # --- STATEFUL: protection rules, sizing, fills ---
+    usd = float(usd_balance)
+    base = float(base_balance)
+    cost_basis = 0.0
+    last_buy_time = 0
+    last_buy_price = None
+    recent_wins = recent_losses = total_wins = total_losses = 0
+    realized_pnl = 0.0
+    blocked = Counter()
+    trades = []
+
+    for i in candidates.tolist():
+        price = px[i]
+        v = var[i]
+        base_value = base * price
+        total_equity = usd + base_value
+        exposure_pct = base_value / total_equity if total_equity > 0 else 0.0
+
+        if i < 2:
+            buy_var = buy_base[i]
+        else:
+            buy_var = buy_base[i] * (1 + exposure_pct)
+            buy_var = max(lo, min(buy_var, hi))
+
+        if v <= buy_var:
+            allowed, reason = check_buy(
+                price,
+                usd_balance=usd,
+                base_balance=base,
+                now=ts[i],
+                last_buy_time=last_buy_time,
+                last_buy_price=last_buy_price,
+                cooldown_seconds=cooldown_seconds,
+                variance_drop_required=variance_drop_required,
+                risk_params=risk_params,
+            )
+            if not allowed:
+                blocked[reason] += 1
+                continue
+
+            size_usd = min(get_adaptive_buy_size(total_equity, v, recent_wins, recent_losses, **size_kwargs), usd)
+            if size_usd <= 0:
+                blocked["No USD"] += 1
+                continue
+
+            qty = size_usd * (1 - fee_rate) / price
+            usd -= size_usd
+            base += qty
+            cost_basis += size_usd
+            last_buy_time = ts[i]
+            last_buy_price = price
+            trades.append({"index": start + i, "time": ts[i], "side": "BUY", "price": price,
+                           "usd": size_usd, "qty": qty, "pnl": 0.0})
+
+        elif v >= sell_th[i] and base > 0:
+            proceeds = base * price * (1 - fee_rate)
+            pnl = proceeds - cost_basis
+            realized_pnl += pnl
+            trades.append({"index": start + i, "time": ts[i], "side": "SELL", "price": price,
+                           "usd": proceeds, "qty": base, "pnl": pnl})
+            usd += proceeds
+            base = 0.0
+            cost_basis = 0.0
+
+            # Same W/L bookkeeping as record_sell()
+            if last_buy_price is not None:
+                if price - last_buy_price > 0:
+                    recent_wins += 1
+                    total_wins += 1
+                else:
+                    recent_losses += 1
+                    total_losses += 1
+                last_buy_price = None
+
+    # --- VECTORIZED: equity curve and drawdown ---
+    trade_idx = np.array([t["index"] - start for t in trades], dtype=np.int64)
+    usd_after = np.empty(len(trades))
+    base_after = np.empty(len(trades))
+    u, b = float(usd_balance), float(base_balance)
+    for j, t in enumerate(trades):
+        if t["side"] == "BUY":
+            u -= t["usd"]
+            b += t["qty"]
+        else:
+            u += t["usd"]
+            b = 0.0
+        usd_after[j] = u
+        base_after[j] = b
+
+    pos = np.searchsorted(trade_idx, np.arange(len(px)), side="right") - 1
+    has_trade = pos >= 0
+    usd_curve = np.where(has_trade, usd_after[pos.clip(0)] if len(trades) else 0.0, usd_balance)
+    base_curve = np.where(has_trade, base_after[pos.clip(0)] if len(trades) else 0.0, base_balance)
+    equity = usd_curve + base_curve * px
+
+    if len(equity):
+        peak = np.maximum.accumulate(equity)
+        max_drawdown = float(np.max((peak - equity) / np.where(peak > 0, peak, 1.0)))
+        start_equity = float(usd_balance + base_balance * px[0])
+        final_equity = float(equity[-1])
+    else:
+        max_drawdown = 0.0
+        start_equity = final_equity = float(usd_balance)
+
+    total_trades = total_wins + total_losses
+
+    return {
+        "ticks": len(prices),
+        "trades": trades,
+        "buys": sum(1 for t in trades if t["side"] == "BUY"),
+        "sells": sum(1 for t in trades if t["side"] == "SELL"),
+        "blocked": dict(blocked),
+        "realized_pnl": realized_pnl,
+        "start_equity": start_equity,
+        "final_equity": final_equity,
+        "pnl": final_equity - start_equity,
+        "max_drawdown": max_drawdown,
+        "wins": total_wins,
+        "losses": total_losses,
+        "win_rate": (total_wins / total_trades * 100) if total_trades > 0 else 0.0,
+        "equity": equity,
+    }
+
+
+def format_report(result):
+    lines = [
+        "📊 **Backtest Report**",
+        f"Ticks: {result['ticks']}",
+        f"Trades: {len(result['trades'])} ({result['buys']} buys / {result['sells']} sells)",
+        f"Equity: ${result['start_equity']:.2f} -> **${result['final_equity']:.2f}**",
+        f"PnL: ${result['pnl']:.2f} (realized ${result['realized_pnl']:.2f})",
+        f"Max Drawdown: {result['max_drawdown'] * 100:.2f}%",
+        f"Wins: {result['wins']} | Losses: {result['losses']}",
+        f"Win Rate: **{result['win_rate']:.1f}%**",
+    ]
+    for reason, count in sorted(result["blocked"].items()):
+        lines.append(f"BUY blocked ({reason}): {count}")
+    return "\n".join(lines)
+
+
+# ==========================
+# CLI
+# ==========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay tick/OHLCV files through the EMA + UnifiedVarianceEngine strategy.")
+    parser.add_argument("path", help="CSV, Parquet, .npy, .npz or .ticks price file")
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--usd", type=float, default=START_USD)
+    parser.add_argument("--base", type=float, default=START_BASE)
+    parser.add_argument("--cooldown", type=float, default=BUY_COOLDOWN_SECONDS)
+    parser.add_argument("--drop", type=float, default=VARIANCE_DROP_REQUIRED)
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--trades", action="store_true", help="print every trade")
+    args = parser.parse_args(argv)
+
+    timestamps, prices = load_ticks(args.path)
+    result = run_backtest(
+        timestamps,
+        prices,
+        window=args.window,
+        usd_balance=args.usd,
+        base_balance=args.base,
+        cooldown_seconds=args.cooldown,
+        variance_drop_required=args.drop,
+        fee_rate=args.fee,
+    )
+
+    if args.trades:
+        for t in result["trades"]:
+            print(f"{t['time']:.0f} {t['side']:<4} {t['qty']:.6f} @ {t['price']:.4f} | ${t['usd']:.2f} | PnL {t['pnl']:.2f}")
+    print(format_report(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+import threading
+import time
+
+import numpy as np
+
+# ==========================
+# STREAMING OHLCV BARS
+# ==========================
+#
+# BarBuilder turns the tick stream into OHLCV bars for several timeframes at
+# once, so the EMA / UnifiedVarianceEngine can step once per fixed-length
+# bar instead of once per poll (whose spacing changes with SLEEP_TIME and
+# the scheduler). Bars are aligned to UTC multiples of the timeframe, like
+# exchange candles.
+#
+# Each (product, timeframe) keeps its closed bars in a preallocated ring
+# buffer (BAR_DTYPE, `capacity` rows); a tick only updates the open bar's
+# scalars. A bar closes when the first tick of a later bar arrives or when
+# roll() passes its end. Periods without ticks become flat bars at the last
+# close (volume 0), so one bar is always one timeframe of wall time.
+#
+# The ticker channel carries no trade size, so volume is only filled by
+# on_trade(size=...); `ticks` counts updates per bar.
+#
+#   BARS = BarBuilder(["ETH-USD"], timeframes=(15, 60, 300))
+#   FEED.add_listener(BARS.on_price)
+#   bars, cursor = BARS.since("ETH-USD", 60, cursor)   # newly closed 1m bars
+#   ema_batch(BARS.closes("ETH-USD", 60), 20)           # any closes consumer
+
+TIMEFRAMES = (15, 60, 300)
+
+BAR_DTYPE = np.dtype([
+    ("start", "<f8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("ticks", "<u4"),
+])
+
+
+class BarSeries:
+    # One product/timeframe; not thread-safe on its own (BarBuilder locks)
+    def __init__(self, timeframe, capacity=1000):
+        self.timeframe = timeframe
+        self.capacity = capacity
+        self._bars = np.zeros(capacity, dtype=BAR_DTYPE)
+        self._pos = 0              # next ring slot
+        self.count = 0             # bars closed so far (cursor for since())
+
+        self._open = False
+        self._start = self._o = self._h = self._l = self._c = self._v = 0.0
+        self._n = 0
+        self._next = None          # start of the next bar to close
+        self._last_close = None
+
+        self.late = 0              # ticks for an already closed bar (dropped)
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    # --------------------------
+    # Writes
+    # --------------------------
+
+    def update(self, t, price, size=0.0):
+        # Returns the number of bars this tick closed
+        start = t - t % self.timeframe
+        closed = 0
+        if self._open and start != self._start:
+            if start < self._start:
+                self.late += 1
+                return 0
+            closed += self._close()
+        if not self._open:
+            if self._next is not None and start < self._next:
+                self.late += 1
+                return closed
+            closed += self._fill(start)
+            self._open = True
+            self._start = start
+            self._o = self._h = self._l = price
+            self._v = 0.0
+            self._n = 0
+        elif price > self._h:
+            self._h = price
+        elif price < self._l:
+            self._l = price
+        self._c = price
+        self._v += size
+        self._n += 1
+        return closed
+
+    def roll(self, now):
+        # Closes the open bar and any silent bars that ended before `now`
+        start = now - now % self.timeframe
+        closed = 0
+        if self._open and start > self._start:
+            closed += self._close()
+        if not self._open:
+            closed += self._fill(start)
+        return closed
+
+    def seed(self, candles):
+        # Oldest-first candle dicts (candles.fetch_candles) of this timeframe
+        for c in candles:
+            if self._next is not None and c["start"] < self._next:
+                continue
+            self._fill(c["start"])
+            self._push(c["start"], c["open"], c["high"], c["low"], c["close"], c["volume"], 0)
+
+    def _close(self):
+        self._open = False
+        self._push(self._start, self._o, self._h, self._l, self._c, self._v, self._n)
+        return 1
+
+    def _fill(self, start):
+        # Flat bars for the silent periods between the last bar and `start`
+        if self._next is None or start <= self._next:
+            return 0
+        missing = int(round((start - self._next) / self.timeframe))
+        skipped = max(0, missing - self.capacity)      # would be overwritten anyway
+        self.count += skipped
+        c = self._last_close
+        for k in range(skipped, missing):
+            self._push(self._next + k * self.timeframe, c, c, c, c, 0.0, 0, advance=False)
+        self._next = start
+        return missing
+
+    def _push(self, start, o, h, l, c, v, n, advance=True):
+        self._bars[self._pos] = (start, o, h, l, c, v, n)
+        self._pos = (self._pos + 1) % self.capacity
+        self.count += 1
+        self._last_close = c
+        if advance:
+            self._next = start + self.timeframe
+
+    # --------------------------
+    # Reads
+    # --------------------------
+
+    def bars(self, n=None):
+        # Last n closed bars, oldest first (copy)
+        n = len(self) if n is None else min(n, len(self))
+        if n <= 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        first = (self._pos - n) % self.capacity
+        if first + n <= self.capacity:
+            return self._bars[first:first + n].copy()
+        return np.concatenate((self._bars[first:], self._bars[:self._pos]))
+
+    def closes(self, n=None):
+        return self.bars(n)["close"]
+
+    def since(self, cursor):
+        # (bars closed after `cursor`, new cursor); bars already overwritten
+        # in the ring are lost, the cursor still moves past them
+        return self.bars(self.count - cursor), self.count
+
+    def current(self):
+        if not self._open:
+            return None
+        return {"start": self._start, "open": self._o, "high": self._h, "low": self._l,
+                "close": self._c, "volume": self._v, "ticks": self._n}
+
+    def next_close(self):
+        # End time of the bar being built (None before the first tick)
+        if self._open:
+            return self._start + self.timeframe
+        return self._next + self.timeframe if self._next is not None else None
+
+
+class BarBuilder:
+    def __init__(self, product_ids, timeframes=TIMEFRAMES, capacity=1000, clock=time):
+        self.timeframes = tuple(sorted(timeframes))
+        self.capacity = capacity
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._series = {}
+        for product_id in product_ids:
+            self._add(product_id)
+
+        self.ticks = 0
+
+    # --------------------------
+    # Tick side
+    # --------------------------
+
+    def on_price(self, product_id, price):
+        # TickerFeed listener (feed thread)
+        self.on_trade(product_id, price)
+
+    def on_trade(self, product_id, price, size=0.0, t=None):
+        t = self.clock.time() if t is None else t
+        with self._lock:
+            series = self._series.get(product_id) or self._add(product_id)
+            for s in series.values():
+                s.update(t, price, size)
+            self.ticks += 1
+
+    def roll(self, now=None):
+        # Close bars whose time is up even if no tick arrived
+        now = self.clock.time() if now is None else now
+        with self._lock:
+            for series in self._series.values():
+                for s in series.values():
+                    s.roll(now)
+
+    def seed(self, product_id, timeframe, candles):
+        with self._lock:
+            self._get(product_id, timeframe).seed(candles)
+
+    # --------------------------
+    # Consumer side
+    # --------------------------
+
+    def since(self, product_id, timeframe, cursor):
+        with self._lock:
+            return self._get(product_id, timeframe).since(cursor)
+
+    def bars(self, product_id, timeframe, n=None):
+        with self._lock:
+            return self._get(product_id, timeframe).bars(n)
+
+    def closes(self, product_id, timeframe, n=None):
+        with self._lock:
+            return self._get(product_id, timeframe).closes(n)
+
+    def cursor(self, product_id, timeframe):
+        # Start a since() cursor at "now": only bars closed from here on
+        with self._lock:
+            return self._get(product_id, timeframe).count
+
+    def next_close(self, product_id, timeframe):
+        with self._lock:
+            return self._get(product_id, timeframe).next_close()
+
+    def current(self, product_id, timeframe):
+        with self._lock:
+            return self._get(product_id, timeframe).current()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ticks": self.ticks,
+                "bars": {
+                    product_id: {tf: {"closed": s.count, "late": s.late} for tf, s in series.items()}
+                    for product_id, series in self._series.items()
+                },
+            }
+
+    # --------------------------
+    # Internals (caller holds the lock)
+    # --------------------------
+
+    def _add(self, product_id):
+        series = self._series[product_id] = {tf: BarSeries(tf, self.capacity) for tf in self.timeframes}
+        return series
+
+    def _get(self, product_id, timeframe):
+        series = self._series.get(product_id) or self._add(product_id)
+        s = series.get(timeframe)
+        if s is None:
+            raise KeyError(f"No {timeframe}s bars (timeframes: {self.timeframes})")
+        return s
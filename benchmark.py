@@ -0,0 +1,358 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import timeit
+from contextlib import contextmanager
+
+import numpy as np
+
+# ==========================
+# BENCHMARKS + REGRESSION GATE
+# ==========================
+#
+# Times the strategy hot path and compares it against a stored baseline:
+#
+#   micro   ema_batch, EMAState.update, UnifiedVarianceEngine.update,
+#           can_buy_eth, get_adaptive_buy_size (per call)
+#   macro   one run_bot iteration against the in-process fake exchange
+#           (replay.py stand-ins), end-to-end replay throughput, vectorized
+#           backtest throughput (per tick)
+#
+# Every benchmark is run `repeat` times (timeit, auto-ranged to at least
+# min_time per repeat). A benchmark whose median and best time per op are
+# both more than `threshold` slower than its baseline is a regression and
+# makes the run exit non-zero.
+#
+#   python benchmark.py --save            # record benchmark_baseline.json
+#   python benchmark.py                   # compare, exit 1 on regressions
+#   python benchmark.py -k engine -k ema  # only names containing these
+#
+# Baselines are only meaningful on the machine that recorded them; the
+# report warns when the recorded machine differs.
+
+BASELINE_PATH = "benchmark_baseline.json"
+THRESHOLD = 0.10
+SEED = 7
+
+
+def _prices(n, seed=SEED, s0=2000.0, sigma=0.003):
+    rng = np.random.default_rng(seed)
+    return s0 * np.exp(np.cumsum(rng.normal(0, sigma, n)))
+
+
+@contextmanager
+def patched(module, **overrides):
+    # Swap module globals for the duration of a benchmark (like replay())
+    saved = {name: getattr(module, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(module, name, value)
+
+
+# --------------------------
+# Micro benchmarks
+# --------------------------
+# Each is a context manager yielding (fn, ops): fn() does `ops` operations.
+
+@contextmanager
+def bench_ema_batch():
+    from indicators import ema_batch
+    prices = _prices(100)                   # BOOTSTRAP_CANDLES closes
+    yield (lambda: ema_batch(prices, 20)), 1
+
+
+@contextmanager
+def bench_ema_state():
+    from indicators import EMAState
+    prices = _prices(1000).tolist()
+
+    def run():
+        state = EMAState(20)
+        for p in prices:
+            state.update(p)
+    yield run, len(prices)
+
+
+@contextmanager
+def bench_engine_update():
+    from indicators import ema_batch
+    from strategy import UnifiedVarianceEngine
+    _, variance, _ = ema_batch(_prices(1200), 20)
+    variance = variance[19:].tolist()
+    engine = UnifiedVarianceEngine()
+    for v in variance[:200]:                # full window: steady-state cost
+        engine.update(v, 0.2)
+    warm = engine.get_state()
+    ticks = variance[200:]
+
+    def run():
+        engine.set_state(warm)
+        for v in ticks:
+            engine.update(v, 0.2)
+    yield run, len(ticks)
+
+
+@contextmanager
+def bench_can_buy_eth():
+    import eth_bot_backup as bot
+    from account import AccountState
+    account = AccountState(lambda: {"USD": 50.0, "ETH": 0.004})
+    prices = _prices(1000).tolist()
+
+    def run():
+        for p in prices:
+            account.begin_tick()
+            bot.can_buy_eth(p)
+    with patched(bot, ACCOUNT=account, last_buy_time=0, last_buy_price=2010.0):
+        yield run, len(prices)
+
+
+@contextmanager
+def bench_buy_size():
+    from strategy import get_adaptive_buy_size
+    rng = np.random.default_rng(SEED)
+    variance = rng.normal(0, 0.01, 1000).tolist()
+
+    def run():
+        for v in variance:
+            get_adaptive_buy_size(60.0, v, 2, 1)
+    yield run, len(variance)
+
+
+# --------------------------
+# Macro benchmarks
+# --------------------------
+
+@contextmanager
+def bench_run_bot_iteration():
+    # run_bot over 15 s ticks: one evaluation per new tick (bar the EMA
+    # warm-up), so time per decision is the cost of one loop iteration with
+    # all I/O faked
+    from replay import replay
+    prices = _prices(2000)
+    timestamps = 1.7e9 + np.arange(len(prices)) * 15.0
+    decisions = len(replay(timestamps, prices)["decisions"])
+    yield (lambda: replay(timestamps, prices)), decisions
+
+
+@contextmanager
+def bench_replay_throughput():
+    # 1 s ticks: the scheduler evaluates every 2-15 s of ticks (about 7 ticks
+    # per evaluation on this series), so this is dominated by the waits
+    from replay import replay
+    prices = _prices(20000, sigma=0.0008)
+    timestamps = 1.7e9 + np.arange(len(prices)) * 1.0
+    yield (lambda: replay(timestamps, prices)), len(prices)
+
+
+@contextmanager
+def bench_backtest_throughput():
+    from backtest import run_backtest
+    prices = _prices(200000)
+    timestamps = 1.7e9 + np.arange(len(prices)) * 15.0
+    yield (lambda: run_backtest(timestamps, prices)), len(prices)
+
+
+BENCHMARKS = {
+    "ema_batch": ("micro", "call", bench_ema_batch),
+    "ema_state.update": ("micro", "tick", bench_ema_state),
+    "engine.update": ("micro", "tick", bench_engine_update),
+    "can_buy_eth": ("micro", "call", bench_can_buy_eth),
+    "get_adaptive_buy_size": ("micro", "call", bench_buy_size),
+    "run_bot.iteration": ("macro", "iteration", bench_run_bot_iteration),
+    "replay.throughput": ("macro", "tick", bench_replay_throughput),
+    "backtest.throughput": ("macro", "tick", bench_backtest_throughput),
+}
+
+
+# --------------------------
+# Measurement
+# --------------------------
+
+def measure(fn, ops=1, repeat=7, min_time=0.2):
+    # Seconds per op: median, min and relative IQR over `repeat` runs
+    timer = timeit.Timer(fn)
+    number, _ = _autorange(timer, min_time)
+    runs = sorted(t / number / ops for t in timer.repeat(repeat, number))
+    median = statistics.median(runs)
+    q1, _, q3 = statistics.quantiles(runs, n=4) if len(runs) > 1 else (runs[0], None, runs[0])
+    return {
+        "median": median,
+        "min": runs[0],
+        "spread": (q3 - q1) / median if median > 0 else 0.0,
+        "ops_per_sec": 1 / median if median > 0 else float("inf"),
+        "loops": number,
+        "ops": ops,
+    }
+
+
+def _autorange(timer, min_time):
+    # Loops per repeat so one repeat takes at least min_time (also warms up)
+    number = 1
+    while True:
+        elapsed = timer.timeit(number)
+        if elapsed >= min_time:
+            return number, elapsed
+        number *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed) + 1)
+
+
+def run_benchmarks(names=None, repeat=7, min_time=0.2, echo=True):
+    results = {}
+    for name, (group, unit, setup) in BENCHMARKS.items():
+        if names is not None and name not in names:
+            continue
+        with setup() as (fn, ops):
+            result = measure(fn, ops, repeat=repeat, min_time=min_time)
+        result.update(group=group, unit=unit)
+        results[name] = result
+        if echo:
+            print(f"  {name:<24} {_fmt_time(result['median'])}/{unit}", file=sys.stderr)
+    return results
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# --------------------------
+# Baselines and comparison
+# --------------------------
+
+def save_baseline(results, path=BASELINE_PATH):
+    data = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "machine": machine(),
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # One row per benchmark: status is "regression", "faster", "ok" or "new"
+    old = (baseline or {}).get("results", {})
+    rows = []
+    for name, result in results.items():
+        base = old.get(name)
+        if base is None:
+            rows.append({"name": name, "result": result, "baseline": None, "change": None, "status": "new"})
+            continue
+        change = result["median"] / base["median"] - 1 if base["median"] > 0 else 0.0
+        best = result["min"] / base["min"] - 1 if base.get("min", 0) > 0 else change
+        # The best run must be slower too, so one noisy repeat can't fail the gate
+        if change > threshold and best > threshold:
+            status = "regression"
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = "ok"
+        rows.append({"name": name, "result": result, "baseline": base, "change": change, "status": status})
+    return rows
+
+
+def _fmt_time(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def _fmt_rate(ops_per_sec):
+    if ops_per_sec >= 1e6:
+        return f"{ops_per_sec / 1e6:.2f}M/s"
+    if ops_per_sec >= 1e3:
+        return f"{ops_per_sec / 1e3:.1f}k/s"
+    return f"{ops_per_sec:.1f}/s"
+
+
+def format_report(rows, baseline=None, threshold=THRESHOLD):
+    lines = []
+    if baseline is not None:
+        if baseline.get("machine") != machine():
+            lines.append(f"WARNING: baseline recorded on a different machine ({baseline.get('machine')})")
+        lines.append(f"Baseline: {baseline.get('created')}  threshold: {threshold:.0%}")
+    else:
+        lines.append("No baseline (run with --save to record one)")
+
+    lines.append(f"{'benchmark':<24} {'median':>18} {'rate':>10} {'spread':>7} {'baseline':>12} {'change':>8}  status")
+    for row in rows:
+        r, base = row["result"], row["baseline"]
+        median = f"{_fmt_time(r['median'])}/{r['unit']}"
+        baseline_cell = _fmt_time(base["median"]) if base else "-"
+        change = f"{row['change']:+.1%}" if row["change"] is not None else "-"
+        status = row["status"].upper() if row["status"] == "regression" else row["status"]
+        lines.append(
+            f"{row['name']:<24} {median:>18} {_fmt_rate(r['ops_per_sec']):>10} {r['spread']:>7.1%} "
+            f"{baseline_cell:>12} {change:>8}  {status}"
+        )
+
+    regressions = [row["name"] for row in rows if row["status"] == "regression"]
+    lines.append(f"Regressions: {', '.join(regressions)}" if regressions else "Regressions: none")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the strategy hot path and flag regressions against a baseline.")
+    parser.add_argument("-k", dest="filters", action="append", help="only benchmarks whose name contains this (repeatable)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="slowdown that counts as a regression (0.10 = 10%%)")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per repeat")
+    parser.add_argument("--json", help="also write this run's results here")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, (group, unit, _) in BENCHMARKS.items():
+            print(f"{name:<24} {group:<6} per {unit}")
+        return 0
+
+    names = None
+    if args.filters:
+        names = [n for n in BENCHMARKS if any(f in n for f in args.filters)]
+        if not names:
+            parser.error(f"no benchmark matches {args.filters}")
+
+    results = run_benchmarks(names, repeat=args.repeat, min_time=args.min_time)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": machine(), "results": results}, f, indent=2, sort_keys=True)
+
+    baseline = load_baseline(args.baseline)
+    rows = compare(results, baseline, args.threshold)
+    print(format_report(rows, baseline, args.threshold))
+
+    if args.save:
+        # Keep baselines of benchmarks that were filtered out of this run
+        merged = dict((baseline or {}).get("results", {}), **results)
+        save_baseline(merged, args.baseline)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    return 1 if any(row["status"] == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
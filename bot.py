@@ -1,6 +1,10 @@
 import time
-import requests
 from coinbase.rest import RESTClient
+from indicators import EMAState
+from market_data import TickerFeed
+from notifier import DiscordNotifier
+from orders import OrderTracker
+from transport import COINBASE_HOST, TRANSPORT
 
 # ==========================
 # DISCORD WEBHOOKS
@@ -10,11 +14,14 @@ LOGS_WEBHOOK = "https://discord.com/api/webhooks/1468048482219724810/05HmuArCRBE
 ALERTS_WEBHOOK = "https://discord.com/api/webhooks/1468048658262917130/zBtIfCvLFMD_0XluEgI4FDDROvN8lKr1yc1VnAY19vhU7HIBWbnGoz56wEsVppyTcUyr"
 TEST_WEBHOOK = "https://discord.com/api/webhooks/1468048857567989833/DQo2L_lRXTUeHhT0nLl0dUooNTLtqnJnnru7Qh0EIL10YxDOdkhbh3IbMY0XRRmHsIDE"
 
+NOTIFIER = DiscordNotifier(
+    priority_webhooks=[ALERTS_WEBHOOK],
+    digest_webhooks=[LOGS_WEBHOOK],
+)
+
 def send_discord(webhook, message):
-    try:
-        requests.post(webhook, json={"content": message})
-    except Exception as e:
-        print(f"[DISCORD ERROR] {e}")
+    # Non-blocking: the notifier thread does the HTTP post
+    NOTIFIER.send(webhook, message)
 
 # ==========================
 # CONFIGURATION
@@ -36,7 +43,7 @@ API_SECRET =
 
 """
 
-client = RESTClient(api_key=API_KEY, api_secret=API_SECRET)
+client = TRANSPORT.attach(RESTClient(api_key=API_KEY, api_secret=API_SECRET))
 
 # ==========================
 # HYBRID PROTECTION SETTINGS
@@ -54,10 +61,11 @@ last_buy_price = None
 # PRICE FETCHING
 # ==========================
 
+FEED = TickerFeed([ASSET])
+
 def get_current_price():
-    url = f"https://api.coinbase.com/v2/prices/{ASSET}/spot"
-    r = requests.get(url).json()
-    return float(r["data"]["amount"])
+    # Latest streamed ticker; falls back to the REST spot price when stale
+    return FEED.get_price(ASSET)
 
 # ==========================
 # BALANCE FETCHING (STUBS)
@@ -73,15 +81,16 @@ def get_xrp_balance():
 # OPEN ORDER CHECKING
 # ==========================
 
+# Seeded once, then kept current in the background (see orders.py)
+ORDERS = OrderTracker(
+    client,
+    product_ids=[ASSET],
+    call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs),
+    on_error=lambda e: send_discord(ALERTS_WEBHOOK, f"[ERROR] Could not fetch open orders: {e}"),
+)
+
 def get_open_orders():
-    try:
-        resp = client.list_orders(product_id=ASSET)
-        orders = resp.orders
-        watched = {"OPEN", "PENDING", "PARTIALLY_FILLED"}
-        return [o for o in orders if o.status in watched]
-    except Exception as e:
-        send_discord(ALERTS_WEBHOOK, f"[ERROR] Could not fetch open orders: {e}")
-        return []
+    return ORDERS.open_orders(ASSET)
 
 # ==========================
 # HYBRID PROTECTION LOGIC
@@ -115,22 +124,6 @@ def record_buy(price):
     last_buy_time = time.time()
     last_buy_price = price
 
-# ==========================
-# EMA CALCULATION
-# ==========================
-
-def calculate_ema(prices, window=20):
-    if len(prices) < window:
-        return None
-
-    k = 2 / (window + 1)
-    ema = prices[0]
-
-    for price in prices[1:]:
-        ema = (price * k) + (ema * (1 - k))
-
-    return ema
-
 # ==========================
 # ORDER EXECUTION
 # ==========================
@@ -162,7 +155,7 @@ def place_sell_order(price):
 # ==========================
 
 def run_bot():
-    prices = []
+    ema_state = EMAState(WINDOW)
 
     header = (
         "Starting EMA-Variance Trading Bot...\n"
@@ -177,11 +170,11 @@ def run_bot():
     print(header)
     send_discord(LOGS_WEBHOOK, "Bot started successfully.")
 
+    ORDERS.start()
+
     while True:
         try:
-            open_orders = get_open_orders()
-
-            if open_orders:
+            if ORDERS.has_open_orders(ASSET):
                 msg = "[WAIT] Unprocessed orders detected. Bot pausing."
                 print(msg)
                 send_discord(LOGS_WEBHOOK, msg)
@@ -189,12 +182,7 @@ def run_bot():
                 continue
 
             current_price = get_current_price()
-            prices.append(current_price)
-
-            if len(prices) > WINDOW:
-                prices.pop(0)
-
-            ema = calculate_ema(prices, WINDOW)
+            ema = ema_state.update(current_price)
 
             if ema is None:
                 print("Collecting data for EMA...")
@@ -0,0 +1,102 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from transport import TRANSPORT
+
+# ==========================
+# HISTORICAL CANDLE BOOTSTRAP
+# ==========================
+#
+# Pulls recent candles in bulk at startup so EMAState and the
+# UnifiedVarianceEngine variance window are warm before the first live tick.
+# Pages (max 350 candles each) are fetched concurrently, and several assets
+# are bootstrapped in parallel.
+
+CANDLES_URL = "https://api.coinbase.com/api/v3/brokerage/market/products/{product_id}/candles"
+MAX_CANDLES_PER_REQUEST = 350
+
+GRANULARITY_SECONDS = {
+    "ONE_MINUTE": 60,
+    "FIVE_MINUTE": 300,
+    "FIFTEEN_MINUTE": 900,
+    "THIRTY_MINUTE": 1800,
+    "ONE_HOUR": 3600,
+    "TWO_HOUR": 7200,
+    "SIX_HOUR": 21600,
+    "ONE_DAY": 86400,
+}
+
+
+def _fetch_page(url, start, end, granularity, transport):
+    r = transport.get(
+        url,
+        endpoint="price",
+        params={"start": str(start), "end": str(end), "granularity": granularity},
+    )
+    r.raise_for_status()
+    return r.json().get("candles", [])
+
+
+def fetch_candles(product_id, count, granularity="ONE_MINUTE", end=None, base_url=None, transport=None, workers=4):
+    # Returns up to `count` closed candles, oldest first, as dicts with float
+    # start/open/high/low/close/volume. The candle containing `end` is still
+    # in progress and is left out.
+    transport = transport or TRANSPORT
+    step = GRANULARITY_SECONDS[granularity]
+    url = (base_url or CANDLES_URL).format(product_id=product_id)
+
+    end = int(end if end is not None else time.time()) // step * step
+    start = end - count * step
+
+    pages = []
+    page_end = end
+    while page_end > start:
+        page_start = max(start, page_end - MAX_CANDLES_PER_REQUEST * step)
+        # Both bounds are inclusive on the exchange side
+        pages.append((page_start, page_end - step))
+        page_end = page_start
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(pages)) or 1) as pool:
+        results = pool.map(lambda p: _fetch_page(url, p[0], p[1], granularity, transport), pages)
+        raw = [c for page in results for c in page]
+
+    candles = {}
+    for c in raw:
+        ts = float(c["start"])
+        if ts >= end:
+            continue
+        candles[ts] = {
+            "start": ts,
+            "open": float(c["open"]),
+            "high": float(c["high"]),
+            "low": float(c["low"]),
+            "close": float(c["close"]),
+            "volume": float(c["volume"]),
+        }
+    return [candles[ts] for ts in sorted(candles)][-count:]
+
+
+def bootstrap(product_ids, count, granularity="ONE_MINUTE", end=None, base_url=None, transport=None):
+    # {product_id: candles} for several assets, fetched concurrently.
+    # A failing asset maps to [] so the caller can fall back to live warm-up.
+    def one(product_id):
+        try:
+            return fetch_candles(product_id, count, granularity, end=end, base_url=base_url, transport=transport)
+        except Exception as e:
+            print(f"[BOOTSTRAP ERROR] {product_id}: {e}")
+            return []
+
+    product_ids = list(product_ids)
+    with ThreadPoolExecutor(max_workers=max(1, len(product_ids))) as pool:
+        return dict(zip(product_ids, pool.map(one, product_ids)))
+
+
+def warm_up(ema_state, engine, closes):
+    # Replays closes through the EMA and (once it is ready) the engine, the
+    # same way the live loop would. Exposure only scales the returned
+    # thresholds, not engine state, so 0.0 is used.
+    for price in closes:
+        ema = ema_state.update(price)
+        if ema is not None and engine is not None:
+            engine.update(current_variance=(price - ema) / ema, current_exposure_pct=0.0)
+    return ema_state.ready
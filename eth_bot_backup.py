@@ -1,8 +1,39 @@
 import time
-import requests
-from collections import deque
 from coinbase.rest import RESTClient
-import uuid
+from account import AccountState, coinbase_balances
+from bars import BarBuilder
+from candles import GRANULARITY_SECONDS, bootstrap, warm_up
+from execution import REJECTED, SUBMITTED, ExecutionEngine, OrderIds
+from indicators import EMAState
+from jsonlog import JsonLog
+from journal import (
+    DECISION_BUY,
+    DECISION_BUY_BLOCKED,
+    DECISION_NONE,
+    DECISION_SELL,
+    TickJournal,
+)
+from market_data import TickerFeed
+from metrics import METRICS
+from notifier import DiscordNotifier
+from orders import OrderTracker
+from price_aggregator import PriceAggregator, default_sources
+from reoptimizer import ReOptimizer
+from risk import PortfolioRisk
+from scheduler import EventScheduler
+from state_store import StateStore
+from strategy import (
+    UnifiedVarianceEngine,
+    check_buy,
+    get_adaptive_buffer,
+    get_adaptive_buy_size,
+    get_adaptive_buy_threshold,
+    get_adaptive_cooldown,
+    get_adaptive_exposure,
+    get_adaptive_sell_threshold,
+    get_adaptive_variance,
+)
+from transport import COINBASE_HOST, TRANSPORT
 
 # -----------------------------------
 # Global State Variables
@@ -24,11 +55,25 @@ LOGS_WEBHOOK = "https://discord.com/api/webhooks/1468763706790904043/xzz6sf444VJ
 ALERTS_WEBHOOK = "https://discord.com/api/webhooks/1468763873371750484/PrO5AkeJ9Eu4PhY_68zmkkgaFKiaPORg7misrXx-16vkXdcjrciEcR0AIWU_Qjb5KL3z"
 
 
+NOTIFIER = DiscordNotifier(
+    priority_webhooks=[ALERTS_WEBHOOK],
+    digest_webhooks=[LOGS_WEBHOOK],
+)
+
 def send_discord(webhook, message):
-    try:
-        requests.post(webhook, json={"content": message})
-    except Exception as e:
-        print(f"[DISCORD ERROR] {e}")
+    # Non-blocking: the notifier thread does the HTTP post
+    with METRICS.stage("discord_enqueue"):
+        NOTIFIER.send(webhook, message)
+
+
+def log(message, webhook=None, event="log", level="info", **fields):
+    # Enqueues a JSON line for the log writer thread (which also echoes it to
+    # stdout) and optionally posts to Discord. Sampled-out ticks skip both.
+    with METRICS.stage("log_enqueue"):
+        kept = LOG.log(event, message, level=level, **fields)
+    if kept and webhook is not None:
+        send_discord(webhook, message)
+    return kept
 
 
 
@@ -39,7 +84,7 @@ def send_discord(webhook, message):
 API_KEY = ""
 API_SECRET = ""
 
-client = RESTClient(api_key=API_KEY, api_secret=API_SECRET)
+client = TRANSPORT.attach(RESTClient(api_key=API_KEY, api_secret=API_SECRET))
 
 # ==========================
 # BOT CONFIG
@@ -50,213 +95,108 @@ BUY_COOLDOWN_SECONDS = 180
 VARIANCE_DROP_REQUIRED = 0.005
 DRY_RUN = False
 WINDOW = 20
-SLEEP_TIME = 15
+SLEEP_TIME = 15                             # longest wait between evaluations
+MIN_EVAL_INTERVAL = 2                       # shortest wait between evaluations
+TRIGGER_FRACTION = 0.8                      # wake early once variance passes 80% of a threshold
+OPEN_ORDER_WAIT = 10
+POST_ONLY = False                           # post-only limit at the touch instead of market orders
+LIMIT_TIMEOUT = 30                          # cancel an unfilled post-only order (then take) after this
+METRICS_TEXTFILE = "eth_bot_metrics.prom"   # Prometheus textfile, rewritten every 15 s
+METRICS_PORT = 9108                         # /metrics and /metrics.json on 127.0.0.1 (None = off)
+STATE_PATH = "eth_bot_state.db"             # SQLite (WAL) strategy state for warm restarts
+STATE_MAX_AGE = 3600                        # ignore saved EMA/variance state older than this
+BOOTSTRAP_CANDLES = 100                     # historical closes used to warm up the indicators
+BOOTSTRAP_GRANULARITY = "ONE_MINUTE"
+JOURNAL_DIR = "journal"                     # daily memory-mapped tick/decision journal
+PRICE_MODE = "first"                        # REST fallback: fastest valid quote, or "median"
+LOG_PATH = "eth_bot.jsonl"                  # JSON-lines log, rotated daily / at 50 MB, gzipped
+LOG_TICK_SAMPLE = 1                         # keep 1 in N per-tick lines (file, stdout, Discord)
+REOPT_INTERVAL = 3600                       # re-fit engine params on the journal this often (None = off)
+REOPT_LOOKBACK = 86400                      # journal window per fit: first 70% train, rest out-of-sample
+BAR_TIMEFRAMES = (15, 60, 300)              # OHLCV bars built from the ticker stream (seconds)
+BAR_TIMEFRAME = None                        # step EMA/engine once per closed bar of this size (one of the above; None = per evaluation)
+RISK_PATH = "portfolio_risk.bin"           # account-wide exposure book shared with other bots (None = off)
  
 
 
-# ==========================
-# UNIFIED VARIANCE ENGINE (ETH‑TUNED)
-# ==========================
-
-class UnifiedVarianceEngine:
-    def __init__(
-        self,
-        base_buy=-0.0065,      # -0.65%
-        base_sell=0.0075,      # +0.75%
-        window=12,
-        buy_multiplier=14,
-        sell_multiplier=12,
-        buy_clamp=(-0.012, -0.005),   # -1.2% to -0.5%
-        sell_clamp=(0.006, 0.014)     # +0.6% to +1.4%
-    ):
-        self.base_buy = base_buy
-        self.base_sell = base_sell
-        self.window = window
-
-        self.buy_multiplier = buy_multiplier
-        self.sell_multiplier = sell_multiplier
-
-        self.buy_clamp_min, self.buy_clamp_max = buy_clamp
-        self.sell_clamp_min, self.sell_clamp_max = sell_clamp
-
-        self.recent_variances = deque(maxlen=window)
-
-    def clamp(self, value, min_v, max_v):
-        return max(min_v, min(value, max_v))
-
-    def get_direction(self):
-        if len(self.recent_variances) < 4:
-            return "flat"
-
-        last = self.recent_variances[-1]
-        prev = self.recent_variances[-4]
-
-        if last > prev:
-            return "rising"
-        elif last < prev:
-            return "shrinking"
-        return "flat"
-
-    def update(self, current_variance, current_exposure_pct):
-        self.recent_variances.append(current_variance)
-
-        if len(self.recent_variances) < 3:
-            return self.base_buy, self.base_sell
-
-        # 1. VOLATILITY SCALING
-        avg_var = sum(abs(v) for v in self.recent_variances) / len(self.recent_variances)
-
-        buy_var = self.base_buy * (1 + avg_var * self.buy_multiplier)
-        sell_var = self.base_sell * (1 + avg_var * self.sell_multiplier)
-
-        # 2. DIRECTION ADJUSTMENT
-        direction = self.get_direction()
-
-        if direction == "rising":
-            buy_var *= 1.20
-            sell_var *= 0.80
-        elif direction == "shrinking":
-            buy_var *= 0.80
-            sell_var *= 1.20
-
-        # 3. EXPOSURE WEIGHTING
-        buy_var *= (1 + current_exposure_pct)
-
-        # 4. FINAL CLAMP
-        buy_var = self.clamp(buy_var, self.buy_clamp_min, self.buy_clamp_max)
-        sell_var = self.clamp(sell_var, self.sell_clamp_min, self.sell_clamp_max)
+ENGINE = UnifiedVarianceEngine()
 
-        return buy_var, sell_var
+# Echo-only until setup() opens LOG_PATH
+LOG = JsonLog(None, sample={"tick": LOG_TICK_SAMPLE})
 
 
-ENGINE = UnifiedVarianceEngine()
+last_buy_time = 0
+last_buy_price = None
 
 
 # ==========================
-# HYBRID PROTECTION SETTINGS
+# PRICE & BALANCE
 # ==========================
 
-# -----------------------------
-# Adaptive risk + behavior engine
-# -----------------------------
-
-def get_adaptive_exposure(balance):
-    EXPOSURE_PERCENT = 0.30      # 30% of balance
-    MIN_EXPOSURE = 3.00          # never go below this
-    MAX_EXPOSURE = 25.00         # absolute ceiling
-
-    adaptive = balance * EXPOSURE_PERCENT
-    return max(MIN_EXPOSURE, min(adaptive, MAX_EXPOSURE))
+# Stale-stream fallback: spot, ticker and best bid/ask queried concurrently,
+# fastest valid quote wins (see price_aggregator.py)
+PRICES = PriceAggregator(default_sources(), mode=PRICE_MODE)
+FEED = TickerFeed([ASSET], fallback=PRICES.get_price)
 
+# Wakes the loop on price moves instead of a fixed SLEEP_TIME (see scheduler.py)
+SCHEDULER = EventScheduler(
+    min_interval=MIN_EVAL_INTERVAL,
+    max_interval=SLEEP_TIME,
+    trigger_fraction=TRIGGER_FRACTION,
+)
+FEED.add_listener(SCHEDULER.on_price)
 
-def get_adaptive_buffer(balance):
-    BUFFER_PERCENT = 0.08        # 8% of balance
-    MIN_BUFFER = 1.00            # never keep less than $1
-    MAX_BUFFER = 5.00            # never keep more than $5
-
-    adaptive = balance * BUFFER_PERCENT
-    return max(MIN_BUFFER, min(adaptive, MAX_BUFFER))
-
-
-def get_adaptive_cooldown(balance):
-    # Faster when small, slower when large
-    if balance < 25:
-        return 20          # seconds
-    elif balance < 100:
-        return 45
-    else:
-        return 90
-
-
-def get_adaptive_variance(balance):
-    # Range: 0.4% to 1.0%
-    MIN_VAR = 0.004        # 0.4%
-    MAX_VAR = 0.010        # 1.0%
-
-    # Scale variance based on balance (caps at 100 USD)
-    scale = min(balance / 100.0, 1.0)
-    return MIN_VAR + (MAX_VAR - MIN_VAR) * scale
-
-
-
-def get_adaptive_sell_threshold(balance):
-    MIN_SELL = 0.008   # 0.8%
-    MAX_SELL = 0.020   # 2.0%
-
-    # Scale based on balance (caps at 100 USD)
-    scale = min(balance / 100.0, 1.0)
-
-    return MIN_SELL + (MAX_SELL - MIN_SELL) * scale
-
-def get_adaptive_buy_threshold(balance):
-    MIN_BUY = -0.003   # -0.3%
-    MAX_BUY = -0.010   # -1.0%
-
-    # Scale based on balance (caps at 100 USD)
-    scale = min(balance / 100.0, 1.0)
-
-    return MIN_BUY + (MAX_BUY - MIN_BUY) * scale
-
-def get_adaptive_buy_size(total_equity, variance, recent_wins, recent_losses):
-    # Base: 10% of equity
-    BASE_PCT = 0.10
-
-    # Volatility factor (lower volatility = bigger buys)
-    # variance is usually between -0.02 and +0.02
-    vol_factor = max(0.5, min(1.5, 1 - abs(variance) * 10))
+# Multi-timeframe OHLCV bars from the same stream (see bars.py)
+BARS = BarBuilder([ASSET], BAR_TIMEFRAMES)
+FEED.add_listener(BARS.on_price)
 
-    # Trend factor (winning streak = confidence)
-    trend_factor = 1 + (recent_wins * 0.05) - (recent_losses * 0.05)
-    trend_factor = max(0.7, min(1.3, trend_factor))
+def get_current_price():
+    # Latest streamed ticker; falls back to hedged REST prices when stale
+    return FEED.get_price(ASSET)
 
-    # Combine
-    pct = BASE_PCT * vol_factor * trend_factor
 
-    # Cap at 20% of equity
-    pct = min(pct, 0.20)
+def next_bar_wait():
+    # Seconds until the current BAR_TIMEFRAME bar closes
+    close_at = BARS.next_close(ASSET, BAR_TIMEFRAME)
+    return BAR_TIMEFRAME if close_at is None else max(close_at - time.time(), 0.0)
 
-    return total_equity * pct
 
+def fetch_balances():
+    # Available balance per currency, all account pages
+    return coinbase_balances(client, call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs))
 
 
+# One balance fetch per tick, shared by every reader below
+ACCOUNT = AccountState(fetch_balances)
 
-last_buy_time = 0
-last_buy_price = None
-
-
-# ==========================
-# PRICE & BALANCE
-# ==========================
-
-def get_current_price():
-    url = f"https://api.coinbase.com/v2/prices/{ASSET}/spot"
-    r = requests.get(url).json()
-    return float(r["data"]["amount"])
+# Exposure limits across every bot trading this account (see risk.py);
+# opened by setup()
+RISK = None
 
 
 def get_usd_balance():
-    # TODO: replace with real Coinbase balance call
-    return 50.00
+    return ACCOUNT.balance("USD")
 
 
 def get_eth_balance():
-    # TODO: replace with real Coinbase balance call
-    return 0.05
+    return ACCOUNT.balance("ETH")
 
 
 # ==========================
 # OPEN ORDER CHECKING
 # ==========================
 
+# Seeded once, then kept current in the background (see orders.py)
+ORDERS = OrderTracker(
+    client,
+    product_ids=[ASSET],
+    call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs),
+    on_error=lambda e: log(f"[ERROR] Could not fetch open orders: {e}", ALERTS_WEBHOOK, event="error", level="error"),
+    on_change=SCHEDULER.wake,
+)
+
 def get_open_orders():
-    try:
-        resp = client.list_orders(product_id=ASSET)
-        orders = resp.orders
-        watched = {"OPEN", "PENDING", "PARTIALLY_FILLED"}
-        return [o for o in orders if o.status in watched]
-    except Exception as e:
-        send_discord(ALERTS_WEBHOOK, f"[ERROR] Could not fetch open orders: {e}")
-        return []
+    return ORDERS.open_orders(ASSET)
 
 
 # ==========================
@@ -264,40 +204,22 @@ def get_open_orders():
 # ==========================
 
 def can_buy_eth(current_price):
-    global last_buy_time, last_buy_price
-
-    usd_balance = get_usd_balance()
-    eth_balance = get_eth_balance()
-
-    # --- ADAPTIVE LIMITS ---
-    max_exposure_usd = get_adaptive_exposure(usd_balance)
-    usd_buffer = get_adaptive_buffer(usd_balance)
-
-    # --- EXPOSURE CAP ---
-    eth_value = eth_balance * current_price
-    if eth_value >= max_exposure_usd:
-        return False, "Exposure cap reached"
-
-    # --- USD BUFFER PROTECTION ---
-    if usd_balance - current_price < usd_buffer:
-        return False, "USD buffer protection triggered"
-
-    # --- COOLDOWN ---
-    if time.time() - last_buy_time < BUY_COOLDOWN_SECONDS:
-        return False, "Cooldown active"
-
-    # --- VARIANCE DROP CHECK ---
-    if last_buy_price is not None:
-        drop = (last_buy_price - current_price) / last_buy_price
-        if drop < VARIANCE_DROP_REQUIRED:
-            return False, "Variance drop not enough"
-
-    return True, "OK to buy"
+    return check_buy(
+        current_price,
+        usd_balance=get_usd_balance(),
+        base_balance=get_eth_balance(),
+        now=time.time(),
+        last_buy_time=last_buy_time,
+        last_buy_price=last_buy_price,
+        cooldown_seconds=BUY_COOLDOWN_SECONDS,
+        variance_drop_required=VARIANCE_DROP_REQUIRED,
+    )
 
 def record_buy(price):
     global last_buy_time, last_buy_price
     last_buy_time = time.time()
     last_buy_price = price
+    save_trade_state()
     
 def record_sell(price):
     global RECENT_WINS, RECENT_LOSSES, TOTAL_WINS, TOTAL_LOSSES, last_buy_price
@@ -310,14 +232,15 @@ def record_sell(price):
     if pnl > 0:
         RECENT_WINS += 1
         TOTAL_WINS += 1
-        send_discord(ALERTS_WEBHOOK, f"WIN +${pnl:.2f} | Total: {TOTAL_WINS}W / {TOTAL_LOSSES}L")
+        log(f"WIN +${pnl:.2f} | Total: {TOTAL_WINS}W / {TOTAL_LOSSES}L", ALERTS_WEBHOOK)
     else:
         RECENT_LOSSES += 1
         TOTAL_LOSSES += 1
-        send_discord(ALERTS_WEBHOOK, f"LOSS ${pnl:.2f} | Total: {TOTAL_WINS}W / {TOTAL_LOSSES}L")
+        log(f"LOSS ${pnl:.2f} | Total: {TOTAL_WINS}W / {TOTAL_LOSSES}L", ALERTS_WEBHOOK)
 
     # Reset buy price after evaluating
     last_buy_price = None
+    save_trade_state()
 
 def send_performance_update(current_price):
     usd_balance = get_usd_balance()
@@ -348,118 +271,181 @@ def send_performance_update(current_price):
         f"Recent Streak: **{streak}**"
     )
 
-    send_discord(ALERTS_WEBHOOK, msg)
+    log(msg, ALERTS_WEBHOOK)
 
 
 # ==========================
-# EMA CALCULATION
+# ORDER EXECUTION
 # ==========================
 
-def calculate_ema(prices, window=20):
-    if len(prices) < window:
-        return None
+def on_order_update(order):
+    # Keeps the open-order pause in step with the execution engine
+    ORDERS.track(order.client_order_id, order.product_id, order.order_id, order.exchange_status)
+    if order.done:
+        ACCOUNT.invalidate()
 
-    k = 2 / (window + 1)
-    ema = prices[0]
 
-    for price in prices[1:]:
-        ema = (price * k) + (ema * (1 - k))
+def on_order_fill(order):
+    if RISK is not None:
+        RISK.on_fill("ETH", order.side, order.filled_size, order.average_price, order.fees)
+    if order.side == "BUY":
+        log(f"[BUY FILLED] {order.filled_size:.6f} ETH at {order.average_price:.4f}", LOGS_WEBHOOK)
+        record_buy(order.average_price)
+    else:
+        log(f"[SELL FILLED] {order.filled_size:.6f} ETH at {order.average_price:.4f}", LOGS_WEBHOOK)
+        record_sell(order.average_price)
+        send_performance_update(order.average_price)
+
+
+# Idempotent ids, fill tracking and optional post-only entries (see execution.py)
+EXECUTION = ExecutionEngine(
+    client,
+    call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs),
+    ids=OrderIds("eth"),
+    metrics=METRICS,
+    on_update=on_order_update,
+    on_fill=on_order_fill,
+    post_only=POST_ONLY,
+    limit_timeout=LIMIT_TIMEOUT,
+)
 
-    return ema
 
-# ==========================
-# ORDER ID GENERATOR
-# ==========================
+def place_buy_order(amount_usd, signal_time=None):
+    if DRY_RUN:
+        msg = f"[DRY RUN] BUY ${amount_usd:.2f} ETH"
+        log(msg, LOGS_WEBHOOK)
+        return True, "Dry run"
+
+    order = EXECUTION.buy(ASSET, amount_usd, signal_time=signal_time)
+    if order.status == REJECTED:
+        METRICS.inc("errors", stage="place_buy_order")
+        log(f"[ERROR] Buy order failed: {order.error}", ALERTS_WEBHOOK, event="error", level="error")
+        return False, order.error
+
+    if order.status == SUBMITTED:
+        # May be on the exchange: the hold stays until it is reconciled (or expires)
+        log(f"[BUY] ${amount_usd:.2f} buy unconfirmed ({order.error}); reconciling.", ALERTS_WEBHOOK, event="error", level="warning")
+        return True, "Buy order unconfirmed"
+
+    METRICS.observe_since_tick("tick_to_order_ack")
+    log(f"[BUY] ${amount_usd:.2f} {order.kind} buy placed.", LOGS_WEBHOOK)
+    return True, "Buy order placed"
 
-def generate_client_order_id():
-    return f"bot_{int(time.time() * 1000)}"
+
+def place_sell_order(price, signal_time=None):
+    eth_balance = get_eth_balance()
+
+    if eth_balance < EXECUTION.increment(ASSET, "base"):
+        log("[SELL BLOCKED] No ETH to sell.", LOGS_WEBHOOK)
+        return
+
+    if DRY_RUN:
+        msg = f"[DRY RUN] SELL {eth_balance:.6f} ETH at {price}"
+        log(msg, LOGS_WEBHOOK)
+        return
+
+    msg = f"Executing SELL {eth_balance:.6f} ETH at {price}"
+    log(msg, ALERTS_WEBHOOK)
+
+    # record_sell / performance update run from on_order_fill
+    order = EXECUTION.sell(ASSET, eth_balance, signal_time=signal_time)
+    if order.status == REJECTED:
+        METRICS.inc("errors", stage="place_sell_order")
+        log(f"[SELL ERROR] {order.error}", ALERTS_WEBHOOK, event="error", level="error")
+    elif order.status == SUBMITTED:
+        log(f"[SELL] Sell unconfirmed ({order.error}); reconciling.", ALERTS_WEBHOOK, event="error", level="warning")
 
 
 # ==========================
-# ORDER EXECUTION (REAL COINBASE CALLS)
+# PERSISTENT STATE
 # ==========================
 
-def place_buy_order(amount_usd):
-    try:
-        client_order_id = generate_client_order_id()
+# Opened by setup() when the bot starts, so importing this module creates
+# no files
+STATE = None
+JOURNAL = None
 
-        order = client.create_order(
-            client_order_id=client_order_id,
-            product_id=ASSET,
-            side="BUY",
-            order_configuration={
-                "market_market_ioc": {
-                    "quote_size": str(amount_usd)
-                }
-            }
-        )
 
-        send_discord(LOGS_WEBHOOK, f"[BUY] ${amount_usd} market buy placed.")
-        return True, "Buy order placed"
+def setup():
+    # On-disk state for a live run
+    global STATE, JOURNAL, LOG, RISK
+    STATE = StateStore(STATE_PATH)
+    JOURNAL = TickJournal(JOURNAL_DIR, "eth")
+    LOG = JsonLog(LOG_PATH, sample={"tick": LOG_TICK_SAMPLE})
+    RISK = PortfolioRisk(RISK_PATH) if RISK_PATH else None
 
-    except Exception as e:
-        send_discord(ALERTS_WEBHOOK, f"[ERROR] Buy order failed: {e}")
-        return False, str(e)
 
+def on_engine_swap(params, report):
+    # Reoptimizer thread: persist and announce (no METRICS stages off-loop)
+    STATE.put("engine_params", params)
+    msg = (
+        f"[REOPT] Engine retuned: out-of-sample PnL {report['test']['pnl']:.2f} "
+        f"vs {report['baseline']['pnl']:.2f} live | {params}"
+    )
+    LOG.log("reoptimize", msg, params=params, test=report["test"], baseline=report["baseline"])
+    NOTIFIER.send(LOGS_WEBHOOK, msg)
+
+
+# Walk-forward re-fit in a low-priority worker process (see reoptimizer.py)
+REOPTIMIZER = ReOptimizer(
+    ENGINE,
+    JOURNAL_DIR,
+    "eth",
+    WINDOW,
+    interval=REOPT_INTERVAL or 3600,
+    lookback=REOPT_LOOKBACK,
+    on_swap=on_engine_swap,
+)
 
-def place_sell_order(price):
-    eth_balance = get_eth_balance()
 
-    if eth_balance <= 0:
-        send_discord(LOGS_WEBHOOK, "[SELL BLOCKED] No ETH to sell.")
-        return
+def save_trade_state():
+    STATE.put("trades", {
+        "last_buy_time": last_buy_time,
+        "last_buy_price": last_buy_price,
+        "recent_wins": RECENT_WINS,
+        "recent_losses": RECENT_LOSSES,
+        "total_wins": TOTAL_WINS,
+        "total_losses": TOTAL_LOSSES,
+    })
 
-    if DRY_RUN:
-        msg = f"[DRY RUN] SELL {eth_balance:.6f} ETH at {price}"
-        print(msg)
-        send_discord(LOGS_WEBHOOK, msg)
-    else:
-        try:
-            msg = f"Executing SELL {eth_balance:.6f} ETH at {price}"
-            print(msg)
-            send_discord(ALERTS_WEBHOOK, msg)
-
-            # 🔥 FIX: Coinbase requires a client_order_id
-            client.market_order_sell(
-                client_order_id=str(uuid.uuid4()),
-                product_id="ETH-USD",
-                base_size=str(eth_balance)
-            )
 
-        except Exception as e:
-            send_discord(ALERTS_WEBHOOK, f"[SELL ERROR] {e}")
-            return
-        # 🔥 NEW: Track win/loss automatically
-        record_sell(price)
-        send_performance_update(price)
+def save_indicator_state(ema_state):
+    STATE.put("indicators", {
+        "ema": ema_state.get_state(),
+        "engine": ENGINE.get_state(),
+    })
 
 
+def restore_state(ema_state):
+    global last_buy_time, last_buy_price, RECENT_WINS, RECENT_LOSSES, TOTAL_WINS, TOTAL_LOSSES
 
-def place_sell_order(price):
-    eth_balance = get_eth_balance()
+    saved = STATE.load()
 
-    if eth_balance <= 0:
-        send_discord(LOGS_WEBHOOK, "[SELL BLOCKED] No ETH to sell.")
-        return
+    params = saved.get("engine_params")
+    if params and params.get("window") == ENGINE.window:
+        # Applied on the first ENGINE.update()
+        ENGINE.swap_params(params)
 
-    if DRY_RUN:
-        msg = f"[DRY RUN] SELL {eth_balance:.6f} ETH at {price}"
-        print(msg)
-        send_discord(LOGS_WEBHOOK, msg)
-    else:
-        try:
-            msg = f"Executing SELL {eth_balance:.6f} ETH at {price}"
-            print(msg)
-            send_discord(ALERTS_WEBHOOK, msg)
+    trades = saved.get("trades")
+    if trades:
+        last_buy_time = trades["last_buy_time"]
+        last_buy_price = trades["last_buy_price"]
+        RECENT_WINS = trades["recent_wins"]
+        RECENT_LOSSES = trades["recent_losses"]
+        TOTAL_WINS = trades["total_wins"]
+        TOTAL_LOSSES = trades["total_losses"]
 
-            client.market_order_sell(
-                product_id="ETH-USD",
-                base_size=str(eth_balance)
-            )
+    indicators = saved.get("indicators")
+    age = time.time() - saved.get("indicators.updated", 0)
+    if indicators and age <= STATE_MAX_AGE and indicators["ema"]["window"] == WINDOW:
+        ema = indicators["ema"]
+        ema_state.set_state(ema["ema"], ema["ew_var"], ema["count"])
+        ENGINE.set_state(indicators["engine"])
+        return f"Restored state from {age:.0f}s ago ({TOTAL_WINS}W / {TOTAL_LOSSES}L)."
 
-        except Exception as e:
-            send_discord(ALERTS_WEBHOOK, f"[SELL ERROR] {e}")
-            return
+    if trades:
+        return "Restored trade state; indicators will warm up from live data."
+    return None
 
 
 # ==========================
@@ -467,7 +453,8 @@ def place_sell_order(price):
 # ==========================
 
 def run_bot():
-    prices = []
+    setup()
+    ema_state = EMAState(WINDOW)
 
     header = (
         "Starting EMA + UnifiedVarianceEngine ETH Bot...\n"
@@ -477,31 +464,79 @@ def run_bot():
         "----------------------------------------"
     )
 
-    print(header)
+    log(header, event="start")
     send_discord(LOGS_WEBHOOK, "ETH bot started successfully.")
 
+    restored = restore_state(ema_state)
+    if restored:
+        log(restored, LOGS_WEBHOOK)
+
+    if not ema_state.ready:
+        candles = bootstrap([ASSET], BOOTSTRAP_CANDLES, BOOTSTRAP_GRANULARITY)[ASSET]
+        if warm_up(ema_state, ENGINE, [c["close"] for c in candles]):
+            msg = f"Indicators warmed up from {len(candles)} {BOOTSTRAP_GRANULARITY} candles."
+            log(msg, LOGS_WEBHOOK)
+        if GRANULARITY_SECONDS[BOOTSTRAP_GRANULARITY] in BAR_TIMEFRAMES:
+            BARS.seed(ASSET, GRANULARITY_SECONDS[BOOTSTRAP_GRANULARITY], candles)
+
+    # Bar mode: only bars that close from now on feed the indicators
+    bar_cursor = BARS.cursor(ASSET, BAR_TIMEFRAME) if BAR_TIMEFRAME else 0
+    last_sequence = None
+
+    ORDERS.start()
+    EXECUTION.start()
+    METRICS.start_exporter(path=METRICS_TEXTFILE, port=METRICS_PORT)
+    if REOPT_INTERVAL:
+        REOPTIMIZER.start()
+
     while True:
         try:
-            open_orders = get_open_orders()
+            METRICS.mark_tick()
+            ACCOUNT.begin_tick()
+
+            with METRICS.stage("open_orders"):
+                has_open_orders = ORDERS.has_open_orders(ASSET)
 
-            if open_orders:
+            if has_open_orders:
                 msg = "[WAIT] Unprocessed orders detected. Bot pausing."
-                print(msg)
-                send_discord(LOGS_WEBHOOK, msg)
-                time.sleep(10)
+                log(msg, LOGS_WEBHOOK)
+                # Woken early when the tracker sees the order close
+                SCHEDULER.wait(ASSET, timeout=OPEN_ORDER_WAIT, triggers=False)
                 continue
 
-            current_price = get_current_price()
-            prices.append(current_price)
+            # Read before the price: a tick racing in is evaluated next time
+            sequence = FEED.sequence(ASSET) if FEED.is_fresh(ASSET) else None
+            with METRICS.stage("get_current_price"):
+                current_price = get_current_price()
+            signal_time = time.monotonic()
 
-            if len(prices) > WINDOW:
-                prices.pop(0)
-
-            ema = calculate_ema(prices, WINDOW)
+            if not BAR_TIMEFRAME and sequence is not None and sequence == last_sequence:
+                # No tick since the last evaluation: feeding the same price to
+                # the EMA/engine again would shrink the time they span
+                METRICS.inc("wakes", reason=SCHEDULER.wait(ASSET))
+                continue
+            last_sequence = sequence
+
+            if BAR_TIMEFRAME:
+                # REST fallback prices never reach the stream listener
+                if not FEED.is_fresh(ASSET):
+                    BARS.on_price(ASSET, current_price)
+                BARS.roll()
+                bars, bar_cursor = BARS.since(ASSET, BAR_TIMEFRAME, bar_cursor)
+                if not len(bars):
+                    SCHEDULER.wait(ASSET, timeout=next_bar_wait(), triggers=False)
+                    continue
+                # Bars missed while paused catch up the indicators; the
+                # latest close is evaluated like a live price
+                warm_up(ema_state, ENGINE, bars["close"][:-1].tolist())
+                current_price = float(bars["close"][-1])
+
+            with METRICS.stage("ema_update"):
+                ema = ema_state.update(current_price)
 
             if ema is None:
-                print("Collecting data for EMA...")
-                time.sleep(SLEEP_TIME)
+                log("Collecting data for EMA...")
+                SCHEDULER.wait(ASSET, timeout=next_bar_wait() if BAR_TIMEFRAME else SLEEP_TIME, triggers=False)
                 continue
 
             variance = (current_price - ema) / ema
@@ -511,6 +546,10 @@ def run_bot():
             eth_value = eth_balance * current_price
             total_equity = usd_balance + eth_value
             exposure_pct = eth_value / total_equity if total_equity > 0 else 0.0
+
+            if RISK is not None:
+                RISK.sync(ACCOUNT.snapshot())
+                RISK.on_price("ETH", current_price)
             
             ADAPTIVE_BUY_THRESHOLD = get_adaptive_buy_threshold(total_equity)
 
@@ -531,10 +570,14 @@ def run_bot():
 
 
 
-            buy_var, sell_var = ENGINE.update(
-                current_variance=variance,
-                current_exposure_pct=exposure_pct
-            )
+            with METRICS.stage("engine_update"):
+                buy_var, sell_var = ENGINE.update(
+                    current_variance=variance,
+                    current_exposure_pct=exposure_pct
+                )
+
+            save_indicator_state(ema_state)
+            decision, block_reason = DECISION_NONE, ""
 
             log_msg = (
                 f"ETH Price: {current_price:.4f} | EMA{WINDOW}: {ema:.4f} | "
@@ -542,28 +585,63 @@ def run_bot():
                 f"BUY_TH: {buy_var*100:.2f}% | SELL_TH: {sell_var*100:.2f}% | "
                 f"Exposure: {exposure_pct:.2f}"
             )
-            print(log_msg)
-            send_discord(LOGS_WEBHOOK, log_msg)
+            log(
+                log_msg, LOGS_WEBHOOK, event="tick",
+                price=current_price, ema=ema, variance=variance,
+                buy_var=buy_var, sell_var=sell_var, exposure=exposure_pct,
+            )
 
             if variance <= buy_var:
-                allowed, reason = can_buy_eth(current_price)
+                METRICS.inc("signals", side="buy")
+                with METRICS.stage("can_buy_eth"):
+                    allowed, reason = can_buy_eth(current_price)
+                if allowed and RISK is not None:
+                    # Holds BUY_SIZE_USD against the account-wide limits until it fills
+                    allowed, reason = RISK.reserve("ETH", BUY_SIZE_USD)
                 if allowed:
-                    send_discord(ALERTS_WEBHOOK, f"BUY signal triggered at {current_price}")
-                    place_buy_order(current_price)
+                    decision = DECISION_BUY
+                    log(f"BUY signal triggered at {current_price}", ALERTS_WEBHOOK)
+                    placed = False
+                    try:
+                        with METRICS.stage("place_buy_order"):
+                            placed, _ = place_buy_order(BUY_SIZE_USD, signal_time)
+                    finally:
+                        if RISK is not None and (DRY_RUN or not placed):
+                            # No order on the exchange (dry run, rejected or raised)
+                            RISK.release("ETH", BUY_SIZE_USD)
                 else:
-                    send_discord(LOGS_WEBHOOK, f"BUY blocked: {reason}")
+                    decision, block_reason = DECISION_BUY_BLOCKED, reason
+                    METRICS.inc("buy_blocked", reason=reason)
+                    log(f"BUY blocked: {reason}", LOGS_WEBHOOK)
 
             elif variance >= sell_var and eth_balance > 0:
-                send_discord(ALERTS_WEBHOOK, f"SELL signal triggered at {current_price}")
-                place_sell_order(current_price)
+                METRICS.inc("signals", side="sell")
+                decision = DECISION_SELL
+                log(f"SELL signal triggered at {current_price}", ALERTS_WEBHOOK)
+                with METRICS.stage("place_sell_order"):
+                    place_sell_order(current_price, signal_time)
+
+            latency = SCHEDULER.decided(ASSET)
+            if latency is not None:
+                METRICS.observe("wake_to_decision", latency)
+
+            JOURNAL.append(
+                time.time(), current_price, ema, variance, buy_var, sell_var, exposure_pct,
+                decision, block_reason,
+            )
 
-            time.sleep(SLEEP_TIME)
+            METRICS.observe_since_tick("tick")
+            SCHEDULER.arm(ASSET, ema, variance, buy_var, sell_var)
+            if BAR_TIMEFRAME:
+                METRICS.inc("wakes", reason=SCHEDULER.wait(ASSET, timeout=next_bar_wait(), triggers=False))
+            else:
+                METRICS.inc("wakes", reason=SCHEDULER.wait(ASSET))
 
         except Exception as e:
-            err = f"[ERROR] {e}"
-            print(err)
-            send_discord(ALERTS_WEBHOOK, err)
-            time.sleep(5)
+            METRICS.inc("errors", stage="run_bot")
+            log(f"[ERROR] {e}", ALERTS_WEBHOOK, event="error", level="error")
+            # Don't come back before the exchange circuit breaker would let us through
+            time.sleep(max(5, TRANSPORT.retry_in(COINBASE_HOST)))
 
 
 # ==========================
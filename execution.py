@@ -0,0 +1,561 @@
+import copy
+import itertools
+import math
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+from metrics import LatencyHistogram
+
+# ==========================
+# ORDER EXECUTION ENGINE
+# ==========================
+#
+# Submits orders with collision-free client_order_ids, follows each one
+# through a small state machine and reports fills:
+#
+#   SUBMITTED -> ACKED -> PARTIALLY_FILLED -> FILLED
+#                     \-> CANCELLED (e.g. a post-only order that never filled)
+#   SUBMITTED -> REJECTED
+#
+# The client_order_id is fixed before the first attempt, so TRANSPORT
+# retries are safe: the exchange de-duplicates on it. Only an explicit
+# refusal (success=False or an HTTP 4xx) rejects an order. A timeout,
+# connection error, 5xx or exhausted retry leaves it SUBMITTED with .error
+# set, since it may exist on the exchange anyway; poll() then looks it up
+# by client_order_id and rejects it only once reconcile_timeout has passed
+# without a trace of it.
+#
+# With post_only=True, orders go out as post-only limits at the touch (best
+# bid for buys, best ask for sells) to pay maker instead of taker fees. A
+# post-only order that would cross, or that rests past limit_timeout, falls
+# back to a market order for the remainder (market_fallback=True). A
+# partial fill and its fallback are reported as one aggregated fill.
+#
+# Live orders are refreshed by poll(), from a background thread after
+# start() or driven by the caller. Orders are dropped once their final
+# state has been reported. Signal-to-ack and signal-to-fill latency are
+# measured against the signal_time passed in (clock.monotonic()).
+#
+#   EXECUTION = ExecutionEngine(client, call=..., on_fill=on_fill)
+#   order = EXECUTION.buy("ETH-USD", 25.0, signal_time=t0)
+#   order.status   # "ACKED", then "FILLED" once poll()/on_order_event sees it
+
+SUBMITTED = "SUBMITTED"
+ACKED = "ACKED"
+PARTIALLY_FILLED = "PARTIALLY_FILLED"
+FILLED = "FILLED"
+CANCELLED = "CANCELLED"
+REJECTED = "REJECTED"
+
+TRANSITIONS = {
+    None: {SUBMITTED},
+    SUBMITTED: {ACKED, PARTIALLY_FILLED, FILLED, CANCELLED, REJECTED},
+    ACKED: {PARTIALLY_FILLED, FILLED, CANCELLED, REJECTED},
+    PARTIALLY_FILLED: {PARTIALLY_FILLED, FILLED, CANCELLED, REJECTED},
+}
+TERMINAL = {FILLED, CANCELLED, REJECTED}
+
+# Size / price precision; override per product with increments={product_id: {...}}
+DEFAULT_INCREMENTS = {"base": 1e-8, "quote": 0.01, "price": 0.01}
+
+# State -> status string for OrderTracker.track()
+TRACKER_STATUS = {
+    SUBMITTED: "PENDING",
+    ACKED: "OPEN",
+    PARTIALLY_FILLED: "PARTIALLY_FILLED",
+    FILLED: "FILLED",
+    CANCELLED: "CANCELLED",
+    REJECTED: "FAILED",
+}
+
+
+class OrderIds:
+    # "<prefix>-<session>-<seq>": unique per process via the counter and
+    # across restarts via the random session. Pass a fixed session for
+    # reproducible ids (replays, tests).
+    def __init__(self, prefix="bot", session=None):
+        self.prefix = prefix
+        self.session = session or uuid.uuid4().hex[:12]
+        self._seq = itertools.count(1)
+
+    def next(self):
+        return f"{self.prefix}-{self.session}-{next(self._seq)}"
+
+
+class ExecOrder:
+    __slots__ = (
+        "client_order_id", "order_id", "product_id", "side", "kind",
+        "quote_size", "base_size", "limit_price", "parent",
+        "status", "exchange_status", "filled_size", "average_price", "fees", "error",
+        "signal_time", "submitted_at", "acked_at", "filled_at", "done_at", "history", "carried",
+    )
+
+    def __init__(self, client_order_id, product_id, side, kind, quote_size=None, base_size=None,
+                 limit_price=None, signal_time=None, parent=None, carried=None):
+        self.client_order_id = client_order_id
+        self.order_id = None
+        self.product_id = product_id
+        self.side = side
+        self.kind = kind                   # "market" or "post_only"
+        self.quote_size = quote_size
+        self.base_size = base_size
+        self.limit_price = limit_price
+        self.parent = parent               # client_order_id of the order this one replaces
+        self.carried = carried             # (size, value, fees) the replaced order filled
+
+        self.status = None
+        self.exchange_status = None
+        self.filled_size = 0.0
+        self.average_price = 0.0
+        self.fees = 0.0
+        self.error = None
+
+        self.signal_time = signal_time
+        self.submitted_at = None
+        self.acked_at = None
+        self.filled_at = None
+        self.done_at = None
+        self.history = []
+
+    @property
+    def done(self):
+        return self.status in TERMINAL
+
+    @property
+    def filled_value(self):
+        return self.filled_size * self.average_price
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "history"}
+
+
+def _get(obj, name, default=None):
+    if obj is None:
+        return default
+    if isinstance(obj, dict):
+        return obj.get(name, default)
+    return getattr(obj, name, default)
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _fmt(value, increment, up=False):
+    # Round to the product increment (down unless up=True) and print
+    # without float noise
+    decimals = max(0, -int(math.floor(math.log10(increment))))
+    steps = math.ceil(value / increment - 1e-9) if up else math.floor(value / increment + 1e-9)
+    return f"{steps * increment:.{decimals}f}"
+
+
+def _refused(error):
+    # The exchange answered and turned the order down (HTTP 4xx other than
+    # 429); anything else may still have placed it
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    return status is not None and 400 <= status < 500 and status != 429
+
+
+def _iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ExecutionEngine:
+    def __init__(
+        self,
+        client,
+        call=None,
+        ids=None,
+        metrics=None,
+        on_update=None,
+        on_fill=None,
+        post_only=False,
+        limit_timeout=30.0,
+        market_fallback=True,
+        poll_interval=1.0,
+        reconcile_timeout=60.0,
+        increments=None,
+        clock=time,
+    ):
+        self.client = client
+        self.call = call or (lambda fn, **kwargs: fn(**kwargs))
+        self.ids = ids or OrderIds()
+        self.metrics = metrics
+        self.on_update = on_update        # on_update(order) after every state change
+        self.on_fill = on_fill            # on_fill(order) once, when an order ends with a fill
+        self.post_only = post_only
+        self.limit_timeout = limit_timeout
+        self.market_fallback = market_fallback
+        self.poll_interval = poll_interval
+        self.reconcile_timeout = reconcile_timeout    # unknown order not found by then -> REJECTED
+        self.increments = increments or {}
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._orders = {}          # client_order_id -> ExecOrder, until reported done
+        self._by_exchange_id = {}  # order_id -> client_order_id
+        self._thread = None
+        self._stopping = threading.Event()
+
+        self.signal_to_ack = LatencyHistogram()
+        self.signal_to_fill = LatencyHistogram()
+        self.submitted = 0
+        self.rejected = 0
+        self.fallbacks = 0
+        self.unconfirmed = 0
+        self.stale_events = 0
+        self.poll_errors = 0
+
+    # --------------------------
+    # Submit
+    # --------------------------
+
+    def buy(self, product_id, quote_size, signal_time=None, post_only=None):
+        return self._submit(product_id, "BUY", quote_size=quote_size, signal_time=signal_time, post_only=post_only)
+
+    def sell(self, product_id, base_size, signal_time=None, post_only=None):
+        return self._submit(product_id, "SELL", base_size=base_size, signal_time=signal_time, post_only=post_only)
+
+    def _submit(self, product_id, side, quote_size=None, base_size=None, signal_time=None, post_only=None, parent=None,
+                carried=None):
+        if signal_time is None:
+            signal_time = self.clock.monotonic()
+        post_only = self.post_only if post_only is None else post_only
+
+        if post_only:
+            try:
+                limit_price = self.touch(product_id, side)
+            except Exception as e:
+                if not self.market_fallback:
+                    raise
+                limit_price = None
+                print(f"[EXECUTION] No touch price for {product_id} ({e}); sending market order")
+            if limit_price:
+                size = base_size if side == "SELL" else quote_size / limit_price
+                order = ExecOrder(
+                    self.ids.next(), product_id, side, "post_only",
+                    quote_size=quote_size, base_size=size, limit_price=limit_price,
+                    signal_time=signal_time, parent=parent,
+                )
+                config = {"limit_limit_gtc": {
+                    "base_size": _fmt(size, self.increment(product_id, "base")),
+                    # Rounded away from the spread so it stays on the passive side
+                    "limit_price": _fmt(limit_price, self.increment(product_id, "price"), up=side == "SELL"),
+                    "post_only": True,
+                }}
+                self._send(order, config)
+                if order.status == REJECTED and self.market_fallback:
+                    # Would have crossed the book: take instead
+                    self.fallbacks += 1
+                    return self._submit(product_id, side, quote_size, base_size, signal_time, False, order.client_order_id)
+                return order
+
+        order = ExecOrder(
+            self.ids.next(), product_id, side, "market",
+            quote_size=quote_size, base_size=base_size, signal_time=signal_time, parent=parent, carried=carried,
+        )
+        if side == "BUY":
+            config = {"market_market_ioc": {"quote_size": _fmt(quote_size, self.increment(product_id, "quote"))}}
+        else:
+            config = {"market_market_ioc": {"base_size": _fmt(base_size, self.increment(product_id, "base"))}}
+        self._send(order, config)
+        if order.status == ACKED:
+            # IOC orders usually fill before the ack returns; pick that up now
+            try:
+                self.refresh(order)
+            except Exception as e:
+                self.poll_errors += 1
+                print(f"[EXECUTION ERROR] {order.client_order_id}: {e}")
+        return order
+
+    def _send(self, order, config):
+        with self._cond:
+            self._orders[order.client_order_id] = order
+        self.submitted += 1
+        order.submitted_at = self.clock.monotonic()
+        self._transition(order, SUBMITTED)
+
+        sizes = next(iter(config.values()))
+        if float(sizes.get("base_size") or sizes.get("quote_size")) <= 0:
+            # Rounded down to nothing; the exchange would reject it anyway
+            order.error = "size below increment"
+            self.rejected += 1
+            self._transition(order, REJECTED, "FAILED")
+            return
+
+        try:
+            resp = self.call(
+                self.client.create_order,
+                client_order_id=order.client_order_id,
+                product_id=order.product_id,
+                side=order.side,
+                order_configuration=config,
+            )
+        except Exception as e:
+            order.error = str(e)
+            if _refused(e):
+                self.rejected += 1
+                self._transition(order, REJECTED, "FAILED")
+            else:
+                # May have been placed: stays SUBMITTED until poll() finds it
+                self.unconfirmed += 1
+                print(f"[EXECUTION] {order.client_order_id} unconfirmed ({e}); reconciling")
+            return
+
+        if _get(resp, "success", True) is False:
+            error = _get(resp, "error_response") or {}
+            order.error = _get(error, "message") or _get(error, "error") or _get(resp, "failure_reason") or "rejected"
+            self.rejected += 1
+            self._transition(order, REJECTED, "FAILED")
+            return
+
+        order_id = _get(_get(resp, "success_response"), "order_id") or _get(resp, "order_id")
+        order.order_id = order_id
+        with self._cond:
+            if order_id:
+                self._by_exchange_id[order_id] = order.client_order_id
+        order.acked_at = self.clock.monotonic()
+        self._observe(self.signal_to_ack, "signal_to_ack", order.acked_at - order.signal_time)
+        self._transition(order, ACKED, "OPEN")
+
+    def increment(self, product_id, kind):
+        return self.increments.get(product_id, {}).get(kind, DEFAULT_INCREMENTS[kind])
+
+    def touch(self, product_id, side):
+        # Best bid for a buy, best ask for a sell
+        resp = self.call(self.client.get_best_bid_ask, product_ids=[product_id])
+        book = _get(resp, "pricebooks")[0]
+        levels = _get(book, "bids" if side == "BUY" else "asks")
+        return _float(_get(levels[0], "price"))
+
+    # --------------------------
+    # Updates
+    # --------------------------
+
+    def on_order_event(self, event):
+        # Exchange order object / user-channel dict for one of our orders
+        with self._cond:
+            cid = _get(event, "client_order_id")
+            if cid not in self._orders:
+                cid = self._by_exchange_id.get(_get(event, "order_id"))
+            order = self._orders.get(cid)
+        if order is None:
+            return None
+        self._apply(order, event)
+        return order
+
+    def refresh(self, order):
+        if order.done:
+            return order
+        if order.order_id is None:
+            return self._reconcile(order)
+        resp = self.call(self.client.get_order, order_id=order.order_id)
+        self._apply(order, _get(resp, "order"))
+        return order
+
+    def _reconcile(self, order):
+        # A create call that failed ambiguously: find the order by its
+        # client_order_id among the product's orders since submission
+        age = self.clock.monotonic() - order.submitted_at
+        start_date = _iso(self.clock.time() - age - 60)      # exchange clock skew
+        cursor = None
+        while True:
+            kwargs = {"cursor": cursor} if cursor else {}
+            resp = self.call(self.client.list_orders, product_ids=[order.product_id], start_date=start_date, **kwargs)
+            for event in _get(resp, "orders") or []:
+                if _get(event, "client_order_id") == order.client_order_id:
+                    order.acked_at = self.clock.monotonic()
+                    self._apply(order, event)
+                    return order
+            if not _get(resp, "has_next", False):
+                break
+            cursor = _get(resp, "cursor")
+
+        if age >= self.reconcile_timeout:
+            # Never reached the exchange
+            self.rejected += 1
+            self._transition(order, REJECTED, "FAILED")
+        return order
+
+    def poll(self):
+        now = self.clock.monotonic()
+        for order in self.live_orders():
+            try:
+                self.refresh(order)
+                if (
+                    order.kind == "post_only"
+                    and not order.done
+                    and order.acked_at is not None
+                    and now - order.acked_at >= self.limit_timeout
+                ):
+                    self.cancel(order)
+            except Exception as e:
+                self.poll_errors += 1
+                print(f"[EXECUTION ERROR] {order.client_order_id}: {e}")
+
+    def cancel(self, order):
+        self.call(self.client.cancel_orders, order_ids=[order.order_id])
+        return self.refresh(order)
+
+    def wait(self, order, timeout=None):
+        # Blocks until the order is done (needs start() or another poller)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not order.done:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+        return order
+
+    def _apply(self, order, event):
+        if event is None:
+            return
+        order_id = _get(event, "order_id")
+        if order.order_id is None and order_id:
+            # First sight of an order whose create call failed ambiguously
+            order.order_id = order_id
+            with self._cond:
+                self._by_exchange_id[order_id] = order.client_order_id
+        status = _get(event, "status")
+        filled = _float(_get(event, "filled_size"))
+        grew = filled > order.filled_size
+        if filled:
+            order.filled_size = filled
+            order.average_price = _float(_get(event, "average_filled_price"))
+        order.fees = _float(_get(event, "total_fees", order.fees))
+
+        if status == "FILLED":
+            state = FILLED
+        elif status in ("CANCELLED", "EXPIRED"):
+            state = CANCELLED
+        elif status == "FAILED":
+            state = REJECTED
+        elif filled > 0:
+            state = PARTIALLY_FILLED
+        else:
+            state = ACKED
+
+        if state == order.status and not (state == PARTIALLY_FILLED and grew):
+            return
+        self._transition(order, state, status)
+
+    def _transition(self, order, state, exchange_status=None):
+        with self._cond:
+            if state not in TRANSITIONS.get(order.status, ()):
+                # Late or duplicate update (e.g. an ack after the fill)
+                self.stale_events += 1
+                return False
+            now = self.clock.monotonic()
+            order.status = state
+            order.exchange_status = exchange_status or TRACKER_STATUS[state]
+            order.history.append((state, now))
+            if state == FILLED:
+                order.filled_at = now
+            if state in TERMINAL:
+                order.done_at = now
+            self._cond.notify_all()
+
+        if self.on_update:
+            self.on_update(order)
+
+        if state not in TERMINAL:
+            return True
+        with self._cond:
+            self._orders.pop(order.client_order_id, None)
+            self._by_exchange_id.pop(order.order_id, None)
+
+        if state == CANCELLED and order.kind == "post_only" and self.market_fallback and self._fallback(order):
+            # Its partial fill is reported together with the fallback's
+            return True
+        if order.filled_size > 0 or order.carried:
+            self._observe(self.signal_to_fill, "signal_to_fill", order.done_at - order.signal_time)
+            if self.on_fill:
+                self.on_fill(self._fill_report(order))
+        return True
+
+    def _fallback(self, order):
+        # Take whatever the resting order did not fill; False if nothing left
+        carried = (order.filled_size, order.filled_value, order.fees) if order.filled_size > 0 else None
+        if order.side == "BUY":
+            remaining = order.quote_size - order.filled_value
+            if remaining < self.increment(order.product_id, "quote"):
+                return False
+            self.fallbacks += 1
+            self._submit(order.product_id, "BUY", quote_size=remaining, signal_time=order.signal_time,
+                         post_only=False, parent=order.client_order_id, carried=carried)
+        else:
+            remaining = order.base_size - order.filled_size
+            if remaining < self.increment(order.product_id, "base"):
+                return False
+            self.fallbacks += 1
+            self._submit(order.product_id, "SELL", base_size=remaining, signal_time=order.signal_time,
+                         post_only=False, parent=order.client_order_id, carried=carried)
+        return True
+
+    def _fill_report(self, order):
+        # A fallback's fill folded together with the partial fill it replaced
+        if not order.carried:
+            return order
+        size, value, fees = order.carried
+        report = copy.copy(order)
+        report.filled_size = size + order.filled_size
+        report.average_price = (value + order.filled_value) / report.filled_size
+        report.fees = fees + order.fees
+        report.carried = None
+        return report
+
+    def _observe(self, hist, name, seconds):
+        hist.record(seconds)
+        if self.metrics is not None:
+            self.metrics.observe(name, seconds)
+
+    # --------------------------
+    # Views / background polling
+    # --------------------------
+
+    def get(self, client_order_id):
+        with self._cond:
+            return self._orders.get(client_order_id)
+
+    def live_orders(self):
+        with self._cond:
+            return [o for o in self._orders.values() if not o.done]
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="execution", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self.poll()
+            self._stopping.wait(self.poll_interval)
+
+    def stats(self):
+        with self._cond:
+            live = sum(1 for o in self._orders.values() if not o.done)
+        return {
+            "live_orders": live,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "fallbacks": self.fallbacks,
+            "unconfirmed": self.unconfirmed,
+            "stale_events": self.stale_events,
+            "poll_errors": self.poll_errors,
+            "signal_to_ack": self.signal_to_ack.summary(),
+            "signal_to_fill": self.signal_to_fill.summary(),
+        }
@@ -0,0 +1,146 @@
+import numpy as np
+
+# ==========================
+# STREAMING EMA / VARIANCE
+# ==========================
+#
+# EMAState replaces the old "append to a list, pop(0), re-run calculate_ema"
+# pattern. Each update is O(1) and the EMA keeps its full history instead of
+# being re-seeded from the oldest price in the window on every tick.
+#
+#   ema       -> exponential moving average of price
+#   variance  -> (price - ema) / ema, the same "Var" the bots trade on
+#   ew_var    -> exponentially weighted variance of price around the EMA
+#
+# value/variance stay None until `window` prices have been seen, matching the
+# warm-up behaviour of calculate_ema.
+
+
+class EMAState:
+    __slots__ = ("window", "k", "count", "ema", "ew_var", "variance")
+
+    def __init__(self, window=20):
+        self.window = window
+        self.k = 2 / (window + 1)
+        self.count = 0
+        self.ema = None
+        self.ew_var = 0.0
+        self.variance = None
+
+    @property
+    def ready(self):
+        return self.count >= self.window
+
+    @property
+    def value(self):
+        return self.ema if self.count >= self.window else None
+
+    def update(self, price):
+        if self.ema is None:
+            self.ema = price
+        else:
+            diff = price - self.ema
+            incr = self.k * diff
+            self.ema = (price * self.k) + (self.ema * (1 - self.k))
+            self.ew_var = (1 - self.k) * (self.ew_var + diff * incr)
+
+        self.count += 1
+
+        if self.count < self.window:
+            self.variance = None
+            return None
+
+        self.variance = (price - self.ema) / self.ema
+        return self.ema
+
+    def seed(self, prices):
+        # Warm start from history (e.g. candles or a saved window). Runs the
+        # same recurrence as update() so the state is exactly what it would
+        # have been had the bot seen those prices live.
+        for price in prices:
+            self.update(float(price))
+        return self.value
+
+    def set_state(self, ema, ew_var=0.0, count=None):
+        # Restore a previously saved state without replaying prices.
+        self.ema = ema
+        self.ew_var = ew_var
+        self.count = self.window if count is None else count
+        self.variance = None
+
+    def get_state(self):
+        return {"window": self.window, "count": self.count, "ema": self.ema, "ew_var": self.ew_var}
+
+
+# ==========================
+# BATCH MODE
+# ==========================
+
+def ema_batch(prices, window=20, state=None):
+    # Runs EMAState over a whole price array and returns NumPy arrays
+    # (ema, variance, ew_var). Entries before warm-up are NaN. The recurrence
+    # uses the exact same float operations as EMAState.update, so the results
+    # match the streaming object bit for bit. Passing `state` continues from
+    # (and advances) an existing EMAState.
+    prices = np.asarray(prices, dtype=np.float64)
+    n = len(prices)
+
+    if state is None:
+        state = EMAState(window)
+
+    window = state.window
+    k = state.k
+    k1 = 1 - k
+    ema = state.ema
+    ew_var = state.ew_var
+    count = state.count
+
+    ema_out = np.empty(n)
+    var_out = np.empty(n)
+
+    # The recurrence is inherently sequential; iterating a Python list of
+    # floats is much faster than indexing NumPy scalars element by element.
+    for i, price in enumerate(prices.tolist()):
+        if ema is None:
+            ema = price
+        else:
+            diff = price - ema
+            ema = (price * k) + (ema * k1)
+            ew_var = k1 * (ew_var + diff * (k * diff))
+        ema_out[i] = ema
+        var_out[i] = ew_var
+
+    warm = min(n, max(0, window - count - 1))
+    ema_out[:warm] = np.nan
+    var_out[:warm] = np.nan
+
+    variance = (prices - ema_out) / ema_out
+
+    state.ema = ema
+    state.ew_var = ew_var
+    state.count = count + n
+    if n:
+        state.variance = None if state.count < window else float(variance[-1])
+
+    return ema_out, variance, var_out
+
+
+def ema_matrix(prices, window=20):
+    # ema_batch for many independent price series at once: rows of a 2-D
+    # array, stepped together so each step is one vector operation. Same
+    # float operations as EMAState.update, so every row matches ema_batch.
+    # Returns (ema, variance) with NaN before warm-up.
+    prices = np.asarray(prices, dtype=np.float64)
+    k = 2 / (window + 1)
+    k1 = 1 - k
+
+    ema_out = np.empty_like(prices)
+    if prices.shape[-1]:
+        ema = prices[..., 0].copy()
+        ema_out[..., 0] = ema
+        for i in range(1, prices.shape[-1]):
+            ema = (prices[..., i] * k) + (ema * k1)
+            ema_out[..., i] = ema
+
+    ema_out[..., :max(0, window - 1)] = np.nan
+    return ema_out, (prices - ema_out) / ema_out
@@ -0,0 +1,180 @@
+import glob
+import mmap
+import os
+import struct
+import time
+
+import numpy as np
+
+# ==========================
+# TICK / DECISION JOURNAL
+# ==========================
+#
+# Append-only fixed-width binary records, one file per UTC day:
+#
+#   <directory>/<prefix>-YYYYMMDD.ticks
+#
+# Each file is a 64-byte header followed by 64-byte records matching
+# TICK_DTYPE. The writer packs straight into a memory-mapped file with a
+# precompiled struct (no per-tick buffers or arrays), then bumps the record
+# count in the header. Readers map the file with np.memmap, so months of
+# ticks open as zero-copy structured arrays.
+
+MAGIC = b"TICKJNL1"
+VERSION = 1
+HEADER_SIZE = 64
+RECORD_SIZE = 64
+GROW_RECORDS = 65536                   # file grows in chunks of this many records
+
+HEADER = struct.Struct("<8sIIQ")       # magic, version, record size, count
+COUNT_OFFSET = 16
+COUNT = struct.Struct("<Q")
+RECORD = struct.Struct("<dddddddBB6x")
+
+TICK_DTYPE = np.dtype({
+    "names": ["time", "price", "ema", "variance", "buy_var", "sell_var", "exposure", "decision", "reason"],
+    "formats": ["<f8", "<f8", "<f8", "<f8", "<f8", "<f8", "<f8", "u1", "u1"],
+    "offsets": [0, 8, 16, 24, 32, 40, 48, 56, 57],
+    "itemsize": RECORD_SIZE,
+})
+
+# Decision codes
+DECISION_NONE = 0
+DECISION_BUY = 1
+DECISION_SELL = 2
+DECISION_BUY_BLOCKED = 3
+DECISIONS = {
+    DECISION_NONE: "none",
+    DECISION_BUY: "buy",
+    DECISION_SELL: "sell",
+    DECISION_BUY_BLOCKED: "buy_blocked",
+}
+
+# Block reason codes (strings returned by check_buy)
+REASONS = {
+    "": 0,
+    "Exposure cap reached": 1,
+    "USD buffer protection triggered": 2,
+    "Cooldown active": 3,
+    "Variance drop not enough": 4,
+    # Account-wide limits (risk.PortfolioRisk)
+    "Portfolio exposure cap reached": 5,
+    "Asset exposure cap reached": 6,
+    "Portfolio USD buffer protection triggered": 7,
+}
+UNKNOWN_REASON = 255
+
+
+class TickJournal:
+    def __init__(self, directory, prefix):
+        self.directory = directory
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+
+        self._day = None
+        self._file = None
+        self._mm = None
+        self._count = 0
+        self._capacity = 0
+
+    def path_for(self, day):
+        return os.path.join(self.directory, f"{self.prefix}-{time.strftime('%Y%m%d', time.gmtime(day * 86400))}.ticks")
+
+    def append(self, t, price, ema, variance, buy_var, sell_var, exposure, decision=DECISION_NONE, reason=""):
+        day = int(t // 86400)
+        if day != self._day:
+            self._open(day)
+        if self._count >= self._capacity:
+            self._grow()
+
+        RECORD.pack_into(
+            self._mm,
+            HEADER_SIZE + self._count * RECORD_SIZE,
+            t, price, ema, variance, buy_var, sell_var, exposure,
+            decision, REASONS.get(reason, UNKNOWN_REASON),
+        )
+        self._count += 1
+        # Count is published after the record so readers never see a torn row
+        COUNT.pack_into(self._mm, COUNT_OFFSET, self._count)
+
+    def flush(self):
+        if self._mm is not None:
+            self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.flush()
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+            self._day = None
+
+    def _open(self, day):
+        self.close()
+        path = self.path_for(day)
+
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            self._file = open(path, "r+b")
+            magic, version, size, count = HEADER.unpack(self._file.read(HEADER.size))
+            if magic != MAGIC or size != RECORD_SIZE:
+                self._file.close()
+                raise ValueError(f"{path} is not a v{VERSION} tick journal")
+            self._count = count
+        else:
+            self._file = open(path, "w+b")
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE, 0).ljust(HEADER_SIZE, b"\0"))
+            self._count = 0
+
+        self._file.truncate(max(os.path.getsize(path), HEADER_SIZE + (self._count + GROW_RECORDS) * RECORD_SIZE))
+        self._capacity = (os.path.getsize(path) - HEADER_SIZE) // RECORD_SIZE
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+        self._day = day
+
+    def _grow(self):
+        self._mm.flush()
+        self._mm.close()
+        self._capacity += GROW_RECORDS
+        self._file.truncate(HEADER_SIZE + self._capacity * RECORD_SIZE)
+        self._mm = mmap.mmap(self._file.fileno(), 0)
+
+
+# ==========================
+# READERS
+# ==========================
+
+def read_journal(path):
+    # Zero-copy structured array of the records written so far
+    with open(path, "rb") as f:
+        magic, version, size, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or size != RECORD_SIZE:
+        raise ValueError(f"{path} is not a v{VERSION} tick journal")
+    if count == 0:
+        return np.empty(0, dtype=TICK_DTYPE)
+    return np.memmap(path, dtype=TICK_DTYPE, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+
+def journal_files(directory, prefix, start=None, end=None):
+    # Files for days in [start, end] (YYYYMMDD strings), oldest first
+    files = []
+    for path in sorted(glob.glob(os.path.join(directory, f"{prefix}-*.ticks"))):
+        day = os.path.basename(path)[len(prefix) + 1:-len(".ticks")]
+        if (start is None or day >= start) and (end is None or day <= end):
+            files.append(path)
+    return files
+
+
+def open_range(directory, prefix, start=None, end=None):
+    # One memmap per day; nothing is copied until you concatenate
+    return [read_journal(p) for p in journal_files(directory, prefix, start, end)]
+
+
+def load_ticks(directory, prefix, start=None, end=None):
+    # (timestamps, prices) for the backtester. Concatenating copies only
+    # these two columns.
+    days = open_range(directory, prefix, start, end)
+    if not days:
+        return np.empty(0), np.empty(0)
+    return (
+        np.concatenate([d["time"] for d in days]),
+        np.concatenate([d["price"] for d in days]),
+    )
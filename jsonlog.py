@@ -0,0 +1,259 @@
+import atexit
+import glob
+import gzip
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import deque
+
+# ==========================
+# ASYNC JSON-LINES LOG
+# ==========================
+#
+# log() only appends a tuple to an in-memory queue; a daemon thread formats
+# JSON lines, writes them in batches, echoes the message to stdout and
+# rotates the file:
+#
+#   <path>                          current file
+#   <path>.YYYYMMDD-HHMMSS.gz       rotated (size or time), gzip-compressed
+#
+# Rotation happens when the file would pass max_bytes or when the clock
+# crosses a rotate_interval boundary (UTC, so 86400 rotates at midnight).
+# Only the newest `backups` rotated files are kept.
+#
+# Busy events can be sampled: sample={"tick": 10} keeps one tick line in
+# ten (file and stdout), counted per `asset` field when there is one.
+# Warnings and errors are never sampled.
+#
+#   LOG = JsonLog("eth_bot.jsonl", sample={"tick": 10})
+#   LOG.log("tick", log_msg, price=current_price, variance=variance)
+#   LOG.log("error", f"[ERROR] {e}", level="error")
+
+LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+
+
+class JsonLog:
+    def __init__(
+        self,
+        path,
+        max_bytes=50 * 1024 * 1024,
+        rotate_interval=86400,
+        backups=14,
+        compress=True,
+        sample=None,
+        echo=True,
+        maxsize=100000,
+        flush_interval=1.0,
+        clock=time,
+    ):
+        # path=None: echo only, no file
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.backups = backups
+        self.compress = compress
+        self.sample = dict(sample or {})
+        self.echo = echo
+        self.maxsize = maxsize
+        self.flush_interval = flush_interval
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._seen = {}            # (event, asset) -> count, for sampling
+        self._thread = None
+        self._stopping = False
+        self._enqueued = 0
+        self._written = 0
+
+        self._file = None
+        self._size = 0
+        self._period = None
+        self._opened_at = None
+
+        self.records = 0
+        self.sampled_out = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    # --------------------------
+    # Producer side (trading loop)
+    # --------------------------
+
+    def log(self, event, message=None, level="info", **fields):
+        with self._cond:
+            if self._thread is None:
+                self._start()
+
+            every = self.sample.get(event)
+            if every and every > 1 and LEVELS.get(level, 20) < LEVELS["warning"]:
+                key = (event, fields.get("asset"))
+                seen = self._seen.get(key, 0)
+                self._seen[key] = seen + 1
+                if seen % every:
+                    self.sampled_out += 1
+                    return False
+
+            if len(self._queue) >= self.maxsize:
+                self._queue.popleft()
+                self.dropped += 1
+                self._written += 1     # counts as handled for flush()
+            self._queue.append((self.clock.time(), level, event, message, fields))
+            self._enqueued += 1
+            self._cond.notify()
+            return True
+
+    def flush(self, timeout=5.0):
+        # Blocks until everything queued so far is on disk
+        with self._cond:
+            if self._thread is None:
+                return True
+            target = self._enqueued
+            self._cond.notify()
+            return self._cond.wait_for(lambda: self._written >= target, timeout)
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "records": self.records,
+                "sampled_out": self.sampled_out,
+                "dropped": self.dropped,
+                "rotations": self.rotations,
+                "errors": self.errors,
+            }
+
+    # --------------------------
+    # Writer thread
+    # --------------------------
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="json-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._queue and not self._stopping:
+                    self._cond.wait(self.flush_interval)
+                batch = list(self._queue)
+                self._queue.clear()
+                stopping = self._stopping
+
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"[LOG ERROR] {e}", file=sys.stderr)
+
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+
+            if stopping and not batch:
+                self._close()
+                return
+
+    def _write(self, batch):
+        lines = []
+        for t, level, event, message, fields in batch:
+            record = {"ts": _iso(t), "level": level, "event": event}
+            if message is not None:
+                record["msg"] = message
+            record.update(fields)
+            lines.append(json.dumps(record, default=_default, separators=(",", ":")))
+
+            if self.path is not None:
+                self._maybe_rotate(t, len(lines[-1]) + 1)
+            if self.echo and message is not None:
+                print(message)
+
+            if self.path is not None:
+                self._file.write(lines[-1] + "\n")
+                self._size += len(lines[-1]) + 1
+
+        if self._file is not None:
+            self._file.flush()
+        self.records += len(lines)
+
+    # --------------------------
+    # Rotation
+    # --------------------------
+
+    def _maybe_rotate(self, t, size):
+        period = int(t // self.rotate_interval) if self.rotate_interval else 0
+        if self._file is None:
+            self._open(t)
+        if self._size and (period != self._period or (self.max_bytes and self._size + size > self.max_bytes)):
+            self._rotate()
+            self._open(t)
+
+    def _open(self, t):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        # A non-empty file left by an earlier run keeps its own period (from
+        # its mtime), so a restart after midnight still rotates it out
+        self._opened_at = os.path.getmtime(self.path) if self._size else t
+        self._period = int(self._opened_at // self.rotate_interval) if self.rotate_interval else 0
+
+    def _rotate(self):
+        self._close()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self._opened_at))
+        target = f"{self.path}.{stamp}"
+        n = 1
+        while os.path.exists(target) or os.path.exists(target + ".gz"):
+            target = f"{self.path}.{stamp}-{n}"
+            n += 1
+        os.replace(self.path, target)
+        if self.compress:
+            with open(target, "rb") as src, gzip.open(target + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(target)
+        self.rotations += 1
+        self._prune()
+
+    def _prune(self):
+        rotated = sorted(glob.glob(glob.escape(self.path) + ".*"), key=os.path.getmtime)
+        for old in rotated[:-self.backups] if self.backups else rotated:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    def _close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _iso(t):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)) + f".{int(t % 1 * 1000):03d}Z"
+
+
+def _default(value):
+    # numpy scalars and anything else json can't encode
+    item = getattr(value, "item", None)
+    if item is not None:
+        return item()
+    return str(value)
@@ -0,0 +1,203 @@
+import asyncio
+import json
+import random
+import threading
+import time
+
+from transport import TRANSPORT
+
+# ==========================
+# STREAMING MARKET DATA
+# ==========================
+#
+# TickerFeed keeps the latest ticker price per product in memory, fed by the
+# exchange WebSocket ticker channel on a background thread. get_price() is a
+# dict lookup; only when the stream is stale (or down) does it fall back to a
+# REST spot poll.
+
+WS_URL = "wss://advanced-trade-ws.coinbase.com"
+SPOT_URL = "https://api.coinbase.com/v2/prices/{product_id}/spot"
+
+
+def fetch_spot_price(product_id):
+    r = TRANSPORT.get(SPOT_URL.format(product_id=product_id), endpoint="price").json()
+    return float(r["data"]["amount"])
+
+
+class TickerFeed:
+    def __init__(
+        self,
+        product_ids,
+        url=WS_URL,
+        stale_after=10.0,
+        fallback=fetch_spot_price,
+        backoff_initial=0.5,
+        backoff_max=30.0,
+    ):
+        self.product_ids = list(product_ids)
+        self.url = url
+        self.stale_after = stale_after
+        self.fallback = fallback
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+
+        self._lock = threading.Lock()
+        self._prices = {}          # product_id -> (price, monotonic receive time)
+        self._sequence = {}        # product_id -> updates received so far
+        self._listeners = []
+        self._thread = None
+        self._stopping = threading.Event()
+        self._last_message = 0.0
+
+        self.connected = False
+        self.connects = 0
+        self.messages = 0
+        self.fallbacks = 0
+        self.last_error = None
+
+    # --------------------------
+    # Consumer side
+    # --------------------------
+
+    def latest(self, product_id):
+        # (price, age_seconds) from the stream, or None if nothing received yet
+        with self._lock:
+            entry = self._prices.get(product_id)
+        if entry is None:
+            return None
+        price, received = entry
+        return price, time.monotonic() - received
+
+    def sequence(self, product_id):
+        # Stream updates seen for product_id; unchanged means no new tick
+        with self._lock:
+            return self._sequence.get(product_id, 0)
+
+    def is_fresh(self, product_id):
+        entry = self.latest(product_id)
+        return entry is not None and entry[1] <= self.stale_after
+
+    def get_price(self, product_id):
+        if self._thread is None:
+            self.start()
+
+        entry = self.latest(product_id)
+        if entry is not None and entry[1] <= self.stale_after:
+            return entry[0]
+
+        if self.fallback is None:
+            raise RuntimeError(f"No fresh {product_id} price from stream")
+
+        self.fallbacks += 1
+        return self.fallback(product_id)
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "connects": self.connects,
+            "messages": self.messages,
+            "fallbacks": self.fallbacks,
+            "last_error": self.last_error,
+            "ages": {p: self.latest(p)[1] for p in self.product_ids if self.latest(p)},
+        }
+
+    # --------------------------
+    # Lifecycle
+    # --------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._thread_main, name="ticker-feed", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def add_listener(self, fn):
+        # fn(product_id, price) on every update, on the feed thread; keep it cheap
+        self._listeners.append(fn)
+
+    def on_price(self, product_id, price):
+        # Also used by anything else that learns a fresh price (e.g. REST)
+        with self._lock:
+            self._prices[product_id] = (price, time.monotonic())
+            self._sequence[product_id] = self._sequence.get(product_id, 0) + 1
+        for fn in self._listeners:
+            fn(product_id, price)
+
+    # --------------------------
+    # Stream worker
+    # --------------------------
+
+    def _thread_main(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        import websockets
+
+        backoff = self.backoff_initial
+
+        while not self._stopping.is_set():
+            try:
+                async with websockets.connect(self.url, open_timeout=10, close_timeout=1) as ws:
+                    for channel in ("ticker", "heartbeats"):
+                        await ws.send(json.dumps({
+                            "type": "subscribe",
+                            "product_ids": self.product_ids,
+                            "channel": channel,
+                        }))
+                    self._last_message = time.monotonic()
+                    self.connected = True
+                    self.connects += 1
+                    backoff = self.backoff_initial
+
+                    while not self._stopping.is_set():
+                        try:
+                            raw = await asyncio.wait_for(ws.recv(), timeout=min(1.0, self.stale_after))
+                        except asyncio.TimeoutError:
+                            # No ticker and no heartbeat for a full stale window: the
+                            # connection is dead even if the socket hasn't noticed.
+                            if self._silent_for() > self.stale_after:
+                                raise ConnectionError("Ticker stream went silent")
+                            continue
+                        self._handle(raw)
+
+            except Exception as e:
+                self.last_error = str(e)
+            finally:
+                self.connected = False
+
+            if self._stopping.is_set():
+                break
+
+            # Jittered exponential backoff before reconnecting
+            delay = backoff * (0.5 + random.random() / 2)
+            backoff = min(backoff * 2, self.backoff_max)
+            self._stopping.wait(delay)
+
+    def _silent_for(self):
+        return time.monotonic() - self._last_message
+
+    def _handle(self, raw):
+        self._last_message = time.monotonic()
+        self.messages += 1
+
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return
+
+        if data.get("channel") != "ticker":
+            return
+
+        for event in data.get("events", []):
+            for ticker in event.get("tickers", []):
+                try:
+                    self.on_price(ticker["product_id"], float(ticker["price"]))
+                except (KeyError, TypeError, ValueError):
+                    continue
@@ -0,0 +1,235 @@
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================
+# HOT-PATH METRICS
+# ==========================
+#
+# Stage timers feed HDR-style log-linear histograms (fixed bucket array,
+# ~3% relative precision, no allocation per sample). Counters are plain
+# dict increments. Export runs off the loop thread: a Prometheus textfile
+# rewritten periodically and/or a tiny local HTTP endpoint serving
+# /metrics (Prometheus) and /metrics.json.
+#
+#   with METRICS.stage("get_current_price"):
+#       price = get_current_price()
+#   METRICS.inc("buy_blocked", reason=reason)
+
+SUB_BUCKET_BITS = 6                    # 32-64 sub-buckets per power of two (~3%)
+HALF = 1 << (SUB_BUCKET_BITS - 1)
+BUCKETS = 64 * HALF                    # covers up to 2^63 microseconds
+QUANTILES = (0.5, 0.9, 0.99, 0.999)
+
+
+class LatencyHistogram:
+    __slots__ = ("counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    def record(self, seconds):
+        us = int(seconds * 1_000_000)
+        if us < 0:
+            us = 0
+        shift = us.bit_length() - SUB_BUCKET_BITS
+        if shift <= 0:
+            idx = us
+        else:
+            idx = shift * HALF + (us >> shift)
+        self.counts[idx] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def bucket_value(idx):
+        # Upper bound (seconds) of a bucket
+        if idx < 2 * HALF:
+            return (idx + 1) / 1_000_000
+        shift = idx // HALF - 1
+        m = idx - shift * HALF
+        return ((m + 1) << shift) / 1_000_000
+
+    def percentile(self, q):
+        if not self.count:
+            return 0.0
+        target = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for idx, c in enumerate(self.counts):
+            if c:
+                seen += c
+                if seen >= target:
+                    return min(self.bucket_value(idx), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min or 0.0,
+            "max": self.max,
+            "mean": self.total / self.count if self.count else 0.0,
+            **{f"p{q * 100:g}": self.percentile(q) for q in QUANTILES},
+        }
+
+
+class _StageTimer:
+    # One per stage() call: stages also run on the notifier, order-tracker
+    # and execution threads, so a shared start time would race.
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist):
+        self.hist = hist
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.record(time.perf_counter() - self.start)
+        return False
+
+
+class Metrics:
+    def __init__(self, prefix="bot"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._hists = {}
+        self._counters = {}
+        self._tick_start = None
+        self._exporter = None
+        self._server = None
+
+    # --------------------------
+    # Recording (hot path)
+    # --------------------------
+
+    def histogram(self, name):
+        hist = self._hists.get(name)
+        if hist is None:
+            with self._lock:
+                hist = self._hists.setdefault(name, LatencyHistogram())
+        return hist
+
+    def stage(self, name):
+        return _StageTimer(self.histogram(name))
+
+    def observe(self, name, seconds):
+        self.histogram(name).record(seconds)
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + n
+
+    def mark_tick(self):
+        self._tick_start = time.perf_counter()
+
+    def observe_since_tick(self, name):
+        if self._tick_start is not None:
+            self.observe(name, time.perf_counter() - self._tick_start)
+
+    # --------------------------
+    # Export
+    # --------------------------
+
+    def snapshot(self):
+        with self._lock:
+            hists = dict(self._hists)
+        counters = dict(self._counters)
+        return {
+            "timestamp": time.time(),
+            "latency_seconds": {name: h.summary() for name, h in sorted(hists.items())},
+            "counters": [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(counters.items())
+            ],
+        }
+
+    def prometheus_text(self):
+        snap = self.snapshot()
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_latency_seconds Trading loop stage latency.",
+            f"# TYPE {p}_stage_latency_seconds summary",
+        ]
+        for name, s in snap["latency_seconds"].items():
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_latency_seconds{{stage="{name}",quantile="{q:g}"}} {s[f"p{q * 100:g}"]:.6f}')
+            lines.append(f'{p}_stage_latency_seconds_sum{{stage="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'{p}_stage_latency_seconds_count{{stage="{name}"}} {s["count"]}')
+        lines.append(f"# TYPE {p}_stage_latency_max_seconds gauge")
+        for name, s in snap["latency_seconds"].items():
+            lines.append(f'{p}_stage_latency_max_seconds{{stage="{name}"}} {s["max"]:.6f}')
+
+        seen = set()
+        for c in snap["counters"]:
+            metric = f"{p}_{c['name']}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            labels = ",".join(f'{k}="{_escape(v)}"' for k, v in c["labels"].items())
+            lines.append(f"{metric}{{{labels}}} {c['value']}" if labels else f"{metric} {c['value']}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        # Atomic replace so node_exporter never reads a partial file
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def start_exporter(self, path=None, interval=15.0, port=None, host="127.0.0.1"):
+        if path and self._exporter is None:
+            def loop():
+                while True:
+                    try:
+                        self.write_textfile(path)
+                    except Exception as e:
+                        print(f"[METRICS ERROR] {e}")
+                    time.sleep(interval)
+            self._exporter = threading.Thread(target=loop, name="metrics-textfile", daemon=True)
+            self._exporter.start()
+
+        if port is not None and self._server is None:
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.startswith("/metrics.json"):
+                        body, ctype = json.dumps(metrics.snapshot()).encode(), "application/json"
+                    elif self.path.startswith("/metrics"):
+                        body, ctype = metrics.prometheus_text().encode(), "text/plain; version=0.0.4"
+                    else:
+                        self.send_response(404)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header("Content-Type", ctype)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
@@ -0,0 +1,475 @@
+import argparse
+import inspect
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtest import (
+    BUY_COOLDOWN_SECONDS,
+    START_BASE,
+    START_USD,
+    VARIANCE_DROP_REQUIRED,
+    WINDOW,
+    load_ticks,
+)
+from indicators import ema_matrix
+from strategy import (
+    BUFFER_PARAMS,
+    BUY_SIZE_PARAMS,
+    EXPOSURE_PARAMS,
+    UnifiedVarianceEngine,
+    get_adaptive_buffer,
+    get_adaptive_buy_size,
+    get_adaptive_exposure,
+    risk_kwargs,
+)
+
+# ==========================
+# MONTE CARLO RISK SIMULATOR
+# ==========================
+#
+# Runs the backtest rules (engine thresholds, check_buy gates, adaptive
+# sizing, fills, W/L streaks) over thousands of synthetic price paths at
+# once. Paths are rows of a (paths, steps) matrix; the stateful part steps
+# through time with every path's state held in NumPy vectors, so one step is
+# a handful of vector operations for all paths. A one-path run reproduces
+# backtest.run_backtest.
+#
+# Path models:
+#   gbm        geometric Brownian motion (annualised mu / sigma)
+#   jump       GBM plus Poisson log-normal jumps (Merton)
+#   bootstrap  block bootstrap of historical log returns (keeps vol clusters)
+#
+# Paths are generated and simulated in chunks on every core; each chunk gets
+# its own seed from one SeedSequence, so results don't depend on the number
+# of workers.
+#
+#   summary = summarize(run_monte_carlo("jump", n_paths=20000, n_steps=5760))
+#   print(format_report(summary))
+
+SECONDS_PER_YEAR = 365 * 86400
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+MODEL_DEFAULTS = {
+    "gbm": {"mu": 0.0, "sigma": 0.7},
+    "jump": {"mu": 0.0, "sigma": 0.6, "jump_rate": 50.0, "jump_mean": -0.01, "jump_std": 0.03},
+    "bootstrap": {"block": 60},
+}
+
+# check_buy's reasons in gate order, then run_backtest's own
+BLOCK_REASONS = (
+    "Exposure cap reached",
+    "USD buffer protection triggered",
+    "Cooldown active",
+    "Variance drop not enough",
+    "No USD",
+)
+
+
+# --------------------------
+# Path generators
+# --------------------------
+
+def gbm_paths(rng, n_paths, n_steps, s0, dt, mu=0.0, sigma=0.7):
+    # dt in seconds; mu / sigma annualised
+    t = dt / SECONDS_PER_YEAR
+    steps = rng.standard_normal((n_paths, n_steps - 1)) * (sigma * np.sqrt(t)) + (mu - 0.5 * sigma ** 2) * t
+    return _from_log_returns(s0, steps)
+
+
+def jump_paths(rng, n_paths, n_steps, s0, dt, mu=0.0, sigma=0.6, jump_rate=50.0, jump_mean=-0.01, jump_std=0.03):
+    # jump_rate: expected jumps per year; jump sizes are N(jump_mean, jump_std)
+    # in log space. The drift is compensated so mu stays the expected return.
+    t = dt / SECONDS_PER_YEAR
+    kappa = np.exp(jump_mean + 0.5 * jump_std ** 2) - 1
+    steps = rng.standard_normal((n_paths, n_steps - 1)) * (sigma * np.sqrt(t))
+    steps += (mu - 0.5 * sigma ** 2 - jump_rate * kappa) * t
+    jumps = rng.poisson(jump_rate * t, (n_paths, n_steps - 1))
+    hit = jumps > 0
+    steps[hit] += rng.normal(jump_mean * jumps[hit], jump_std * np.sqrt(jumps[hit]))
+    return _from_log_returns(s0, steps)
+
+
+def bootstrap_paths(rng, n_paths, n_steps, s0, returns, block=60):
+    # Block bootstrap of historical per-step log returns
+    returns = np.asarray(returns, dtype=np.float64)
+    block = max(1, min(block, len(returns)))
+    n_blocks = -(-(n_steps - 1) // block)
+    starts = rng.integers(0, len(returns) - block + 1, (n_paths, n_blocks))
+    idx = (starts[..., None] + np.arange(block)).reshape(n_paths, -1)[:, :n_steps - 1]
+    return _from_log_returns(s0, returns[idx])
+
+
+def _from_log_returns(s0, steps):
+    paths = np.empty((steps.shape[0], steps.shape[1] + 1))
+    paths[:, 0] = 0.0
+    np.cumsum(steps, axis=1, out=paths[:, 1:])
+    np.exp(paths, out=paths)
+    paths *= s0
+    return paths
+
+
+GENERATORS = {"gbm": gbm_paths, "jump": jump_paths}
+
+
+# --------------------------
+# Vectorized protection / sizing rules
+# --------------------------
+
+def _defaults(fn, names, overrides):
+    # Keyword defaults of a strategy.py helper, with risk_params overrides
+    params = inspect.signature(fn).parameters
+    values = {n: params[n].default for n in names}
+    values.update(overrides)
+    return values
+
+
+def adaptive_exposure(balance, risk_params=None):
+    # get_adaptive_exposure over arrays
+    p = _defaults(get_adaptive_exposure, EXPOSURE_PARAMS, risk_kwargs(risk_params, EXPOSURE_PARAMS))
+    return np.maximum(p["min_exposure"], np.minimum(balance * p["exposure_percent"], p["max_exposure"]))
+
+
+def adaptive_buffer(balance, risk_params=None):
+    # get_adaptive_buffer over arrays
+    p = _defaults(get_adaptive_buffer, BUFFER_PARAMS, risk_kwargs(risk_params, BUFFER_PARAMS))
+    return np.maximum(p["min_buffer"], np.minimum(balance * p["buffer_percent"], p["max_buffer"]))
+
+
+def adaptive_buy_size(total_equity, variance, recent_wins, recent_losses, risk_params=None):
+    # get_adaptive_buy_size over arrays
+    p = _defaults(get_adaptive_buy_size, BUY_SIZE_PARAMS, risk_kwargs(risk_params, BUY_SIZE_PARAMS))
+    vol_factor = np.maximum(p["vol_min"], np.minimum(p["vol_max"], 1 - np.abs(variance) * p["vol_scale"]))
+    trend_factor = 1 + (recent_wins * p["streak_step"]) - (recent_losses * p["streak_step"])
+    trend_factor = np.maximum(p["trend_min"], np.minimum(p["trend_max"], trend_factor))
+    pct = np.minimum(p["base_pct"] * vol_factor * trend_factor, p["max_pct"])
+    return total_equity * pct
+
+
+# --------------------------
+# Simulation
+# --------------------------
+
+def simulate(
+    paths,
+    dt=15.0,
+    engine_params=None,
+    window=WINDOW,
+    usd_balance=START_USD,
+    base_balance=START_BASE,
+    cooldown_seconds=BUY_COOLDOWN_SECONDS,
+    variance_drop_required=VARIANCE_DROP_REQUIRED,
+    fee_rate=0.0,
+    risk_params=None,
+    ruin_fraction=0.5,
+    timestamps=None,
+):
+    # paths: (n_paths, n_steps) prices sampled every dt seconds (or at
+    # `timestamps`). Returns per-path result arrays.
+    paths = np.atleast_2d(np.asarray(paths, dtype=np.float64))
+    n_paths, n_steps = paths.shape
+    if timestamps is None:
+        timestamps = np.arange(n_steps) * float(dt)
+    engine = UnifiedVarianceEngine(**(engine_params or {}))
+
+    # --- VECTORIZED: EMA, variance, engine thresholds ---
+    _, variance = ema_matrix(paths, window)
+    start = window - 1
+    ts = np.asarray(timestamps, dtype=np.float64)[start:]
+    px = paths[:, start:]
+    var = variance[:, start:]
+    buy_base, sell_th = engine.threshold_matrix(var)
+    lo, hi = engine.buy_clamp_min, engine.buy_clamp_max
+
+    # --- STATEFUL: every path's state as one vector ---
+    usd = np.full(n_paths, float(usd_balance))
+    base = np.full(n_paths, float(base_balance))
+    cost_basis = np.zeros(n_paths)
+    last_buy_time = np.full(n_paths, -np.inf)          # no buy yet
+    last_buy_price = np.full(n_paths, np.nan)          # None
+    recent_wins = np.zeros(n_paths)
+    recent_losses = np.zeros(n_paths)
+    buys = np.zeros(n_paths, dtype=np.int64)
+    sells = np.zeros(n_paths, dtype=np.int64)
+    wins = np.zeros(n_paths, dtype=np.int64)
+    losses = np.zeros(n_paths, dtype=np.int64)
+    blocked = np.zeros((len(BLOCK_REASONS), n_paths), dtype=np.int64)
+    realized_pnl = np.zeros(n_paths)
+
+    start_equity = usd + base * px[:, 0] if px.shape[1] else usd.copy()
+    peak = start_equity.copy()
+    max_drawdown = np.zeros(n_paths)
+    min_equity = start_equity.copy()
+    exposure_breaches = np.zeros(n_paths, dtype=np.int64)   # ticks above the exposure cap
+    buffer_breaches = np.zeros(n_paths, dtype=np.int64)     # buys that left less than the buffer
+    max_exposure_pct = np.zeros(n_paths)
+
+    for i in range(px.shape[1]):
+        price = px[:, i]
+        v = var[:, i]
+        now = ts[i]
+
+        base_value = base * price
+        total_equity = usd + base_value
+        exposure_pct = np.where(total_equity > 0, base_value / np.where(total_equity > 0, total_equity, 1.0), 0.0)
+
+        if i < 2:
+            buy_var = buy_base[:, i]
+        else:
+            buy_var = np.maximum(lo, np.minimum(buy_base[:, i] * (1 + exposure_pct), hi))
+
+        buy_signal = v <= buy_var
+        sell_signal = ~buy_signal & (v >= sell_th[:, i]) & (base > 0)
+
+        # check_buy, first failing gate wins
+        if buy_signal.any():
+            max_exposure_usd = adaptive_exposure(usd, risk_params)
+            usd_buffer = adaptive_buffer(usd, risk_params)
+            with np.errstate(invalid="ignore"):
+                drop = (last_buy_price - price) / last_buy_price
+            gates = (
+                base_value >= max_exposure_usd,
+                usd - price < usd_buffer,
+                now - last_buy_time < cooldown_seconds,
+                ~np.isnan(last_buy_price) & (drop < variance_drop_required),
+            )
+            open_ = buy_signal.copy()
+            size = np.minimum(adaptive_buy_size(total_equity, v, recent_wins, recent_losses, risk_params), usd)
+            for j, gate in enumerate(gates + (size <= 0,)):
+                blocked[j] += open_ & gate
+                open_ &= ~gate
+
+            buy = open_
+            if buy.any():
+                size = np.where(buy, size, 0.0)
+                usd -= size
+                base += size * (1 - fee_rate) / price
+                cost_basis += size
+                last_buy_time = np.where(buy, now, last_buy_time)
+                last_buy_price = np.where(buy, price, last_buy_price)
+                buys += buy
+                buffer_breaches += buy & (usd < usd_buffer)
+
+        if sell_signal.any():
+            proceeds = np.where(sell_signal, base * price * (1 - fee_rate), 0.0)
+            realized_pnl += np.where(sell_signal, proceeds - cost_basis, 0.0)
+            usd += proceeds
+            base = np.where(sell_signal, 0.0, base)
+            cost_basis = np.where(sell_signal, 0.0, cost_basis)
+            sells += sell_signal
+
+            # Same W/L bookkeeping as record_sell()
+            scored = sell_signal & ~np.isnan(last_buy_price)
+            won = scored & (price - last_buy_price > 0)
+            lost = scored & ~won
+            recent_wins += won
+            recent_losses += lost
+            wins += won
+            losses += lost
+            last_buy_price = np.where(scored, np.nan, last_buy_price)
+
+        # Equity / risk after this tick's fills
+        base_value = base * price
+        equity = usd + base_value
+        np.maximum(peak, equity, out=peak)
+        drawdown = (peak - equity) / np.where(peak > 0, peak, 1.0)
+        np.maximum(max_drawdown, drawdown, out=max_drawdown)
+        np.minimum(min_equity, equity, out=min_equity)
+        exposure_breaches += base_value > adaptive_exposure(usd, risk_params)
+        np.maximum(max_exposure_pct, np.where(equity > 0, base_value / np.where(equity > 0, equity, 1.0), 0.0), out=max_exposure_pct)
+
+    final_equity = usd + base * (px[:, -1] if px.shape[1] else 0.0)
+    return {
+        "start_equity": start_equity,
+        "final_equity": final_equity,
+        "pnl": final_equity - start_equity,
+        "realized_pnl": realized_pnl,
+        "max_drawdown": max_drawdown,
+        "min_equity": min_equity,
+        "ruined": min_equity <= start_equity * ruin_fraction,
+        "buys": buys,
+        "sells": sells,
+        "wins": wins,
+        "losses": losses,
+        "blocked": {reason: blocked[j] for j, reason in enumerate(BLOCK_REASONS)},
+        "exposure_breaches": exposure_breaches,
+        "buffer_breaches": buffer_breaches,
+        "max_exposure_pct": max_exposure_pct,
+    }
+
+
+# --------------------------
+# Parallel runs
+# --------------------------
+
+def _simulate_chunk(model, seed, n_paths, n_steps, s0, dt, model_kwargs, sim_kwargs):
+    # Runs in a worker: generates its own paths so only seeds cross processes
+    rng = np.random.default_rng(seed)
+    if model == "bootstrap":
+        paths = bootstrap_paths(rng, n_paths, n_steps, s0, **model_kwargs)
+    else:
+        paths = GENERATORS[model](rng, n_paths, n_steps, s0, dt, **model_kwargs)
+    return simulate(paths, dt=dt, **sim_kwargs)
+
+
+def _merge(results):
+    merged = {}
+    for key, value in results[0].items():
+        if isinstance(value, dict):
+            merged[key] = {k: np.concatenate([r[key][k] for r in results]) for k in value}
+        else:
+            merged[key] = np.concatenate([r[key] for r in results])
+    return merged
+
+
+def run_monte_carlo(
+    model="gbm",
+    n_paths=10000,
+    n_steps=5760,
+    s0=3000.0,
+    dt=15.0,
+    seed=None,
+    chunk_size=500,
+    workers=None,
+    model_kwargs=None,
+    **sim_kwargs,
+):
+    # model_kwargs: generator options (MODEL_DEFAULTS); "bootstrap" needs
+    # returns=<per-step log returns>. sim_kwargs go to simulate().
+    if model not in MODEL_DEFAULTS:
+        raise ValueError(f"Unknown model {model!r}")
+    model_kwargs = dict(MODEL_DEFAULTS[model], **(model_kwargs or {}))
+    if model == "bootstrap" and "returns" not in model_kwargs:
+        raise ValueError("bootstrap model needs returns=<historical log returns>")
+
+    sizes = [chunk_size] * (n_paths // chunk_size)
+    if n_paths % chunk_size:
+        sizes.append(n_paths % chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    args = [(model, s, n, n_steps, s0, dt, model_kwargs, sim_kwargs) for s, n in zip(seeds, sizes)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(args) == 1:
+        results = [_simulate_chunk(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(args))) as pool:
+            results = list(pool.map(_simulate_chunk, *zip(*args)))
+    return _merge(results)
+
+
+def historical_returns(path):
+    # Per-tick log returns and the median tick spacing of a backtest file
+    timestamps, prices = load_ticks(path)
+    returns = np.diff(np.log(prices))
+    dt = float(np.median(np.diff(timestamps))) if len(timestamps) > 1 else 15.0
+    return returns, dt, float(prices[-1])
+
+
+# --------------------------
+# Reporting
+# --------------------------
+
+def summarize(result, quantiles=QUANTILES):
+    def dist(values):
+        values = np.asarray(values, dtype=np.float64)
+        return {"mean": float(values.mean()), **{f"p{q * 100:g}": float(np.quantile(values, q)) for q in quantiles}}
+
+    trades = result["buys"] + result["sells"]
+    scored = result["wins"] + result["losses"]
+    return {
+        "paths": len(result["pnl"]),
+        "pnl": dist(result["pnl"]),
+        "return_pct": dist(result["pnl"] / result["start_equity"] * 100),
+        "max_drawdown": dist(result["max_drawdown"]),
+        "trades": dist(trades),
+        "win_rate": float(result["wins"].sum() / scored.sum() * 100) if scored.sum() else 0.0,
+        "ruin_probability": float(result["ruined"].mean()),
+        "loss_probability": float((result["pnl"] < 0).mean()),
+        "exposure_breach_probability": float((result["exposure_breaches"] > 0).mean()),
+        "exposure_breach_ticks": dist(result["exposure_breaches"]),
+        "buffer_breach_probability": float((result["buffer_breaches"] > 0).mean()),
+        "max_exposure_pct": dist(result["max_exposure_pct"] * 100),
+        "blocked": {reason: float(v.mean()) for reason, v in result["blocked"].items()},
+    }
+
+
+def format_report(summary):
+    def row(name, d, fmt="{:.2f}"):
+        cells = " ".join(f"{k}={fmt.format(v)}" for k, v in d.items())
+        return f"{name:<16} {cells}"
+
+    lines = [
+        f"Paths: {summary['paths']}",
+        row("PnL ($)", summary["pnl"]),
+        row("Return (%)", summary["return_pct"]),
+        row("Max drawdown", summary["max_drawdown"], "{:.2%}"),
+        row("Trades", summary["trades"], "{:.1f}"),
+        row("Max exposure %", summary["max_exposure_pct"], "{:.1f}"),
+        row("Exposure breach", summary["exposure_breach_ticks"], "{:.1f}"),
+        f"Win rate: {summary['win_rate']:.2f}%",
+        f"P(ruin): {summary['ruin_probability']:.2%}",
+        f"P(loss): {summary['loss_probability']:.2%}",
+        f"P(exposure breach): {summary['exposure_breach_probability']:.2%}",
+        f"P(buffer breach): {summary['buffer_breach_probability']:.2%}",
+        "Blocked buys per path: " + (", ".join(f"{k}: {v:.1f}" for k, v in summary["blocked"].items() if v) or "none"),
+    ]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo risk report for the EMA + UnifiedVarianceEngine strategy.")
+    parser.add_argument("model", choices=sorted(MODEL_DEFAULTS))
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--steps", type=int, default=5760, help="ticks per path (5760 = one day of 15s ticks)")
+    parser.add_argument("--s0", type=float, default=3000.0)
+    parser.add_argument("--dt", type=float, default=15.0, help="seconds between ticks")
+    parser.add_argument("--mu", type=float)
+    parser.add_argument("--sigma", type=float)
+    parser.add_argument("--jump-rate", type=float)
+    parser.add_argument("--jump-mean", type=float)
+    parser.add_argument("--jump-std", type=float)
+    parser.add_argument("--history", help="price file for the bootstrap model (see backtest.load_ticks)")
+    parser.add_argument("--block", type=int)
+    parser.add_argument("--window", type=int, default=WINDOW)
+    parser.add_argument("--usd", type=float, default=START_USD)
+    parser.add_argument("--base", type=float, default=START_BASE)
+    parser.add_argument("--fee", type=float, default=0.0)
+    parser.add_argument("--ruin", type=float, default=0.5, help="ruin = equity at or below this fraction of the start")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--chunk", type=int, default=500)
+    args = parser.parse_args(argv)
+
+    options = {
+        "mu": args.mu, "sigma": args.sigma, "jump_rate": args.jump_rate,
+        "jump_mean": args.jump_mean, "jump_std": args.jump_std, "block": args.block,
+    }
+    model_kwargs = {k: v for k, v in options.items() if v is not None and k in MODEL_DEFAULTS[args.model]}
+    s0, dt = args.s0, args.dt
+    if args.model == "bootstrap":
+        if not args.history:
+            parser.error("bootstrap needs --history")
+        model_kwargs["returns"], dt, s0 = historical_returns(args.history)
+
+    result = run_monte_carlo(
+        args.model,
+        n_paths=args.paths,
+        n_steps=args.steps,
+        s0=s0,
+        dt=dt,
+        seed=args.seed,
+        chunk_size=args.chunk,
+        workers=args.workers,
+        model_kwargs=model_kwargs,
+        window=args.window,
+        usd_balance=args.usd,
+        base_balance=args.base,
+        fee_rate=args.fee,
+        ruin_fraction=args.ruin,
+    )
+    print(format_report(summarize(result)))
+
+
+if __name__ == "__main__":
+    main()
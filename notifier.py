@@ -0,0 +1,212 @@
+import atexit
+import threading
+import time
+from collections import deque
+
+from transport import TRANSPORT
+
+# ==========================
+# BACKGROUND DISCORD NOTIFIER
+# ==========================
+#
+# send() only appends to an in-memory queue; a daemon thread does the HTTP.
+#
+#   priority webhooks  -> sent first, dropped last (ALERTS_WEBHOOK)
+#   digest webhooks    -> lines are coalesced and posted every
+#                         digest_interval seconds (LOGS_WEBHOOK)
+#   everything else    -> sent in order
+#
+# Discord 429 responses are honoured using retry_after / Retry-After.
+# HTTP goes through the shared pooled transport.
+
+DISCORD_LIMIT = 2000     # max characters per message
+
+
+class DiscordNotifier:
+    def __init__(
+        self,
+        priority_webhooks=(),
+        digest_webhooks=(),
+        digest_interval=30.0,
+        maxsize=1000,
+        max_retries=3,
+        transport=None,
+    ):
+        self.priority_webhooks = set(priority_webhooks)
+        self.digest_webhooks = set(digest_webhooks)
+        self.digest_interval = digest_interval
+        self.maxsize = maxsize
+        self.max_retries = max_retries
+        self.transport = transport or TRANSPORT
+
+        self._cond = threading.Condition()
+        self._priority = deque()
+        self._normal = deque()
+        self._digests = {}
+        self._next_digest = time.monotonic() + digest_interval
+        self._thread = None
+        self._stopping = False
+
+        self.sent = 0
+        self.dropped = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    # --------------------------
+    # Producer side (trading loop)
+    # --------------------------
+
+    def send(self, webhook, message):
+        with self._cond:
+            if self._thread is None:
+                self._start()
+
+            if webhook in self.digest_webhooks:
+                lines = self._digests.setdefault(webhook, deque())
+                if len(lines) >= self.maxsize:
+                    lines.popleft()
+                    self.dropped += 1
+                lines.append(message)
+                return True
+
+            if self._depth() >= self.maxsize:
+                # Shed routine messages before alerts
+                if self._normal:
+                    self._normal.popleft()
+                    self.dropped += 1
+                elif webhook not in self.priority_webhooks:
+                    self.dropped += 1
+                    return False
+                else:
+                    self._priority.popleft()
+                    self.dropped += 1
+
+            if webhook in self.priority_webhooks:
+                self._priority.append((webhook, message))
+            else:
+                self._normal.append((webhook, message))
+            self._cond.notify()
+            return True
+
+    def queue_depth(self):
+        with self._cond:
+            return self._depth() + sum(len(v) for v in self._digests.values())
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queue_depth": self._depth(),
+                "digest_lines": sum(len(v) for v in self._digests.values()),
+                "sent": self.sent,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+            }
+
+    def flush_digests(self):
+        with self._cond:
+            self._next_digest = 0
+            self._cond.notify()
+
+    def stop(self, timeout=5.0):
+        # Flushes digests and drains the queue (up to `timeout` seconds).
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._next_digest = 0
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    # --------------------------
+    # Worker side
+    # --------------------------
+
+    def _depth(self):
+        return len(self._priority) + len(self._normal)
+
+    def _start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="discord-notifier", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def _take_digest(self):
+        for webhook, lines in self._digests.items():
+            if not lines:
+                continue
+            chunks, chunk = [], ""
+            while lines:
+                line = lines.popleft()[:DISCORD_LIMIT]
+                if chunk and len(chunk) + 1 + len(line) > DISCORD_LIMIT:
+                    chunks.append(chunk)
+                    chunk = line
+                else:
+                    chunk = f"{chunk}\n{line}" if chunk else line
+            chunks.append(chunk)
+            return [(webhook, c) for c in chunks]
+        return []
+
+    def _next_batch(self):
+        with self._cond:
+            while True:
+                if self._priority:
+                    return [self._priority.popleft()]
+
+                now = time.monotonic()
+                if now >= self._next_digest:
+                    batch = self._take_digest()
+                    if batch:
+                        return batch
+                    self._next_digest = now + self.digest_interval
+
+                if self._normal:
+                    return [self._normal.popleft()]
+
+                if self._stopping:
+                    return None
+
+                self._cond.wait(max(0.0, self._next_digest - now))
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            for webhook, message in batch:
+                self._post(webhook, message)
+
+    def _post(self, webhook, message):
+        for _ in range(self.max_retries + 1):
+            try:
+                # 429s are handled below using Discord's retry_after
+                r = self.transport.post(webhook, endpoint="webhook", retry=False, json={"content": message})
+            except Exception as e:
+                self.errors += 1
+                print(f"[DISCORD ERROR] {e}")
+                return False
+
+            if r.status_code != 429:
+                if r.status_code >= 400:
+                    self.errors += 1
+                    print(f"[DISCORD ERROR] HTTP {r.status_code}")
+                    return False
+                self.sent += 1
+                return True
+
+            self.rate_limited += 1
+            time.sleep(_retry_after(r))
+
+        self.dropped += 1
+        return False
+
+
+def _retry_after(response):
+    try:
+        return float(response.json().get("retry_after", 1.0))
+    except Exception:
+        pass
+    try:
+        return float(response.headers.get("Retry-After", 1.0))
+    except Exception:
+        return 1.0
@@ -0,0 +1,261 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# ==========================
+# OPEN ORDER TRACKER
+# ==========================
+#
+# Replaces "list_orders on every loop pass". The tracker is seeded once with
+# the currently open orders, then kept current by
+#
+#   - on_order_event(): order/fill updates (user channel, execution engine)
+#   - track():          orders we just submitted ourselves
+#   - poll():           orders created since the last one seen, plus a status
+#                       refresh of the few orders still live
+#
+# The run_bot pause check is then has_open_orders(), a dict lookup with no
+# network call. Unlike the old get_open_orders(), a failing exchange does
+# not look like "no open orders": until the tracker has fresh state it
+# reports the product as busy.
+#
+# An order tracked before the exchange acknowledged it (no order_id yet)
+# is looked up by client_order_id on each poll. It is dropped if it never
+# shows up within unacked_timeout. Once an order closes, later "live"
+# updates for it (out-of-order events, a slow poll racing a fill) are
+# ignored for closed_ttl seconds.
+
+LIVE_STATUSES = {"OPEN", "PENDING", "PARTIALLY_FILLED", "QUEUED"}
+
+
+def _field(order, name, default=None):
+    if isinstance(order, dict):
+        return order.get(name, default)
+    return getattr(order, name, default)
+
+
+def _parse_time(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+class OrderTracker:
+    def __init__(
+        self,
+        client,
+        product_ids=(),
+        call=None,
+        poll_interval=5.0,
+        stale_after=60.0,
+        unacked_timeout=90.0,
+        closed_ttl=600.0,
+        on_error=None,
+        on_change=None,
+    ):
+        self.client = client
+        self.product_ids = list(product_ids)
+        self.call = call or (lambda fn, **kwargs: fn(**kwargs))
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self.unacked_timeout = unacked_timeout
+        self.closed_ttl = closed_ttl
+        self.on_error = on_error
+        self.on_change = on_change    # on_change(product_id) when a live order closes
+
+        self._lock = threading.Lock()
+        self._live = {}            # client_order_id -> {"order_id", "product_id", "status", "added"}
+        self._closed = {}          # client_order_id -> monotonic time it closed
+        self._by_product = {}      # product_id -> live order count
+        self._last_created = None  # newest created_time seen (datetime)
+        self._last_sync = None     # monotonic time of last successful seed/poll
+        self._thread = None
+        self._stopping = threading.Event()
+
+        self.polls = 0
+        self.poll_errors = 0
+        self.events = 0
+        self.stale_events = 0
+
+    # --------------------------
+    # Hot path (no network)
+    # --------------------------
+
+    @property
+    def synced(self):
+        return self._last_sync is not None and time.monotonic() - self._last_sync <= self.stale_after
+
+    def has_open_orders(self, product_id):
+        with self._lock:
+            if self._by_product.get(product_id, 0) > 0:
+                return True
+        return not self.synced
+
+    def open_orders(self, product_id=None):
+        with self._lock:
+            return [
+                dict(o, client_order_id=cid)
+                for cid, o in self._live.items()
+                if product_id is None or o["product_id"] == product_id
+            ]
+
+    def get(self, client_order_id):
+        with self._lock:
+            return self._live.get(client_order_id)
+
+    # --------------------------
+    # State updates
+    # --------------------------
+
+    def track(self, client_order_id, product_id, order_id=None, status="PENDING"):
+        self._apply(client_order_id, order_id, product_id, status)
+
+    def on_order_event(self, order):
+        # Accepts SDK order objects or user-channel dicts
+        self.events += 1
+        self._apply(
+            _field(order, "client_order_id"),
+            _field(order, "order_id"),
+            _field(order, "product_id"),
+            _field(order, "status"),
+            _parse_time(_field(order, "created_time") or _field(order, "creation_time")),
+        )
+
+    def _apply(self, client_order_id, order_id, product_id, status, created=None):
+        key = client_order_id or order_id
+        if key is None:
+            return
+
+        closed = None
+        with self._lock:
+            if created is not None and (self._last_created is None or created > self._last_created):
+                self._last_created = created
+
+            current = self._live.get(key)
+            if status in LIVE_STATUSES:
+                if key in self._closed:
+                    # Older than the update that closed it
+                    self.stale_events += 1
+                    return
+                if current is None:
+                    self._by_product[product_id] = self._by_product.get(product_id, 0) + 1
+                    self._live[key] = {
+                        "order_id": order_id, "product_id": product_id, "status": status, "added": time.monotonic(),
+                    }
+                else:
+                    current["status"] = status
+                    if order_id:
+                        current["order_id"] = order_id
+            else:
+                self._closed[key] = time.monotonic()
+                if current is not None:
+                    del self._live[key]
+                    self._by_product[current["product_id"]] -= 1
+                    closed = current["product_id"]
+
+        if closed is not None and self.on_change:
+            self.on_change(closed)
+
+    # --------------------------
+    # Exchange sync
+    # --------------------------
+
+    def _list_orders(self, product_ids=None, **kwargs):
+        cursor = None
+        while True:
+            if cursor:
+                kwargs["cursor"] = cursor
+            resp = self.call(self.client.list_orders, product_ids=product_ids or self.product_ids or None, **kwargs)
+            yield from resp.orders
+            if not getattr(resp, "has_next", False):
+                return
+            cursor = resp.cursor
+
+    def seed(self):
+        orders = list(self._list_orders(order_status=sorted(LIVE_STATUSES)))
+        with self._lock:
+            self._live.clear()
+            self._by_product.clear()
+        for order in orders:
+            self.on_order_event(order)
+        self._last_sync = time.monotonic()
+        if self._last_created is None:
+            self._last_created = datetime.now(timezone.utc)
+
+    def poll(self):
+        if self._last_sync is None:
+            return self.seed()
+
+        self.polls += 1
+
+        # New orders since the newest one we know about
+        start_date = self._last_created.strftime("%Y-%m-%dT%H:%M:%SZ")
+        for order in self._list_orders(start_date=start_date):
+            self.on_order_event(order)
+
+        # Status refresh for orders still live (usually zero or one)
+        for live in self.open_orders():
+            if live["order_id"]:
+                self.on_order_event(self.call(self.client.get_order, order_id=live["order_id"]).order)
+            else:
+                self._reconcile(live)
+
+        now = time.monotonic()
+        with self._lock:
+            for key in [k for k, t in self._closed.items() if now - t > self.closed_ttl]:
+                del self._closed[key]
+        self._last_sync = now
+
+    def _reconcile(self, live):
+        # Tracked before the exchange acknowledged it: find it by client_order_id
+        age = time.monotonic() - live["added"]
+        since = datetime.now(timezone.utc) - timedelta(seconds=age + 60)   # exchange clock skew
+        for order in self._list_orders([live["product_id"]], start_date=since.strftime("%Y-%m-%dT%H:%M:%SZ")):
+            if _field(order, "client_order_id") == live["client_order_id"]:
+                self.on_order_event(order)
+                return
+        if age > self.unacked_timeout:
+            # Never reached the exchange
+            self._apply(live["client_order_id"], None, live["product_id"], "FAILED")
+
+    # --------------------------
+    # Background polling
+    # --------------------------
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="order-tracker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.poll_errors += 1
+                if self.on_error:
+                    self.on_error(e)
+            self._stopping.wait(self.poll_interval)
+
+    def stats(self):
+        with self._lock:
+            live = len(self._live)
+        return {
+            "live_orders": live,
+            "synced": self.synced,
+            "polls": self.polls,
+            "poll_errors": self.poll_errors,
+            "events": self.events,
+            "stale_events": self.stale_events,
+        }
@@ -0,0 +1,329 @@
+import statistics
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from metrics import LatencyHistogram
+from transport import TRANSPORT
+
+# ==========================
+# HEDGED MULTI-SOURCE PRICES
+# ==========================
+#
+# PriceAggregator asks several REST price sources at once instead of
+# trusting one endpoint. In "first" mode the fastest valid quote wins; in
+# "median" mode every answer that arrives before the deadline is collected,
+# quotes far from the median are dropped and the median of the rest is used.
+# Stale quotes (exchange timestamp older than max_age) are never used.
+#
+# Every response, including ones that arrive after a winner was picked, is
+# timed per source. Sources are ranked by their smoothed latency (errors,
+# stale and outlier quotes count as a full timeout), and in "first" mode
+# sources much slower than the leader are only asked as a hedge once the
+# fast ones have had their usual time to answer.
+#
+#   PRICES = PriceAggregator(default_sources())
+#   FEED = TickerFeed([ASSET], fallback=PRICES.get_price)
+#
+# Sources are plain objects with a `name` and fetch(product_id) ->
+# (price, quote_time or None), so local stand-in servers (standins.py) or
+# functions (FunctionSource) can be plugged in.
+
+SPOT_URL = "https://api.coinbase.com/v2/prices/{product_id}/spot"
+TICKER_URL = "https://api.exchange.coinbase.com/products/{product_id}/ticker"
+BOOK_URL = "https://api.coinbase.com/api/v3/brokerage/market/product_book?product_id={product_id}&limit=1"
+
+
+def _parse_time(value):
+    # Exchange ISO-8601 timestamp -> epoch seconds (None if missing)
+    if not value:
+        return None
+    value = value.replace("Z", "+00:00")
+    # Python < 3.11 only accepts up to microseconds
+    if "." in value:
+        head, rest = value.split(".", 1)
+        digits = len(rest) - len(rest.lstrip("0123456789"))
+        value = f"{head}.{rest[:min(digits, 6)]}{rest[digits:]}"
+    return datetime.fromisoformat(value).timestamp()
+
+
+def parse_spot(data):
+    return float(data["data"]["amount"]), None
+
+
+def parse_ticker(data):
+    return float(data["price"]), _parse_time(data.get("time"))
+
+
+def parse_book(data):
+    # Mid of the best bid/ask
+    book = data["pricebook"]
+    bid = float(book["bids"][0]["price"])
+    ask = float(book["asks"][0]["price"])
+    return (bid + ask) / 2, _parse_time(book.get("time"))
+
+
+class PriceSource:
+    # One REST endpoint; url is formatted with product_id
+    def __init__(self, name, url, parse, transport=None, endpoint="price"):
+        self.name = name
+        self.url = url
+        self.parse = parse
+        self.transport = transport or TRANSPORT
+        self.endpoint = endpoint
+
+    def fetch(self, product_id):
+        # No transport retries: the other sources are the retry
+        r = self.transport.get(self.url.format(product_id=product_id), endpoint=self.endpoint, retry=False)
+        r.raise_for_status()
+        return self.parse(r.json())
+
+
+class FunctionSource:
+    def __init__(self, name, fn):
+        self.name = name
+        self.fn = fn
+
+    def fetch(self, product_id):
+        return self.fn(product_id)
+
+
+def default_sources(transport=None, urls=None):
+    # Exchange spot, exchange ticker and best bid/ask mid; urls overrides
+    # endpoints by source name (e.g. FakePriceServer.urls())
+    urls = {"spot": SPOT_URL, "ticker": TICKER_URL, "book": BOOK_URL, **(urls or {})}
+    return [
+        PriceSource("spot", urls["spot"], parse_spot, transport),
+        PriceSource("ticker", urls["ticker"], parse_ticker, transport),
+        PriceSource("book", urls["book"], parse_book, transport),
+    ]
+
+
+class SourceStats:
+    __slots__ = ("requests", "errors", "stale", "outliers", "wins", "late", "ewma", "latency", "last_error")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.stale = 0
+        self.outliers = 0
+        self.wins = 0
+        self.late = 0              # answered after the aggregate was returned
+        self.ewma = None           # smoothed latency (seconds), penalties included
+        self.latency = LatencyHistogram()
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "stale": self.stale,
+            "outliers": self.outliers,
+            "wins": self.wins,
+            "late": self.late,
+            "ewma_ms": (self.ewma or 0.0) * 1000,
+            "latency": self.latency.summary(),
+            "last_error": self.last_error,
+        }
+
+
+class PriceAggregator:
+    def __init__(
+        self,
+        sources,
+        mode="first",
+        timeout=3.0,
+        max_age=10.0,
+        max_deviation=0.005,
+        demote_factor=3.0,
+        hedge_quantile=0.9,
+        latency_alpha=0.2,
+        probe_every=20,
+        clock=time,
+    ):
+        self.sources = list(sources)
+        self.mode = mode
+        self.timeout = timeout
+        self.max_age = max_age                  # drop quotes older than this (s)
+        self.max_deviation = max_deviation      # drop quotes this far from the consensus
+        self.demote_factor = demote_factor      # slower than this x the leader -> hedge only
+        self.hedge_quantile = hedge_quantile    # hedge once the leaders pass this latency quantile
+        self.latency_alpha = latency_alpha
+        self.probe_every = probe_every          # ask demoted sources up front every N requests
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._stats = {s.name: SourceStats() for s in self.sources}
+        self._last = {}            # product_id -> (price, clock time) of the last aggregate
+        self._pool = ThreadPoolExecutor(max_workers=max(2, 2 * len(self.sources)), thread_name_prefix="price")
+
+        self.requests = 0
+        self.failures = 0
+        self.hedges = 0
+
+    # --------------------------
+    # Public
+    # --------------------------
+
+    def get_price(self, product_id, mode=None):
+        # Drop-in for fetch_spot_price / TickerFeed's fallback
+        mode = mode or self.mode
+        self.requests += 1
+        leaders, hedges = self.ranked()
+        # Demoted sources are re-measured now and then so they can recover
+        if mode == "median" or (self.probe_every and self.requests % self.probe_every == 0):
+            leaders, hedges = leaders + hedges, []
+
+        started = time.perf_counter()
+        state = {"done": False}
+        pending = {self._submit(s, product_id, state): s for s in leaders}
+        quotes = []
+        deadline = started + self.timeout
+        hedge_at = started + self.hedge_delay(leaders)
+
+        try:
+            while pending or hedges:
+                now = time.perf_counter()
+                if now >= deadline:
+                    break
+                # Hedge once the leaders are late, or at once if they all failed
+                if hedges and (now >= hedge_at or not pending):
+                    self.hedges += 1
+                    pending.update({self._submit(s, product_id, state): s for s in hedges})
+                    hedges = []
+
+                until = deadline if not hedges else min(deadline, hedge_at)
+                done, _ = wait(pending, timeout=max(until - now, 0), return_when=FIRST_COMPLETED)
+                for future in done:
+                    source = pending.pop(future)
+                    quote = future.result()
+                    if quote is None:
+                        continue
+                    quotes.append((source, quote))
+                    if mode == "first" and self._agrees(product_id, quote):
+                        return self._accept(product_id, quote, [source])
+
+            return self._consensus(product_id, quotes)
+        finally:
+            state["done"] = True
+
+    def ranked(self):
+        # (leaders, hedges): sources ordered by smoothed latency; unknown
+        # sources count as fast so every source gets measured
+        with self._lock:
+            scored = [(self._stats[s.name].ewma or 0.0, i, s) for i, s in enumerate(self.sources)]
+        scored.sort(key=lambda x: (x[0], x[1]))
+        fastest = max(scored[0][0], 1e-3) if scored else 0.0
+        leaders = [s for score, _, s in scored if score <= fastest * self.demote_factor]
+        hedges = [s for score, _, s in scored if score > fastest * self.demote_factor]
+        return leaders, hedges
+
+    def hedge_delay(self, leaders):
+        # Usual response time of the leaders before the demoted sources are asked
+        with self._lock:
+            values = [self._stats[s.name].latency.percentile(self.hedge_quantile) for s in leaders if self._stats[s.name].latency.count]
+        if not values:
+            return self.timeout / 2
+        return min(max(values), self.timeout / 2)
+
+    def stats(self):
+        with self._lock:
+            sources = {name: s.as_dict() for name, s in self._stats.items()}
+        return {
+            "mode": self.mode,
+            "requests": self.requests,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "sources": sources,
+        }
+
+    def close(self):
+        self._pool.shutdown(wait=False)
+
+    # --------------------------
+    # Internals
+    # --------------------------
+
+    def _submit(self, source, product_id, state):
+        return self._pool.submit(self._fetch, source, product_id, state)
+
+    def _fetch(self, source, product_id, state):
+        # (price, quote_time) if usable, else None; always timed
+        stats = self._stats[source.name]
+        start = time.perf_counter()
+        error = None
+        quote = None
+        try:
+            price, quote_time = source.fetch(product_id)
+            if not price > 0:
+                error = f"invalid price {price!r}"
+            elif quote_time is not None and self.clock.time() - quote_time > self.max_age:
+                error = "stale"
+            else:
+                quote = (float(price), quote_time)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats.requests += 1
+            stats.latency.record(elapsed)
+            if state["done"]:
+                stats.late += 1
+            if error == "stale":
+                stats.stale += 1
+            elif error is not None:
+                stats.errors += 1
+                stats.last_error = error
+            # Useless answers cost as much as a timeout, so they sink in the ranking
+            self._observe(stats, elapsed if error is None else max(elapsed, self.timeout))
+        return quote
+
+    def _observe(self, stats, seconds):
+        if stats.ewma is None:
+            stats.ewma = seconds
+        else:
+            stats.ewma += self.latency_alpha * (seconds - stats.ewma)
+
+    def _agrees(self, product_id, quote):
+        # A lone quote is trusted if it is near the last aggregate (or there
+        # is no recent one to compare against)
+        last = self._last.get(product_id)
+        if last is None or self.clock.time() - last[1] > self.max_age:
+            return True
+        return abs(quote[0] - last[0]) / last[0] <= self.max_deviation
+
+    def _consensus(self, product_id, quotes):
+        if not quotes:
+            self.failures += 1
+            raise RuntimeError(f"No price source answered for {product_id}")
+
+        median = statistics.median(q[0] for _, q in quotes)
+        kept = self._near(quotes, median)
+        # Nothing near the median (e.g. two quotes far apart): side with the
+        # last aggregate if it is recent, else keep everything
+        if not kept:
+            last = self._last.get(product_id)
+            if last is not None and self.clock.time() - last[1] <= self.max_age:
+                kept = self._near(quotes, last[0])
+            kept = kept or quotes
+        names = {s.name for s, _ in kept}
+        with self._lock:
+            for source, _ in quotes:
+                if source.name not in names:
+                    stats = self._stats[source.name]
+                    stats.outliers += 1
+                    self._observe(stats, self.timeout)
+        price = statistics.median(q[0] for _, q in kept)
+        return self._accept(product_id, (price, None), [s for s, _ in kept])
+
+    def _near(self, quotes, reference):
+        return [(s, q) for s, q in quotes if abs(q[0] - reference) / reference <= self.max_deviation]
+
+    def _accept(self, product_id, quote, sources):
+        with self._lock:
+            for source in sources:
+                self._stats[source.name].wins += 1
+        self._last[product_id] = (quote[0], self.clock.time())
+        return quote[0]
@@ -0,0 +1,344 @@
+import threading
+import time
+
+# ==========================
+# RATE LIMITS + CIRCUIT BREAKER
+# ==========================
+#
+# Client-side limits for every call that goes through TRANSPORT, shared by
+# all strategies in the process.
+#
+# Token buckets: one per host (the exchange's account/IP limit) and one per
+# host and endpoint bucket (polling can't use up the whole host budget).
+# Placement, cancels and status reads share the "orders" bucket with order
+# listing (ENDPOINT_BUCKETS). A call takes a token from both, waiting up to
+# max_wait if either is empty. Priorities
+# keep headroom for orders: polling may only take a token while the bucket
+# holds more than RESERVE[priority] of its burst, so order placement always
+# finds tokens left even while polling runs flat out.
+#
+# Circuit breaker per host (closed -> open -> half-open -> closed):
+#   closed     everything passes; failure_threshold transient failures in a
+#              row (connection errors, timeouts, 429/5xx) open it
+#   open       non-critical calls are shed at once (CircuitOpenError);
+#              critical ones (order create/cancel) still go out
+#   half-open  after reset_timeout one probe call is let through; success
+#              closes the breaker, failure re-opens it for twice as long
+# A 429 also pauses the host bucket for its Retry-After; the next acquire()
+# waits that out (the transport does not sleep for it again).
+#
+#   LIMITER = RateLimiter()
+#   LIMITER.acquire("api.coinbase.com", "orders")         # may wait / raise
+#   LIMITER.record("api.coinbase.com", ok=False, retry_after=2.0)
+#   LIMITER.retry_in("api.coinbase.com")                  # seconds until it is worth retrying
+
+CRITICAL = 0
+NORMAL = 1
+LOW = 2
+
+# Share of a bucket's burst each priority must leave untouched
+RESERVE = {CRITICAL: 0.0, NORMAL: 0.2, LOW: 0.4}
+
+# (tokens per second, burst)
+HOST_LIMITS = {
+    "api.coinbase.com": (30, 30),              # Advanced Trade private REST: 30 req/s
+    "api.exchange.coinbase.com": (10, 15),     # Exchange public REST: 10 req/s, bursts of 15
+    "discord.com": (2.5, 5),                   # webhooks: 5 per 2 s
+}
+ENDPOINT_LIMITS = {
+    "orders": (10, 10),
+    "accounts": (5, 5),
+    "market": (5, 10),
+    "price": (10, 10),
+    "webhook": (2.5, 5),
+}
+
+# Endpoint classes drawing on another class's bucket
+ENDPOINT_BUCKETS = {
+    "order_create": "orders",
+    "order_cancel": "orders",
+    "order_status": "orders",
+}
+
+PRIORITIES = {
+    "order_create": CRITICAL,
+    "order_cancel": CRITICAL,
+    "order_status": CRITICAL,     # fill tracking for orders just placed; not shed by an open breaker
+    "accounts": NORMAL,
+    "price": NORMAL,
+    "default": NORMAL,
+    "orders": LOW,
+    "market": LOW,
+    "webhook": LOW,
+}
+
+# coinbase RESTClient method -> endpoint class, for TRANSPORT.call()
+SDK_ENDPOINTS = {
+    "create_order": "order_create",
+    "market_order": "order_create",
+    "market_order_buy": "order_create",
+    "market_order_sell": "order_create",
+    "limit_order_gtc": "order_create",
+    "limit_order_gtc_buy": "order_create",
+    "limit_order_gtc_sell": "order_create",
+    "cancel_orders": "order_cancel",
+    "get_order": "order_status",
+    "list_orders": "orders",
+    "get_fills": "orders",
+    "list_fills": "orders",
+    "get_accounts": "accounts",
+    "get_account": "accounts",
+    "get_candles": "market",
+    "get_product_book": "market",
+    "get_best_bid_ask": "market",
+}
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RateLimitedError(Exception):
+    pass
+
+
+def sdk_endpoint(fn):
+    return SDK_ENDPOINTS.get(getattr(fn, "__name__", ""), "default")
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "paused_until", "taken", "waits", "waited")
+
+    def __init__(self, rate, burst=None, now=0.0):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.tokens = self.burst
+        self.updated = now
+        self.paused_until = 0.0
+        self.taken = 0
+        self.waits = 0
+        self.waited = 0.0
+
+    def wait_time(self, now, priority=CRITICAL):
+        # Seconds until a token is available to this priority
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        missing = 1 + self.burst * RESERVE[priority] - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self):
+        self.tokens -= 1
+        self.taken += 1
+
+    def pause(self, now, seconds):
+        self.paused_until = max(self.paused_until, now + seconds)
+        self.tokens = 0.0
+        self.updated = now
+
+    def as_dict(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": self.tokens,
+            "taken": self.taken,
+            "waits": self.waits,
+            "waited_s": self.waited,
+        }
+
+
+class CircuitBreaker:
+    __slots__ = (
+        "failure_threshold", "reset_timeout", "max_timeout",
+        "state", "failures", "opened_at", "open_for", "probing", "trips", "shed",
+    )
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0, max_timeout=120.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.state = CLOSED
+        self.failures = 0          # consecutive
+        self.opened_at = 0.0
+        self.open_for = reset_timeout
+        self.probing = False
+        self.trips = 0
+        self.shed = 0
+
+    def allow(self, now, priority):
+        if self.state == OPEN and now - self.opened_at >= self.open_for:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == CLOSED or priority == CRITICAL:
+            return True
+        if self.state == HALF_OPEN and not self.probing:
+            self.probing = True
+            return True
+        self.shed += 1
+        return False
+
+    def record(self, now, ok):
+        if ok:
+            self.failures = 0
+            if self.state != CLOSED:
+                self.state = CLOSED
+                self.open_for = self.reset_timeout
+            return
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self._open(now, min(self.open_for * 2, self.max_timeout))
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open(now, self.reset_timeout)
+
+    def retry_in(self, now):
+        if self.state != OPEN:
+            return 0.0
+        return max(self.open_for - (now - self.opened_at), 0.0)
+
+    def _open(self, now, seconds):
+        self.state = OPEN
+        self.opened_at = now
+        self.open_for = seconds
+        self.probing = False
+        self.trips += 1
+
+    def as_dict(self):
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "shed": self.shed,
+            "open_for_s": self.open_for if self.state == OPEN else 0.0,
+        }
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        host_limits=None,
+        endpoint_limits=None,
+        priorities=None,
+        failure_threshold=5,
+        reset_timeout=10.0,
+        max_timeout=120.0,
+        max_wait=10.0,
+        clock=time,
+    ):
+        # host_limits / endpoint_limits: {name: (rate, burst)}, merged over
+        # the defaults; a None value removes that bucket
+        self.host_limits = _merge(HOST_LIMITS, host_limits)
+        self.endpoint_limits = _merge(ENDPOINT_LIMITS, endpoint_limits)
+        self.priorities = dict(PRIORITIES, **(priorities or {}))
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.max_wait = max_wait
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._hosts = {}           # host -> TokenBucket
+        self._endpoints = {}       # (host, endpoint bucket) -> TokenBucket
+        self._breakers = {}        # host -> CircuitBreaker
+
+        self.rejected = 0
+
+    def priority(self, endpoint):
+        return self.priorities.get(endpoint, NORMAL)
+
+    def acquire(self, host, endpoint="default", priority=None, max_wait=None):
+        # Blocks until both buckets have a token for this priority; returns
+        # the seconds waited. Raises CircuitOpenError when the call is shed
+        # and RateLimitedError when the wait would pass max_wait.
+        priority = self.priority(endpoint) if priority is None else priority
+        max_wait = self.max_wait if max_wait is None else max_wait
+        started = self.clock.monotonic()
+
+        with self._lock:
+            if not self._breaker(host).allow(started, priority):
+                raise CircuitOpenError(f"{host} circuit open, {endpoint} call shed")
+
+        while True:
+            with self._lock:
+                now = self.clock.monotonic()
+                name = ENDPOINT_BUCKETS.get(endpoint, endpoint)
+                buckets = [b for b in (self._bucket(self._hosts, host, self.host_limits.get(host), now),
+                                       self._bucket(self._endpoints, (host, name), self.endpoint_limits.get(name), now)) if b]
+                delay = max([b.wait_time(now, priority) for b in buckets], default=0.0)
+                waited = now - started
+                if delay <= 0:
+                    for b in buckets:
+                        b.take()
+                        if waited > 0:
+                            b.waits += 1
+                            b.waited += waited
+                    return waited
+                if waited + delay > max_wait:
+                    self.rejected += 1
+                    # A half-open probe that never went out frees the probe slot
+                    self._breaker(host).probing = False
+                    raise RateLimitedError(f"{host} {endpoint}: no token within {max_wait:.1f}s")
+            self.clock.sleep(delay)
+
+    def record(self, host, ok, retry_after=None):
+        # Outcome of a call (ok=False only for transient failures)
+        with self._lock:
+            now = self.clock.monotonic()
+            self._breaker(host).record(now, ok)
+            if retry_after is not None:
+                bucket = self._bucket(self._hosts, host, self.host_limits.get(host), now)
+                if bucket is not None:
+                    bucket.pause(now, retry_after)
+
+    def retry_in(self, host):
+        # Seconds until non-critical calls to host are let through again
+        with self._lock:
+            breaker = self._breakers.get(host)
+            return breaker.retry_in(self.clock.monotonic()) if breaker is not None else 0.0
+
+    def state(self, host):
+        with self._lock:
+            breaker = self._breakers.get(host)
+            return breaker.state if breaker is not None else CLOSED
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rejected": self.rejected,
+                "hosts": {h: b.as_dict() for h, b in self._hosts.items()},
+                "endpoints": {f"{h} {e}": b.as_dict() for (h, e), b in self._endpoints.items()},
+                "breakers": {h: b.as_dict() for h, b in self._breakers.items()},
+            }
+
+    # --------------------------
+    # Internals (caller holds the lock)
+    # --------------------------
+
+    def _bucket(self, buckets, key, limit, now):
+        bucket = buckets.get(key)
+        if bucket is None:
+            if limit is None:
+                return None
+            bucket = buckets[key] = TokenBucket(limit[0], limit[1], now)
+        return bucket
+
+    def _breaker(self, host):
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.max_timeout)
+        return breaker
+
+
+def _merge(defaults, overrides):
+    merged = dict(defaults)
+    for name, limit in (overrides or {}).items():
+        if limit is None:
+            merged.pop(name, None)
+        else:
+            merged[name] = limit
+    return merged
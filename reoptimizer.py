@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtest import run_backtest
+from indicators import ema_batch
+from journal import load_ticks
+from sweep import random_search
+
+# ==========================
+# WALK-FORWARD RE-OPTIMIZER
+# ==========================
+#
+# Periodically re-fits the live UnifiedVarianceEngine on the most recent
+# ticks from the tick journal and hot-swaps the winner into the running
+# engine (engine.swap_params, applied on the loop's next update).
+#
+# Each fit runs in a separate low-priority worker process that maps the
+# journal itself, so nothing is copied from the bot:
+#
+#   1. the lookback window is split into train (first train_fraction) and
+#      test (the rest)
+#   2. the live parameters plus `samples` random candidates from
+#      ENGINE_SPACE are backtested on train, until time_budget runs out
+#   3. the best train candidate is backtested on test next to the live
+#      parameters; it is only accepted if it beats them out of sample by
+#      min_improvement, trades at all and stays within max_drawdown
+#
+# CPU budget: the worker runs at `nice`, a fit stops sampling after
+# time_budget seconds, and fits are spaced so the worker is busy for at
+# most cpu_fraction of wall time.
+#
+#   REOPTIMIZER = ReOptimizer(ENGINE, JOURNAL_DIR, "eth", WINDOW, on_swap=...)
+#   REOPTIMIZER.start()
+
+ENGINE_SPACE = {
+    "base_buy": [-0.003, -0.004, -0.005, -0.0065, -0.008, -0.009, -0.011],
+    "base_sell": [0.004, 0.005, 0.006, 0.0075, 0.009, 0.010, 0.012],
+    "buy_multiplier": [6, 8, 10, 14, 17, 20],
+    "sell_multiplier": [6, 8, 10, 12, 14, 16],
+    "buy_clamp": [(-0.012, -0.005), (-0.015, -0.004), (-0.010, -0.003), (-0.020, -0.006)],
+    "sell_clamp": [(0.006, 0.014), (0.005, 0.018), (0.004, 0.012), (0.007, 0.020)],
+}
+
+
+# --------------------------
+# Fitting (worker process)
+# --------------------------
+
+def walk_forward_fit(
+    timestamps,
+    prices,
+    window,
+    current,
+    space=ENGINE_SPACE,
+    samples=100,
+    train_fraction=0.7,
+    time_budget=None,
+    min_improvement=0.0,
+    max_drawdown=None,
+    seed=None,
+    **backtest_kwargs,
+):
+    # current: live engine params (get_params()). Returns a report dict;
+    # report["accepted"] says whether report["params"] should go live.
+    started = time.monotonic()
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    _, variance, _ = ema_batch(prices, window)
+
+    split = int(len(prices) * train_fraction)
+    train = slice(0, split)
+    test = slice(split, len(prices))
+
+    def backtest(params, part):
+        result = run_backtest(
+            timestamps[part], prices[part],
+            engine_params=params, window=window, variance=variance[part],
+            **backtest_kwargs,
+        )
+        return {
+            "pnl": result["pnl"],
+            "max_drawdown": result["max_drawdown"],
+            "trades": len(result["trades"]),
+            "win_rate": result["win_rate"],
+        }
+
+    best_params, best = dict(current), backtest(current, train)
+    evaluated = 1
+    for sample in random_search(space, samples, seed):
+        if time_budget is not None and time.monotonic() - started >= time_budget:
+            break
+        params = dict(current, **sample)
+        result = backtest(params, train)
+        evaluated += 1
+        if result["pnl"] > best["pnl"]:
+            best_params, best = params, result
+
+    baseline = backtest(current, test)
+    candidate = backtest(best_params, test) if best_params != current else baseline
+
+    if best_params == current:
+        reason = "Live parameters are still the best in sample"
+    elif candidate["trades"] == 0:
+        reason = "Candidate made no trades out of sample"
+    elif candidate["pnl"] <= baseline["pnl"] + min_improvement:
+        reason = "Candidate did not beat live parameters out of sample"
+    elif max_drawdown is not None and candidate["max_drawdown"] > max_drawdown:
+        reason = "Candidate drawdown too high out of sample"
+    else:
+        reason = "OK"
+
+    return {
+        "accepted": reason == "OK",
+        "reason": reason,
+        "params": best_params,
+        "train": best,
+        "test": candidate,
+        "baseline": baseline,
+        "ticks": len(prices),
+        "evaluated": evaluated,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def _init_worker(nice):
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def _day(t):
+    return time.strftime("%Y%m%d", time.gmtime(t))
+
+
+def _fit_from_journal(directory, prefix, since, until, min_ticks, window, current, fit_kwargs):
+    # Runs in the worker: maps the journal days covering [since, until]
+    timestamps, prices = load_ticks(directory, prefix, _day(since), _day(until))
+    keep = (timestamps >= since) & (timestamps <= until)
+    timestamps, prices = timestamps[keep], prices[keep]
+    if len(prices) < min_ticks:
+        return {"accepted": False, "reason": f"Only {len(prices)} ticks in the lookback window", "ticks": len(prices)}
+    return walk_forward_fit(timestamps, prices, window, current, **fit_kwargs)
+
+
+# --------------------------
+# Scheduler (bot process)
+# --------------------------
+
+class ReOptimizer:
+    def __init__(
+        self,
+        engine,
+        journal_dir,
+        prefix,
+        window,
+        interval=3600,
+        lookback=86400,
+        min_ticks=1000,
+        cpu_fraction=0.25,
+        nice=10,
+        on_swap=None,
+        on_result=None,
+        **fit_kwargs,
+    ):
+        # fit_kwargs: walk_forward_fit options (samples, train_fraction,
+        # time_budget, min_improvement, max_drawdown, space, backtest args)
+        self.engine = engine
+        self.journal_dir = journal_dir
+        self.prefix = prefix
+        self.window = window
+        self.interval = interval
+        self.lookback = lookback
+        self.min_ticks = min_ticks
+        self.cpu_fraction = cpu_fraction
+        self.nice = nice
+        self.on_swap = on_swap          # fn(params, report) after a hot-swap
+        self.on_result = on_result      # fn(report) after every fit
+        self.fit_kwargs = dict({"samples": 100, "time_budget": 60}, **fit_kwargs)
+
+        self._pool = None
+        self._thread = None
+        self._stopping = threading.Event()
+
+        self.fits = 0
+        self.swaps = 0
+        self.errors = 0
+        self.last_report = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="reoptimizer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def run_once(self, now=None):
+        # One fit + (maybe) swap; blocks the calling thread, not the loop
+        now = time.time() if now is None else now
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(self.nice,))
+        future = self._pool.submit(
+            _fit_from_journal,
+            self.journal_dir, self.prefix, now - self.lookback, now, self.min_ticks,
+            self.window, self.engine.get_params(), self.fit_kwargs,
+        )
+        report = future.result()
+        self.fits += 1
+        self.last_report = report
+
+        if report["accepted"]:
+            self.engine.swap_params(report["params"])
+            self.swaps += 1
+            if self.on_swap is not None:
+                self.on_swap(report["params"], report)
+        if self.on_result is not None:
+            self.on_result(report)
+        return report
+
+    def stats(self):
+        report = self.last_report or {}
+        return {
+            "fits": self.fits,
+            "swaps": self.swaps,
+            "errors": self.errors,
+            "last_reason": report.get("reason"),
+            "last_seconds": report.get("seconds"),
+        }
+
+    def _run(self):
+        wait = self.interval
+        while not self._stopping.wait(wait):
+            started = time.monotonic()
+            try:
+                self.run_once()
+            except Exception as e:
+                self.errors += 1
+                print(f"[REOPT ERROR] {e}")
+            # Keep the worker busy for at most cpu_fraction of wall time
+            busy = time.monotonic() - started
+            wait = max(self.interval, busy * (1 / self.cpu_fraction - 1)) if self.cpu_fraction else self.interval
@@ -0,0 +1,486 @@
+import argparse
+import csv
+import io
+import sys
+import time
+from contextlib import nullcontext, redirect_stdout
+from datetime import datetime, timezone
+
+import numpy as np
+
+from account import AccountState
+from backtest import load_ticks
+from bars import BarBuilder
+from execution import ExecutionEngine, OrderIds
+from journal import DECISION_NONE, DECISIONS
+from metrics import Metrics
+from orders import OrderTracker
+from risk import PortfolioRisk
+from scheduler import EventScheduler
+from standins import FakeRESTClient
+from strategy import UnifiedVarianceEngine
+
+# ==========================
+# ACCELERATED REPLAY
+# ==========================
+#
+# Runs the real eth_bot_backup.run_bot() against recorded prices on a
+# virtual clock. The module globals run_bot reads are swapped for replay
+# stand-ins for the duration of the run:
+#
+#   time      -> VirtualClock (sleep() advances virtual time instantly)
+#   client    -> standins.FakeRESTClient (fills at the recorded price)
+#   FEED      -> RecordedFeed (price as of the virtual clock)
+#   ACCOUNT   -> AccountState over the fake exchange balances
+#   ORDERS    -> ReplayOrderTracker (polls on virtual time, no thread)
+#   EXECUTION -> ReplayExecutionEngine (same, with fixed order-id session)
+#   SCHEDULER -> ReplayScheduler (walks the recorded ticks between wakes)
+#   BARS      -> BarBuilder on the virtual clock, fed every walked tick
+#   NOTIFIER, LOG, STATE, JOURNAL, METRICS, ENGINE, RISK -> in-memory / fresh objects
+#   setup     -> no-op, so nothing is opened on disk
+#
+# Everything the bot decides (can_buy_eth cooldowns, the open-order pause,
+# engine thresholds) runs unchanged, so the same input always produces the
+# same decisions. A day of 15 s ticks replays in well under a second.
+#
+#   result = replay(timestamps, prices, usd_balance=50, base_balance=0.05)
+#   result["decisions"]   # one row per evaluated tick, like the tick journal
+
+DECISION_COLUMNS = ["time", "price", "ema", "variance", "buy_var", "sell_var", "exposure", "decision", "reason"]
+
+
+class ReplayFinished(BaseException):
+    # BaseException so run_bot's `except Exception` does not swallow it
+    pass
+
+
+class VirtualClock:
+    # Drop-in for the `time` module inside eth_bot_backup
+    def __init__(self, start, end=None):
+        self.now = float(start)
+        self.end = end
+        self.sleeps = 0
+        self._listeners = []
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(0.0, float(seconds))
+        self.sleeps += 1
+        if self.end is not None and self.now > self.end:
+            raise ReplayFinished()
+        for fn in self._listeners:
+            fn(self.now)
+
+    def on_advance(self, fn):
+        self._listeners.append(fn)
+
+    def __getattr__(self, name):
+        # perf_counter, strftime, ... stay real
+        return getattr(time, name)
+
+
+class RecordedFeed:
+    # TickerFeed stand-in: latest recorded price at or before clock time
+    def __init__(self, timestamps, prices, clock):
+        self.timestamps = timestamps
+        self.prices = prices
+        self.clock = clock
+        self.listeners = []
+
+    def add_listener(self, fn):
+        # fn(product_id, price) for every recorded tick the scheduler walks
+        self.listeners.append(fn)
+
+    def get_price(self, product_id):
+        idx = np.searchsorted(self.timestamps, self.clock.time(), side="right") - 1
+        return float(self.prices[max(idx, 0)])
+
+    def latest(self, product_id):
+        return self.get_price(product_id), 0.0
+
+    def sequence(self, product_id):
+        # Recorded ticks at or before clock time
+        return int(np.searchsorted(self.timestamps, self.clock.time(), side="right"))
+
+    def is_fresh(self, product_id):
+        return True
+
+
+class ReplayOrderTracker(OrderTracker):
+    # Polls synchronously whenever the virtual clock passes poll_interval
+    def __init__(self, client, clock, product_ids=(), poll_interval=5.0, on_change=None):
+        super().__init__(
+            client, product_ids, poll_interval=poll_interval, stale_after=float("inf"), on_change=on_change
+        )
+        self.clock = clock
+        self._next_poll = None
+
+    def start(self):
+        self.seed()
+        self._last_created = datetime.fromtimestamp(self.clock.time(), timezone.utc)
+        self._next_poll = self.clock.time() + self.poll_interval
+        self.clock.on_advance(self._on_advance)
+
+    def stop(self, timeout=None):
+        pass
+
+    def _on_advance(self, now):
+        if now >= self._next_poll:
+            self.poll()
+            self._next_poll = now + self.poll_interval
+
+
+class ReplayExecutionEngine(ExecutionEngine):
+    # Refreshes live orders whenever the virtual clock passes poll_interval
+    def start(self):
+        self._next_poll = self.clock.time() + self.poll_interval
+        self.clock.on_advance(self._on_advance)
+
+    def stop(self, timeout=None):
+        pass
+
+    def _on_advance(self, now):
+        if now >= self._next_poll:
+            self.poll()
+            self._next_poll = now + self.poll_interval
+
+
+class ReplayScheduler(EventScheduler):
+    # Same trigger/interval logic; wait() steps the virtual clock through
+    # the recorded ticks up to the deadline, feeding each one to the price
+    # trigger, instead of blocking on a condition variable.
+    def __init__(self, feed, clock, **kwargs):
+        super().__init__(clock=clock, **kwargs)
+        self.feed = feed
+
+    def wait(self, product_id, timeout=None, triggers=True):
+        if timeout is None:
+            timeout = self.interval(product_id)
+        clock = self.clock
+        deadline = clock.now + timeout
+        timestamps, prices = self.feed.timestamps, self.feed.prices
+        w = self._watch(product_id)
+
+        i = np.searchsorted(timestamps, clock.now, side="right")
+        while i < len(timestamps) and timestamps[i] <= deadline:
+            clock.sleep(timestamps[i] - clock.now)
+            for fn in self.feed.listeners:
+                fn(product_id, float(prices[i]))
+            if triggers:
+                self._observe(product_id, float(prices[i]), clock.now)
+            reason = self._take(w, triggers)
+            if reason:
+                return reason
+            i += 1
+
+        clock.sleep(deadline - clock.now)
+        reason = self._take(w, triggers)
+        if reason:
+            return reason
+        self.timeouts += 1
+        return "timeout"
+
+
+class DecisionRecorder:
+    # TickJournal stand-in that keeps rows in memory
+    def __init__(self):
+        self.rows = []
+
+    def append(self, t, price, ema, variance, buy_var, sell_var, exposure, decision=DECISION_NONE, reason=""):
+        self.rows.append((t, price, ema, variance, buy_var, sell_var, exposure, DECISIONS[decision], reason))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class EchoLog:
+    # JsonLog stand-in: prints synchronously (silenced by quiet), no file
+    def __init__(self):
+        self.records = 0
+
+    def log(self, event, message=None, level="info", **fields):
+        self.records += 1
+        if message is not None:
+            print(message)
+        return True
+
+
+class MessageRecorder:
+    # DiscordNotifier stand-in
+    def __init__(self, clock):
+        self.clock = clock
+        self.messages = []
+
+    def send(self, webhook, message):
+        self.messages.append((self.clock.time(), webhook, message))
+
+    def flush_digests(self):
+        pass
+
+    def stop(self, timeout=None):
+        pass
+
+
+class MemoryStateStore:
+    # StateStore stand-in; `initial` is what load() returns (e.g. a saved
+    # state to test warm restarts)
+    def __init__(self, initial=None):
+        self.data = dict(initial or {})
+
+    def load(self):
+        return dict(self.data)
+
+    def put(self, key, value):
+        self.data[key] = value
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# ==========================
+# REPLAY
+# ==========================
+
+def replay(
+    timestamps,
+    prices,
+    usd_balance=50.0,
+    base_balance=0.05,
+    fee_rate=0.0,
+    maker_fee_rate=None,
+    spread=0.0,
+    fill_delay=0.0,
+    initial_state=None,
+    config=None,
+    quiet=True,
+):
+    # config: extra eth_bot_backup globals to override for this run, e.g.
+    # {"BUY_COOLDOWN_SECONDS": 60, "SLEEP_TIME": 30, "ENGINE": UnifiedVarianceEngine(window=12)}
+    import eth_bot_backup as bot
+
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    if len(timestamps) == 0:
+        raise ValueError("nothing to replay")
+
+    base = bot.ASSET.split("-")[0]
+    clock = VirtualClock(timestamps[0], end=timestamps[-1])
+    feed = RecordedFeed(timestamps, prices, clock)
+
+    exchange = FakeRESTClient(
+        {"USD": usd_balance, base: base_balance},
+        feed.get_price,
+        clock=clock,
+        fee_rate=fee_rate,
+        maker_fee_rate=maker_fee_rate,
+        spread=spread,
+        fill_delay=fill_delay,
+    )
+    account = AccountState(exchange.get_balances)
+    exchange.on_fill(account.on_fill)
+    clock.on_advance(exchange.settle)
+
+    journal = DecisionRecorder()
+    notifier = MessageRecorder(clock)
+    metrics = Metrics()
+
+    def setting(name):
+        return (config or {}).get(name, getattr(bot, name))
+
+    scheduler = ReplayScheduler(
+        feed,
+        clock,
+        min_interval=setting("MIN_EVAL_INTERVAL"),
+        max_interval=setting("SLEEP_TIME"),
+        trigger_fraction=setting("TRIGGER_FRACTION"),
+    )
+    bars = BarBuilder([bot.ASSET], setting("BAR_TIMEFRAMES"), clock=clock)
+    feed.add_listener(bars.on_price)
+    execution = ReplayExecutionEngine(
+        exchange,
+        ids=OrderIds("eth", session="replay"),
+        metrics=metrics,
+        on_update=bot.on_order_update,
+        on_fill=bot.on_order_fill,
+        post_only=setting("POST_ONLY"),
+        limit_timeout=setting("LIMIT_TIMEOUT"),
+        clock=clock,
+    )
+
+    overrides = {
+        "time": clock,
+        "client": exchange,
+        "FEED": feed,
+        "ACCOUNT": account,
+        "ORDERS": ReplayOrderTracker(exchange, clock, [bot.ASSET], on_change=scheduler.wake),
+        "SCHEDULER": scheduler,
+        "BARS": bars,
+        "EXECUTION": execution,
+        "NOTIFIER": notifier,
+        "LOG": EchoLog(),
+        "STATE": MemoryStateStore(initial_state),
+        "JOURNAL": journal,
+        "METRICS": metrics,
+        "METRICS_TEXTFILE": None,
+        "METRICS_PORT": None,
+        "setup": lambda: None,
+        "REOPT_INTERVAL": None,
+        "ENGINE": UnifiedVarianceEngine(),
+        "RISK": PortfolioRisk(None),
+        "bootstrap": lambda product_ids, *args, **kwargs: {p: [] for p in product_ids},
+        "last_buy_time": 0,
+        "last_buy_price": None,
+        "RECENT_WINS": 0,
+        "RECENT_LOSSES": 0,
+        "TOTAL_WINS": 0,
+        "TOTAL_LOSSES": 0,
+    }
+    overrides.update(config or {})
+
+    saved = {name: getattr(bot, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(bot, name, value)
+
+    start = time.perf_counter()
+    try:
+        with redirect_stdout(io.StringIO()) if quiet else nullcontext():
+            bot.run_bot()
+    except ReplayFinished:
+        pass
+    finally:
+        for name, value in saved.items():
+            setattr(bot, name, value)
+    wall = time.perf_counter() - start
+
+    virtual = clock.now - timestamps[0]
+    return {
+        "decisions": journal.rows,
+        "messages": notifier.messages,
+        "orders": exchange.orders(),
+        "rejected_orders": exchange.rejected,
+        "execution": execution.stats(),
+        "balances": exchange.get_balances(),
+        "scheduler": {k: v for k, v in scheduler.stats().items() if k in ("triggers", "wakes", "timeouts")},
+        "virtual_seconds": virtual,
+        "wall_seconds": wall,
+        "speedup": virtual / wall if wall > 0 else float("inf"),
+        "metrics": metrics.snapshot(),
+    }
+
+
+# --------------------------
+# Decision files
+# --------------------------
+
+def _format_row(row):
+    # repr() round-trips floats exactly, so files compare bit-for-bit
+    return [repr(v) if isinstance(v, float) else str(v) for v in row]
+
+
+def write_decisions(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(DECISION_COLUMNS)
+        for row in rows:
+            writer.writerow(_format_row(row))
+
+
+def compare_decisions(rows, path, limit=10):
+    # Returns up to `limit` (index, expected, actual) differences
+    with open(path, newline="") as f:
+        expected = list(csv.reader(f))[1:]
+    actual = [_format_row(r) for r in rows]
+
+    diffs = []
+    for i in range(max(len(expected), len(actual))):
+        exp = expected[i] if i < len(expected) else None
+        act = actual[i] if i < len(actual) else None
+        if exp != act:
+            diffs.append((i, exp, act))
+            if len(diffs) >= limit:
+                break
+    return diffs
+
+
+def format_report(result):
+    counts = {}
+    for row in result["decisions"]:
+        counts[row[7]] = counts.get(row[7], 0) + 1
+    filled = sum(1 for o in result["orders"] if o["status"] == "FILLED")
+    balances = ", ".join(f"{cur} {value:.6f}" for cur, value in sorted(result["balances"].items()))
+    return "\n".join([
+        "Replay",
+        "----------------------------------------",
+        f"Evaluated ticks: {len(result['decisions'])}  "
+        f"(wakes: " + ", ".join(f"{k} {v}" for k, v in result["scheduler"].items()) + ")",
+        "Decisions:       " + ", ".join(f"{k} {v}" for k, v in sorted(counts.items())),
+        f"Orders:          {len(result['orders'])} placed, {filled} filled, {result['rejected_orders']} rejected",
+        f"Signal to fill:  p50 {result['execution']['signal_to_fill']['p50'] * 1000:.0f} ms, "
+        f"max {result['execution']['signal_to_fill']['max'] * 1000:.0f} ms (virtual)",
+        f"Final balances:  {balances}",
+        f"Virtual time:    {result['virtual_seconds'] / 3600:.2f} h in {result['wall_seconds']:.2f} s "
+        f"({result['speedup']:,.0f}x)",
+    ])
+
+
+# ==========================
+# CLI
+# ==========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded prices through the live ETH bot loop.")
+    parser.add_argument("path", help="CSV, Parquet, .npy, .npz or .ticks price file")
+    parser.add_argument("--usd", type=float, default=50.0, help="starting USD balance")
+    parser.add_argument("--base", type=float, default=0.05, help="starting ETH balance")
+    parser.add_argument("--fee", type=float, default=0.0, help="taker fee rate per fill, e.g. 0.006")
+    parser.add_argument("--maker-fee", type=float, default=None, help="maker fee rate (default: --fee)")
+    parser.add_argument("--spread", type=float, default=0.0, help="bid/ask spread as a fraction of price")
+    parser.add_argument("--post-only", action="store_true", help="enter with post-only limit orders")
+    parser.add_argument("--fill-delay", type=float, default=0.0, help="seconds before a market order fills")
+    parser.add_argument("--out", help="write per-tick decisions to this CSV")
+    parser.add_argument("--expect", help="compare decisions with a CSV from a previous --out")
+    parser.add_argument("--verbose", action="store_true", help="show the bot's own output")
+    args = parser.parse_args(argv)
+
+    timestamps, prices = load_ticks(args.path)
+    result = replay(
+        timestamps,
+        prices,
+        usd_balance=args.usd,
+        base_balance=args.base,
+        fee_rate=args.fee,
+        maker_fee_rate=args.maker_fee,
+        spread=args.spread,
+        fill_delay=args.fill_delay,
+        config={"POST_ONLY": True} if args.post_only else None,
+        quiet=not args.verbose,
+    )
+    print(format_report(result))
+
+    if args.out:
+        write_decisions(result["decisions"], args.out)
+        print(f"\nDecisions written to {args.out}")
+
+    if args.expect:
+        diffs = compare_decisions(result["decisions"], args.expect)
+        if diffs:
+            print(f"\nDecisions differ from {args.expect}:")
+            for i, exp, act in diffs:
+                print(f"  row {i}: expected {exp}\n  {'':>{len(str(i)) + 5}}actual   {act}")
+            sys.exit(1)
+        print(f"\nDecisions match {args.expect}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:                    # Windows
+    fcntl = None
+    import msvcrt
+
+from strategy import BUFFER_PARAMS, EXPOSURE_PARAMS, get_adaptive_buffer, get_adaptive_exposure, risk_kwargs
+
+# ==========================
+# PORTFOLIO RISK BOOK
+# ==========================
+#
+# One account-wide view of cash, holdings and exposure, shared by every
+# strategy trading the account: the ETH bot, the runner's strategies, or
+# several processes at once. Per-script limits only see their own pair, so
+# two bots could each go to full exposure; these limits see them all.
+#
+# State lives in a small memory-mapped file (anonymous memory for path=None):
+#
+#   header   magic, version, slot count, cash, total value, total pending
+#   slots    one 64-byte record per asset: name, qty, price, value, pending
+#
+# Price ticks, fills and balance syncs rewrite one slot and move the running
+# totals by the difference, so nothing is re-summed per tick and check() /
+# reserve() read a handful of numbers whatever the number of assets.
+# Every call holds a thread lock plus an exclusive lock on the file, so
+# check-and-reserve is atomic across threads and processes.
+#
+# Limits (account-wide versions of the adaptive helpers):
+#   portfolio   all holdings + pending buys + this buy <= get_adaptive_exposure(equity)
+#   asset       this asset's value + pending + this buy <= asset_limits[asset] (USD)
+#   buffer      cash - pending buys - this buy >= get_adaptive_buffer(cash)
+#
+# reserve() holds the amount as "pending" until the fill arrives (or
+# release() / reserve_ttl), so a buy in flight counts against every other
+# strategy at once.
+#
+#   RISK = PortfolioRisk("portfolio_risk.bin", asset_limits={"XRP": 9.35})
+#   RISK.sync(ACCOUNT.snapshot())                     # exchange balances
+#   RISK.on_price("ETH", price)
+#   allowed, reason = RISK.reserve("ETH", 12.50)      # check + hold
+#   RISK.on_fill("ETH", "BUY", size, price, fees)     # hold becomes a holding
+#   RISK.release("ETH", 12.50)                        # order rejected
+
+MAGIC = b"RISKBK01"
+VERSION = 1
+MAX_ASSETS = 32
+HEADER_SIZE = 64
+SLOT_SIZE = 64
+FILE_SIZE = HEADER_SIZE + MAX_ASSETS * SLOT_SIZE
+LOCK_OFFSET = FILE_SIZE                # Windows: lock a byte past the data
+
+HEADER = struct.Struct("<8sII")        # magic, version, max assets
+DOUBLE = struct.Struct("<d")
+COUNTER = struct.Struct("<Q")
+NAME = struct.Struct("<16s")
+
+# Header fields (byte offsets)
+CASH = 16
+TOTAL_VALUE = 24
+TOTAL_PENDING = 32
+UPDATED = 40
+SEQ = 48
+
+# Slot fields (byte offsets within a slot)
+QTY = 16
+PRICE = 24
+VALUE = 32
+PENDING = 40
+PENDING_AT = 48
+SLOT_UPDATED = 56
+
+EXPOSURE_BLOCKED = "Portfolio exposure cap reached"
+ASSET_BLOCKED = "Asset exposure cap reached"
+BUFFER_BLOCKED = "Portfolio USD buffer protection triggered"
+
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, LOCK_OFFSET, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class PortfolioRisk:
+    def __init__(self, path=None, asset_limits=None, risk_params=None, reserve_ttl=120.0, clock=time):
+        # asset_limits: {"XRP": 9.35} max USD held per asset
+        # risk_params: overrides for the get_adaptive_exposure / _buffer constants
+        # reserve_ttl: drop holds whose fill never arrived after this (s)
+        self.path = path
+        self.asset_limits = dict(asset_limits or {})
+        self.reserve_ttl = reserve_ttl
+        self.clock = clock
+        self._exposure_kwargs = risk_kwargs(risk_params, EXPOSURE_PARAMS)
+        self._buffer_kwargs = risk_kwargs(risk_params, BUFFER_PARAMS)
+
+        self._lock = threading.Lock()
+        self._slots = {}           # asset -> slot byte offset (slots are never freed)
+        self._fd = None
+        self._open()
+
+        self.checks = 0
+        self.blocked = 0
+        self.reservations = 0
+        self.expired = 0
+
+    # --------------------------
+    # Updates
+    # --------------------------
+
+    def on_price(self, asset, price):
+        with self._locked():
+            slot = self._slot(asset)
+            self._hold(slot, self._get(slot + QTY), price)
+
+    def on_fill(self, asset, side, size, price, fees=0.0):
+        # Moves cash and holdings until the next sync() confirms them; a buy
+        # fill also releases its hold
+        with self._locked():
+            slot = self._slot(asset)
+            qty = self._get(slot + QTY)
+            value = size * price
+            if side == "BUY":
+                self._hold(slot, qty + size, price)
+                self._add(CASH, -(value + fees))
+                self._release(slot, value + fees)
+            else:
+                self._hold(slot, max(qty - size, 0.0), price)
+                self._add(CASH, value - fees)
+
+    def sync(self, balances):
+        # Exchange balances ({"USD": 40.0, "ETH": 0.01, ...}) for cash and
+        # every tracked asset; also expires stale holds and re-sums the totals
+        with self._locked():
+            now = self.clock.time()
+            if "USD" in balances:
+                self._set(CASH, float(balances["USD"]))
+            total_value = total_pending = 0.0
+            for slot in self._scan():
+                name = self._name(slot)
+                if name in balances:
+                    self._hold(slot, float(balances[name]), self._get(slot + PRICE))
+                self._expire(slot, now)
+                total_value += self._get(slot + VALUE)
+                total_pending += self._get(slot + PENDING)
+            self._set(TOTAL_VALUE, total_value)
+            self._set(TOTAL_PENDING, total_pending)
+
+    # --------------------------
+    # Decisions
+    # --------------------------
+
+    def check(self, asset, usd):
+        # (allowed, reason) for buying `usd` of asset now; changes nothing
+        with self._locked():
+            return self._check(self._slot(asset), asset, usd)
+
+    def reserve(self, asset, usd):
+        # check() and, if allowed, hold `usd` against every limit
+        with self._locked():
+            slot = self._slot(asset)
+            allowed, reason = self._check(slot, asset, usd)
+            if allowed:
+                self._add(slot + PENDING, usd)
+                self._set(slot + PENDING_AT, self.clock.time())
+                self._add(TOTAL_PENDING, usd)
+                self.reservations += 1
+            return allowed, reason
+
+    def release(self, asset, usd=None):
+        # Drop a hold (all of this asset's holds when usd is None)
+        with self._locked():
+            self._release(self._slot(asset), usd)
+
+    # --------------------------
+    # Reporting
+    # --------------------------
+
+    def snapshot(self):
+        with self._locked():
+            cash = self._get(CASH)
+            total_value = self._get(TOTAL_VALUE)
+            pending = self._get(TOTAL_PENDING)
+            equity = cash + total_value
+            assets = {}
+            for slot in self._scan():
+                name = self._name(slot)
+                assets[name] = {
+                    "qty": self._get(slot + QTY),
+                    "price": self._get(slot + PRICE),
+                    "value": self._get(slot + VALUE),
+                    "pending": self._get(slot + PENDING),
+                    "limit": self.asset_limits.get(name),
+                }
+            return {
+                "cash": cash,
+                "equity": equity,
+                "exposure": total_value,
+                "pending": pending,
+                "exposure_pct": total_value / equity if equity > 0 else 0.0,
+                "exposure_cap": get_adaptive_exposure(equity, **self._exposure_kwargs),
+                "usd_buffer": get_adaptive_buffer(cash, **self._buffer_kwargs),
+                "assets": assets,
+                "updates": COUNTER.unpack_from(self._mm, SEQ)[0],
+            }
+
+    def stats(self):
+        return {
+            "checks": self.checks,
+            "blocked": self.blocked,
+            "reservations": self.reservations,
+            "expired": self.expired,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+    # --------------------------
+    # Internals (caller holds the lock)
+    # --------------------------
+
+    def _open(self):
+        if self.path is None:
+            self._mm = mmap.mmap(-1, FILE_SIZE)
+            HEADER.pack_into(self._mm, 0, MAGIC, VERSION, MAX_ASSETS)
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        # Whoever gets the lock first initializes the file
+        _lock_fd(self._fd)
+        try:
+            size = os.fstat(self._fd).st_size
+            if size == 0:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                os.write(self._fd, HEADER.pack(MAGIC, VERSION, MAX_ASSETS).ljust(FILE_SIZE, b"\0"))
+            elif size < FILE_SIZE:
+                raise ValueError(f"{self.path} is not a v{VERSION} risk book")
+            self._mm = mmap.mmap(self._fd, FILE_SIZE)
+        finally:
+            _unlock_fd(self._fd)
+
+        magic, version, slots = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or slots != MAX_ASSETS:
+            self.close()
+            raise ValueError(f"{self.path} is not a v{VERSION} risk book")
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            if self._fd is not None:
+                _lock_fd(self._fd)
+            try:
+                yield
+            finally:
+                if self._fd is not None:
+                    _unlock_fd(self._fd)
+
+    def _get(self, offset):
+        return DOUBLE.unpack_from(self._mm, offset)[0]
+
+    def _set(self, offset, value):
+        DOUBLE.pack_into(self._mm, offset, value)
+
+    def _add(self, offset, delta):
+        DOUBLE.pack_into(self._mm, offset, DOUBLE.unpack_from(self._mm, offset)[0] + delta)
+
+    def _touch(self, slot):
+        now = self.clock.time()
+        self._set(slot + SLOT_UPDATED, now)
+        self._set(UPDATED, now)
+        COUNTER.pack_into(self._mm, SEQ, COUNTER.unpack_from(self._mm, SEQ)[0] + 1)
+
+    def _name(self, slot):
+        return NAME.unpack_from(self._mm, slot)[0].rstrip(b"\0").decode("ascii")
+
+    def _scan(self):
+        # Offsets of the slots in use
+        slots = []
+        for i in range(MAX_ASSETS):
+            slot = HEADER_SIZE + i * SLOT_SIZE
+            if self._mm[slot] == 0:
+                break
+            slots.append(slot)
+        return slots
+
+    def _slot(self, asset):
+        slot = self._slots.get(asset)
+        if slot is not None:
+            return slot
+        # First use in this process: find it (another process may have
+        # claimed it) or claim the next free slot
+        name = asset.encode("ascii")
+        if not name or len(name) > NAME.size:
+            raise ValueError(f"Invalid asset name {asset!r}")
+        for i in range(MAX_ASSETS):
+            slot = HEADER_SIZE + i * SLOT_SIZE
+            if self._mm[slot] == 0:
+                self._mm[slot:slot + SLOT_SIZE] = bytes(SLOT_SIZE)
+                NAME.pack_into(self._mm, slot, name)
+                break
+            if self._name(slot) == asset:
+                break
+        else:
+            raise ValueError(f"Risk book is full ({MAX_ASSETS} assets)")
+        self._slots[asset] = slot
+        return slot
+
+    def _hold(self, slot, qty, price):
+        value = qty * price
+        self._add(TOTAL_VALUE, value - self._get(slot + VALUE))
+        self._set(slot + QTY, qty)
+        self._set(slot + PRICE, price)
+        self._set(slot + VALUE, value)
+        self._touch(slot)
+
+    def _release(self, slot, usd=None):
+        pending = self._get(slot + PENDING)
+        amount = pending if usd is None else min(usd, pending)
+        if amount > 0:
+            self._set(slot + PENDING, pending - amount)
+            self._add(TOTAL_PENDING, -amount)
+            self._touch(slot)
+
+    def _expire(self, slot, now):
+        if self.reserve_ttl is None or self._get(slot + PENDING) <= 0:
+            return
+        if now - self._get(slot + PENDING_AT) > self.reserve_ttl:
+            self._release(slot)
+            self.expired += 1
+
+    def _check(self, slot, asset, usd):
+        self.checks += 1
+        self._expire(slot, self.clock.time())
+
+        cash = self._get(CASH)
+        total_value = self._get(TOTAL_VALUE)
+        pending = self._get(TOTAL_PENDING)
+
+        reason = None
+        if total_value + pending + usd > get_adaptive_exposure(cash + total_value, **self._exposure_kwargs):
+            reason = EXPOSURE_BLOCKED
+        elif asset in self.asset_limits and (
+            self._get(slot + VALUE) + self._get(slot + PENDING) + usd > self.asset_limits[asset]
+        ):
+            reason = ASSET_BLOCKED
+        elif cash - pending - usd < get_adaptive_buffer(cash, **self._buffer_kwargs):
+            reason = BUFFER_BLOCKED
+
+        if reason is None:
+            return True, "OK to buy"
+        self.blocked += 1
+        return False, reason
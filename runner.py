@@ -0,0 +1,499 @@
+import asyncio
+import os
+import time
+
+from coinbase.rest import RESTClient
+
+from account import AccountState, coinbase_balances
+from bars import TIMEFRAMES, BarBuilder
+from candles import GRANULARITY_SECONDS, bootstrap, warm_up
+from execution import REJECTED, SUBMITTED, ExecutionEngine, OrderIds
+from indicators import EMAState
+from jsonlog import JsonLog
+from market_data import TickerFeed
+from price_aggregator import PriceAggregator, default_sources
+from notifier import DiscordNotifier
+from orders import OrderTracker
+from scheduler import EventScheduler
+from strategy import (
+    UnifiedVarianceEngine,
+    check_buy,
+    get_adaptive_buy_size,
+)
+from transport import COINBASE_HOST, TRANSPORT
+
+# ==========================
+# MULTI-ASSET RUNNER
+# ==========================
+#
+# One process, one price feed, one HTTP pool, one notifier, N strategies.
+# Each STRATEGIES entry gets its own EMA, UnifiedVarianceEngine and buy/sell
+# bookkeeping. Adding a pair is a new entry here, not a new script.
+#
+#   engine=None -> fixed buy_variance / sell_variance thresholds (bot.py)
+#   engine={}   -> UnifiedVarianceEngine with the given overrides
+#
+# Balances come from one AccountState shared by all strategies. A
+# risk.PortfolioRisk adds account-wide limits on top of each strategy's own
+# (shared with other bots on the account):
+#
+#   Runner(risk=PortfolioRisk("portfolio_risk.bin", asset_limits={"XRP": 9.35}))
+
+LOGS_WEBHOOK = os.environ.get("DISCORD_LOGS_WEBHOOK", "")
+ALERTS_WEBHOOK = os.environ.get("DISCORD_ALERTS_WEBHOOK", "")
+
+LOG_PATH = os.environ.get("RUNNER_LOG", "runner.jsonl")
+LOG_SAMPLE = {"tick": 1}          # keep 1 in N per-tick lines (file, stdout, Discord)
+BALANCE_MAX_AGE = 5               # seconds one balance fetch is shared across strategies
+
+API_KEY = os.environ.get("COINBASE_API_KEY", "")
+API_SECRET = os.environ.get("COINBASE_API_SECRET", "")
+
+STRATEGIES = [
+    {
+        "asset": "ETH-USD",
+        "window": 20,
+        "sleep_time": 15,
+        "engine": {},
+        "cooldown_seconds": 180,
+        "variance_drop_required": 0.005,
+        "dry_run": False,
+        "base_increment": 0.00000001,
+        "price_increment": 0.01,
+    },
+    {
+        "asset": "XRP-USD",
+        "window": 20,
+        "sleep_time": 30,
+        "engine": None,
+        "buy_variance": -0.0001,  # -0.01%
+        "sell_variance": 0.0003,  # +0.03%
+        "max_exposure_usd": 9.35,
+        "usd_buffer": 6.95,
+        "cooldown_seconds": 20,
+        "variance_drop_required": 0.005,
+        "dry_run": False,
+        "base_increment": 0.000001,
+        "price_increment": 0.0001,
+    },
+]
+
+DEFAULTS = {
+    "window": 20,
+    "sleep_time": 15,
+    "engine": {},
+    "buy_variance": None,
+    "sell_variance": None,
+    "max_exposure_usd": None,
+    "usd_buffer": None,
+    "cooldown_seconds": 180,
+    "variance_drop_required": 0.005,
+    "dry_run": True,
+    "post_only": False,           # post-only limit at the touch instead of market orders
+    "base_increment": 0.00000001,
+    "quote_increment": 0.01,
+    "price_increment": 0.01,
+    "min_interval": 2,            # scheduler: shortest wait between evaluations
+    "trigger_fraction": 0.8,      # scheduler: wake once variance passes this share of a threshold
+    "bar_timeframe": None,        # step EMA/engine once per closed bar of this many seconds (None = per evaluation)
+    "open_order_wait": 10,
+    "error_wait": 5,
+}
+
+
+class Strategy:
+    def __init__(self, config, runner):
+        cfg = dict(DEFAULTS)
+        cfg.update(config)
+        self.config = cfg
+        self.runner = runner
+
+        self.asset = cfg["asset"]
+        self.symbol = self.asset.split("-")[0]
+        self.window = cfg["window"]
+        self.sleep_time = cfg["sleep_time"]
+        self.dry_run = cfg["dry_run"]
+
+        self.ema = EMAState(self.window)
+        # sleep_time is now the longest wait; price moves wake the loop earlier
+        self.scheduler = EventScheduler(
+            min_interval=cfg["min_interval"],
+            max_interval=self.sleep_time,
+            trigger_fraction=cfg["trigger_fraction"],
+        )
+        self.engine = UnifiedVarianceEngine(**cfg["engine"]) if cfg["engine"] is not None else None
+        self.bar_timeframe = cfg["bar_timeframe"]
+        self.bar_cursor = runner.bars.cursor(self.asset, self.bar_timeframe) if self.bar_timeframe else 0
+        self.last_sequence = None      # feed tick count at the last evaluation
+
+        self.last_buy_time = 0
+        self.last_buy_price = None
+        self.recent_wins = 0
+        self.recent_losses = 0
+        self.total_wins = 0
+        self.total_losses = 0
+
+    # --------------------------
+    # I/O helpers
+    # --------------------------
+
+    def log(self, message, alert=False, event="log", level="info", **fields):
+        # Enqueue only: the runner's JsonLog thread writes and echoes it
+        line = f"[{self.asset}] {message}"
+        if self.runner.logger.log(event, line, level=level, asset=self.asset, **fields):
+            self.runner.send(ALERTS_WEBHOOK if alert else LOGS_WEBHOOK, line)
+
+    def get_balances(self):
+        account = self.runner.account
+        return account.balance("USD"), account.balance(self.symbol)
+
+    def has_open_orders(self):
+        return self.runner.orders.has_open_orders(self.asset)
+
+    async def get_price(self):
+        feed = self.runner.feed
+        if feed.is_fresh(self.asset):
+            return feed.latest(self.asset)[0]
+        return await asyncio.to_thread(feed.get_price, self.asset)
+
+    def bar_close(self, price):
+        # Bar mode: close of the newest bar closed since the last call (bars
+        # missed in between catch up the indicators first), or None
+        bars = self.runner.bars
+        if not self.runner.feed.is_fresh(self.asset):
+            bars.on_price(self.asset, price)     # REST fallback never reaches the listener
+        bars.roll()
+        closed, self.bar_cursor = bars.since(self.asset, self.bar_timeframe, self.bar_cursor)
+        if not len(closed):
+            return None
+        warm_up(self.ema, self.engine, closed["close"][:-1].tolist())
+        return float(closed["close"][-1])
+
+    def bar_wait(self):
+        close_at = self.runner.bars.next_close(self.asset, self.bar_timeframe)
+        return self.bar_timeframe if close_at is None else max(close_at - time.time(), 0.0)
+
+    # --------------------------
+    # Decisions
+    # --------------------------
+
+    def thresholds(self, variance, exposure_pct):
+        if self.engine is None:
+            return self.config["buy_variance"], self.config["sell_variance"]
+        return self.engine.update(current_variance=variance, current_exposure_pct=exposure_pct)
+
+    def can_buy(self, price, usd_balance, base_balance):
+        return check_buy(
+            price,
+            usd_balance=usd_balance,
+            base_balance=base_balance,
+            now=time.time(),
+            last_buy_time=self.last_buy_time,
+            last_buy_price=self.last_buy_price,
+            cooldown_seconds=self.config["cooldown_seconds"],
+            variance_drop_required=self.config["variance_drop_required"],
+            max_exposure_usd=self.config["max_exposure_usd"],
+            usd_buffer=self.config["usd_buffer"],
+        )
+
+    def release_risk(self, amount_usd):
+        if self.runner.risk is not None:
+            self.runner.risk.release(self.symbol, amount_usd)
+
+    def record_buy(self, price):
+        self.last_buy_time = time.time()
+        self.last_buy_price = price
+
+    def record_sell(self, price):
+        if self.last_buy_price is None:
+            return
+
+        pnl = price - self.last_buy_price
+        if pnl > 0:
+            self.recent_wins += 1
+            self.total_wins += 1
+            self.log(f"WIN +${pnl:.2f} | Total: {self.total_wins}W / {self.total_losses}L", alert=True)
+        else:
+            self.recent_losses += 1
+            self.total_losses += 1
+            self.log(f"LOSS ${pnl:.2f} | Total: {self.total_wins}W / {self.total_losses}L", alert=True)
+
+        self.last_buy_price = None
+
+    # --------------------------
+    # Orders
+    # --------------------------
+
+    async def place_buy_order(self, price, amount_usd, signal_time=None):
+        if self.dry_run:
+            self.log(f"[DRY RUN] BUY ${amount_usd:.2f} {self.symbol} at {price}")
+            self.record_buy(price)
+            return True
+
+        # record_buy runs when the fill is reported (Runner.on_fill)
+        order = await asyncio.to_thread(
+            self.runner.execution.buy, self.asset, amount_usd, signal_time, self.config["post_only"]
+        )
+        if order.status == REJECTED:
+            self.log(f"[ERROR] Buy order failed: {order.error}", alert=True)
+            return False
+
+        if order.status == SUBMITTED:
+            # May be on the exchange: the hold stays until it is reconciled (or expires)
+            self.log(f"[BUY] ${amount_usd:.2f} buy unconfirmed ({order.error}); reconciling.", alert=True)
+            return True
+
+        self.log(f"[BUY] ${amount_usd:.2f} {order.kind} buy placed.")
+        return True
+
+    async def place_sell_order(self, price, base_balance, signal_time=None):
+        if base_balance < self.config["base_increment"]:
+            self.log(f"[SELL BLOCKED] No {self.symbol} to sell.")
+            return False
+
+        if self.dry_run:
+            self.log(f"[DRY RUN] SELL {base_balance:.6f} {self.symbol} at {price}")
+            self.record_sell(price)
+            return True
+
+        self.log(f"Executing SELL {base_balance:.6f} {self.symbol} at {price}", alert=True)
+        order = await asyncio.to_thread(
+            self.runner.execution.sell, self.asset, base_balance, signal_time, self.config["post_only"]
+        )
+        if order.status == REJECTED:
+            self.log(f"[SELL ERROR] {order.error}", alert=True)
+            return False
+        if order.status == SUBMITTED:
+            self.log(f"[SELL] Sell unconfirmed ({order.error}); reconciling.", alert=True)
+        return True
+
+    # --------------------------
+    # Loop
+    # --------------------------
+
+    async def tick(self):
+        # One iteration of the old run_bot loop. Returns seconds to wait
+        # (price triggers off), or None to let the scheduler decide.
+        if self.has_open_orders():
+            self.log("[WAIT] Unprocessed orders detected. Bot pausing.")
+            return self.config["open_order_wait"]
+
+        # Read before the price: a tick racing in is evaluated next time
+        feed = self.runner.feed
+        sequence = feed.sequence(self.asset) if feed.is_fresh(self.asset) else None
+        current_price = await self.get_price()
+        signal_time = time.monotonic()
+        if not self.bar_timeframe and sequence is not None and sequence == self.last_sequence:
+            # No tick since the last evaluation: feeding the same price to the
+            # EMA/engine again would shrink the time they span
+            return None
+        self.last_sequence = sequence
+        if self.bar_timeframe:
+            current_price = self.bar_close(current_price)
+            if current_price is None:
+                return self.bar_wait()
+        ema = self.ema.update(current_price)
+
+        if ema is None:
+            self.runner.logger.log("log", f"[{self.asset}] Collecting data for EMA...", asset=self.asset)
+            return self.bar_wait() if self.bar_timeframe else self.sleep_time
+
+        variance = self.ema.variance
+
+        usd_balance, base_balance = await asyncio.to_thread(self.get_balances)
+        base_value = base_balance * current_price
+        total_equity = usd_balance + base_value
+        exposure_pct = base_value / total_equity if total_equity > 0 else 0.0
+
+        risk = self.runner.risk
+        if risk is not None:
+            risk.sync(self.runner.account.snapshot())
+            risk.on_price(self.symbol, current_price)
+
+        buy_var, sell_var = self.thresholds(variance, exposure_pct)
+
+        self.log(
+            f"{self.symbol} Price: {current_price:.4f} | EMA{self.window}: {ema:.4f} | "
+            f"Var: {variance*100:.2f}% | "
+            f"BUY_TH: {buy_var*100:.2f}% | SELL_TH: {sell_var*100:.2f}% | "
+            f"Exposure: {exposure_pct:.2f}",
+            event="tick",
+            price=current_price, ema=ema, variance=variance,
+            buy_var=buy_var, sell_var=sell_var, exposure=exposure_pct,
+        )
+
+        if variance <= buy_var:
+            allowed, reason = self.can_buy(current_price, usd_balance, base_balance)
+            size = get_adaptive_buy_size(
+                total_equity=total_equity,
+                variance=variance,
+                recent_wins=self.recent_wins,
+                recent_losses=self.recent_losses,
+            )
+            if allowed and risk is not None:
+                # Holds the size against the account-wide limits until it fills
+                allowed, reason = risk.reserve(self.symbol, size)
+            if allowed:
+                self.log(f"BUY signal triggered at {current_price}", alert=True)
+                placed = False
+                try:
+                    placed = await self.place_buy_order(current_price, size, signal_time)
+                finally:
+                    if risk is not None and (self.dry_run or not placed):
+                        # No order on the exchange (dry run, rejected or raised)
+                        self.release_risk(size)
+            else:
+                self.log(f"BUY blocked: {reason}")
+
+        elif variance >= sell_var and base_balance > 0:
+            self.log(f"SELL signal triggered at {current_price}", alert=True)
+            await self.place_sell_order(current_price, base_balance, signal_time)
+
+        self.scheduler.decided(self.asset)
+        self.scheduler.arm(self.asset, ema, variance, buy_var, sell_var)
+        return self.bar_wait() if self.bar_timeframe else None
+
+    async def run(self):
+        while not self.runner.stopping:
+            try:
+                delay = await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.log(f"[ERROR] {e}", alert=True, event="error", level="error")
+                # Don't come back before the exchange circuit breaker would let us through
+                await asyncio.sleep(max(self.config["error_wait"], TRANSPORT.retry_in(COINBASE_HOST)))
+                continue
+
+            # Awaited on the loop: a waiting strategy holds no executor thread
+            if delay is None:
+                await self.scheduler.wait_async(self.asset)
+            else:
+                await self.scheduler.wait_async(self.asset, delay, False)
+
+
+class Runner:
+    def __init__(self, configs=None, client=None, feed=None, notifier=None, account=None, orders=None, execution=None, prices=None, logger=None, risk=None):
+        configs = STRATEGIES if configs is None else configs
+
+        self.logger = logger or JsonLog(LOG_PATH, sample=LOG_SAMPLE)
+        self.client = client or TRANSPORT.attach(RESTClient(api_key=API_KEY, api_secret=API_SECRET))
+        # Hedged REST prices for when the stream is stale (see price_aggregator.py)
+        self.prices = prices or PriceAggregator(default_sources())
+        self.feed = feed or TickerFeed([c["asset"] for c in configs], fallback=self.prices.get_price)
+        self.notifier = notifier or DiscordNotifier(
+            priority_webhooks=[ALERTS_WEBHOOK],
+            digest_webhooks=[LOGS_WEBHOOK],
+        )
+        self.orders = orders or OrderTracker(
+            self.client,
+            product_ids=[c["asset"] for c in configs],
+            call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs),
+            on_error=self.on_orders_error,
+            on_change=self.on_orders_closed,
+        )
+        # Shared AccountState (see account.py); by default the client's
+        # available balances, refetched at most every BALANCE_MAX_AGE seconds
+        self.account = account or AccountState(
+            lambda: coinbase_balances(self.client, call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs)),
+            max_age=BALANCE_MAX_AGE,
+        )
+        # Shared risk.PortfolioRisk for account-wide exposure limits; None
+        # keeps the per-strategy limits only
+        self.risk = risk
+        # Multi-timeframe OHLCV bars from the shared feed (see bars.py)
+        timeframes = set(TIMEFRAMES) | {c["bar_timeframe"] for c in configs if c.get("bar_timeframe")}
+        self.bars = BarBuilder([c["asset"] for c in configs], timeframes)
+        self.feed.add_listener(self.bars.on_price)
+        self.strategies = [Strategy(c, self) for c in configs]
+        self.execution = execution or ExecutionEngine(
+            self.client,
+            call=lambda fn, **kwargs: TRANSPORT.call(COINBASE_HOST, fn, **kwargs),
+            ids=OrderIds("runner"),
+            on_update=self.on_order_update,
+            on_fill=self.on_fill,
+            increments={
+                s.asset: {
+                    "base": s.config["base_increment"],
+                    "quote": s.config["quote_increment"],
+                    "price": s.config["price_increment"],
+                }
+                for s in self.strategies
+            },
+        )
+        self.stopping = False
+        for s in self.strategies:
+            self.feed.add_listener(s.scheduler.on_price)
+
+    def on_order_update(self, order):
+        self.orders.track(order.client_order_id, order.product_id, order.order_id, order.exchange_status)
+        if order.done:
+            self.account.invalidate()
+
+    def on_fill(self, order):
+        for s in self.strategies:
+            if s.asset == order.product_id:
+                if self.risk is not None:
+                    self.risk.on_fill(s.symbol, order.side, order.filled_size, order.average_price, order.fees)
+                s.log(f"[{order.side} FILLED] {order.filled_size:.6f} {s.symbol} at {order.average_price:.4f}")
+                if order.side == "BUY":
+                    s.record_buy(order.average_price)
+                else:
+                    s.record_sell(order.average_price)
+
+    def on_orders_error(self, e):
+        message = f"[ERROR] Could not fetch open orders: {e}"
+        self.logger.log("error", message, level="error")
+        self.send(ALERTS_WEBHOOK, message)
+
+    def on_orders_closed(self, product_id):
+        for s in self.strategies:
+            if s.asset == product_id:
+                s.scheduler.wake(product_id)
+
+    def send(self, webhook, message):
+        if webhook:
+            self.notifier.send(webhook, message)
+
+    async def bootstrap(self, count=100, granularity="ONE_MINUTE"):
+        # One concurrent candle fetch for every strategy that is still cold
+        cold = [s for s in self.strategies if not s.ema.ready]
+        if not cold:
+            return
+        candles = await asyncio.to_thread(bootstrap, sorted({s.asset for s in cold}), count, granularity)
+        for s in cold:
+            closes = [c["close"] for c in candles.get(s.asset, [])]
+            if warm_up(s.ema, s.engine, closes):
+                self.logger.log("log", f"[{s.asset}] Indicators warmed up from {len(closes)} {granularity} candles.", asset=s.asset)
+            if GRANULARITY_SECONDS[granularity] in self.bars.timeframes:
+                self.bars.seed(s.asset, GRANULARITY_SECONDS[granularity], candles.get(s.asset, []))
+            if s.bar_timeframe:
+                # Seeded candles are already in the EMA
+                s.bar_cursor = self.bars.cursor(s.asset, s.bar_timeframe)
+
+    async def run(self):
+        header = "\n".join(
+            f"{s.asset}: EMA{s.window} | max wait {s.sleep_time}s | "
+            f"{'UnifiedVarianceEngine' if s.engine else 'fixed thresholds'} | DRY RUN: {s.dry_run}"
+            for s in self.strategies
+        )
+        self.logger.log("start", "Starting multi-asset EMA runner...\n" + header + "\n----------------------------------------")
+        self.send(LOGS_WEBHOOK, f"Runner started with {len(self.strategies)} strategies.")
+
+        self.feed.start()
+        self.orders.start()
+        self.execution.start()
+        await self.bootstrap()
+        try:
+            await asyncio.gather(*(s.run() for s in self.strategies))
+        finally:
+            self.stopping = True
+            self.feed.stop()
+            self.orders.stop()
+            self.execution.stop()
+            self.notifier.stop()
+            self.logger.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(Runner().run())
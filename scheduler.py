@@ -0,0 +1,229 @@
+import asyncio
+import threading
+import time
+
+from metrics import LatencyHistogram
+
+# ==========================
+# EVENT-DRIVEN SCHEDULING
+# ==========================
+#
+# Replaces the fixed SLEEP_TIME between evaluations. After each evaluation
+# the loop arms the scheduler with the EMA and the thresholds it just used.
+# Every streamed price then re-projects variance against that EMA (one
+# division, on the feed thread) and wakes the loop as soon as it moves past
+# trigger_fraction of buy_var or sell_var.
+#
+# Without a trigger the loop still wakes after an adaptive interval: the
+# expected time for variance to diffuse to the nearest trigger level at its
+# recent speed, clamped to [min_interval, max_interval]. Volatile markets
+# poll fast, flat ones fall back to max_interval. Speed is measured between
+# successive price ticks (not from arm time, which a tick right after an
+# evaluation would turn into a near-zero dt).
+#
+#   SCHEDULER = EventScheduler(max_interval=SLEEP_TIME)
+#   FEED.add_listener(SCHEDULER.on_price)
+#   ... evaluate ...
+#   SCHEDULER.arm(ASSET, ema, variance, buy_var, sell_var)
+#   SCHEDULER.wait(ASSET)        # -> "trigger", "wake" or "timeout"
+#   SCHEDULER.decided(ASSET)     # wake-to-decision latency after a trigger
+#
+# Coroutines use `await SCHEDULER.wait_async(ASSET)` instead: it parks on an
+# asyncio.Event that the feed/tracker threads set through
+# call_soon_threadsafe, so a waiting strategy holds no executor thread.
+
+
+class _Watch:
+    __slots__ = (
+        "ema", "buy_level", "sell_level", "armed_at",
+        "last_variance", "tick_price", "tick_time", "speed",
+        "triggered", "woken", "woken_at", "waiters",
+    )
+
+    def __init__(self):
+        self.ema = None
+        self.buy_level = None
+        self.sell_level = None
+        self.armed_at = 0.0
+        self.last_variance = None
+        self.tick_price = None     # previous tick, for the speed estimate
+        self.tick_time = None
+        self.speed = 0.0           # EW mean of d(variance)^2 / dt between ticks
+        self.triggered = False
+        self.woken = False
+        self.woken_at = None
+        self.waiters = []          # (loop, asyncio.Event) of pending wait_async calls
+
+
+class EventScheduler:
+    def __init__(self, min_interval=2.0, max_interval=15.0, trigger_fraction=0.8, speed_alpha=0.1, clock=time):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.trigger_fraction = trigger_fraction
+        self.speed_alpha = speed_alpha
+        self.clock = clock
+
+        self._cond = threading.Condition()
+        self._watches = {}
+
+        self.triggers = 0
+        self.wakes = 0
+        self.timeouts = 0
+        self.latency = LatencyHistogram()
+
+    def _watch(self, product_id):
+        w = self._watches.get(product_id)
+        if w is None:
+            w = self._watches[product_id] = _Watch()
+        return w
+
+    # --------------------------
+    # Loop side
+    # --------------------------
+
+    def arm(self, product_id, ema, variance, buy_var, sell_var):
+        with self._cond:
+            w = self._watch(product_id)
+            w.ema = ema
+            w.buy_level = buy_var * self.trigger_fraction
+            w.sell_level = sell_var * self.trigger_fraction
+            w.armed_at = self.clock.monotonic()
+            w.last_variance = variance
+            w.triggered = False
+            w.woken = False
+            w.woken_at = None
+
+    def interval(self, product_id):
+        with self._cond:
+            w = self._watches.get(product_id)
+            if w is None or w.ema is None or w.speed <= 0:
+                return self.max_interval
+            gap = max(min(w.last_variance - w.buy_level, w.sell_level - w.last_variance), 0.0)
+            expected = gap * gap / w.speed
+        return min(max(expected, self.min_interval), self.max_interval)
+
+    def wait(self, product_id, timeout=None, triggers=True):
+        # Blocks until a price trigger (if triggers), wake(), or the timeout
+        # (default: the adaptive interval). Returns the reason.
+        if timeout is None:
+            timeout = self.interval(product_id)
+        deadline = self.clock.monotonic() + timeout
+
+        with self._cond:
+            w = self._watch(product_id)
+            while True:
+                reason = self._take(w, triggers)
+                if reason:
+                    return reason
+                remaining = deadline - self.clock.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    return "timeout"
+                self._cond.wait(remaining)
+
+    async def wait_async(self, product_id, timeout=None, triggers=True):
+        # wait() for coroutines, without blocking a thread
+        if timeout is None:
+            timeout = self.interval(product_id)
+        deadline = self.clock.monotonic() + timeout
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+
+        with self._cond:
+            w = self._watch(product_id)
+            w.waiters.append(waiter)
+        try:
+            while True:
+                with self._cond:
+                    reason = self._take(w, triggers)
+                    if reason:
+                        return reason
+                    # A notify after this point sets the event again
+                    waiter[1].clear()
+                remaining = deadline - self.clock.monotonic()
+                if remaining <= 0:
+                    with self._cond:
+                        self.timeouts += 1
+                    return "timeout"
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                w.waiters.remove(waiter)
+
+    def decided(self, product_id):
+        # Seconds from the trigger to now, once per trigger; None otherwise
+        with self._cond:
+            w = self._watches.get(product_id)
+            if w is None or w.woken_at is None:
+                return None
+            latency = time.perf_counter() - w.woken_at
+            w.woken_at = None
+        self.latency.record(latency)
+        return latency
+
+    # --------------------------
+    # Event side
+    # --------------------------
+
+    def on_price(self, product_id, price):
+        # TickerFeed listener (feed thread)
+        self._observe(product_id, price, self.clock.monotonic())
+
+    def wake(self, product_id=None):
+        # Wake one product's wait (or all), e.g. when its open orders clear
+        with self._cond:
+            targets = [self._watch(product_id)] if product_id is not None else list(self._watches.values())
+            for w in targets:
+                w.woken = True
+                self._notify(w)
+
+    def _observe(self, product_id, price, now):
+        with self._cond:
+            w = self._watches.get(product_id)
+            if w is None or w.ema is None:
+                return
+
+            variance = (price - w.ema) / w.ema
+            w.last_variance = variance
+            if w.tick_time is None or now > w.tick_time:
+                if w.tick_time is not None:
+                    dv = (price - w.tick_price) / w.ema
+                    w.speed += self.speed_alpha * (dv * dv / (now - w.tick_time) - w.speed)
+                w.tick_price = price
+                w.tick_time = now
+
+            if w.triggered or now - w.armed_at < self.min_interval:
+                return
+            if variance <= w.buy_level or variance >= w.sell_level:
+                w.triggered = True
+                w.woken_at = time.perf_counter()
+                self._notify(w)
+
+    def _notify(self, w):
+        # Wake wait() and wait_async() callers (caller holds the lock)
+        self._cond.notify_all()
+        for loop, event in w.waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def _take(self, w, triggers):
+        # Consume a pending trigger/wake (caller holds the lock)
+        if triggers and w.triggered:
+            w.triggered = False
+            self.triggers += 1
+            return "trigger"
+        if w.woken:
+            w.woken = False
+            self.wakes += 1
+            return "wake"
+        return None
+
+    def stats(self):
+        return {
+            "triggers": self.triggers,
+            "wakes": self.wakes,
+            "timeouts": self.timeouts,
+            "wake_to_decision": self.latency.summary(),
+            "intervals": {p: self.interval(p) for p in list(self._watches)},
+        }
@@ -0,0 +1,559 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+# ==========================
+# LOCAL STAND-IN SERVICES
+# ==========================
+#
+# Small in-process fakes of the exchange endpoints the bots talk to, so the
+# streaming / reconnect / fallback / bootstrap logic can be exercised offline.
+
+
+class FakeTickerServer:
+    # Speaks just enough of the Advanced Trade WebSocket protocol for
+    # TickerFeed: accepts subscribe messages and pushes "ticker" events.
+    #
+    #   server = FakeTickerServer().start()
+    #   feed = TickerFeed(["ETH-USD"], url=server.url)
+    #   server.push("ETH-USD", 2500.0)
+    #   server.drop_connections()   # force a reconnect
+    #   server.silent = True        # stop sending anything (staleness)
+
+    def __init__(self, host="127.0.0.1", port=0, heartbeat_interval=None):
+        self.host = host
+        self.port = port
+        self.heartbeat_interval = heartbeat_interval
+        self.silent = False
+        self.connections = 0
+        self.subscriptions = []
+
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._thread_main, name="fake-ticker", daemon=True)
+        self._thread.start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(5)
+        self._loop = None
+
+    def push(self, product_id, price):
+        message = json.dumps({
+            "channel": "ticker",
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "events": [{
+                "type": "update",
+                "tickers": [{"type": "ticker", "product_id": product_id, "price": str(price)}],
+            }],
+        })
+        self._broadcast(message)
+
+    def drop_connections(self):
+        def close_all():
+            for ws in list(self._clients):
+                asyncio.ensure_future(ws.close())
+        self._loop.call_soon_threadsafe(close_all)
+
+    def client_count(self):
+        return len(self._clients)
+
+    # --------------------------
+    # Server internals
+    # --------------------------
+
+    def _broadcast(self, message):
+        if self.silent or self._loop is None:
+            return
+
+        def send_all():
+            for ws in list(self._clients):
+                asyncio.ensure_future(ws.send(message))
+        self._loop.call_soon_threadsafe(send_all)
+
+    def _thread_main(self):
+        import websockets
+
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(websockets.serve(self._handler, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.heartbeat_interval:
+            self._loop.create_task(self._heartbeats())
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handler(self, ws, path=None):
+        self.connections += 1
+        self._clients.add(ws)
+        try:
+            async for raw in ws:
+                try:
+                    self.subscriptions.append(json.loads(raw))
+                except ValueError:
+                    continue
+        except Exception:
+            pass
+        finally:
+            self._clients.discard(ws)
+
+    async def _heartbeats(self):
+        counter = 0
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            counter += 1
+            self._broadcast(json.dumps({"channel": "heartbeats", "events": [{"heartbeat_counter": counter}]}))
+
+
+class FakeCandlesServer:
+    # Serves the public candles endpoint from fixture data, including the
+    # 350-candles-per-request limit and newest-first ordering.
+    #
+    #   server = FakeCandlesServer({"ETH-USD": candles}).start()
+    #   fetch_candles("ETH-USD", 500, base_url=server.base_url)
+
+    PATH_PREFIX = "/api/v3/brokerage/market/products/"
+    MAX_CANDLES = 350
+
+    def __init__(self, fixtures=None, host="127.0.0.1", port=0):
+        # fixtures: {product_id: [{"start", "open", "high", "low", "close", "volume"}, ...]}
+        self.fixtures = fixtures or {}
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._server = None
+
+    @classmethod
+    def from_prices(cls, product_id, timestamps, prices, **kwargs):
+        candles = [
+            {"start": str(int(t)), "open": str(p), "high": str(p), "low": str(p), "close": str(p), "volume": "0"}
+            for t, p in zip(timestamps, prices)
+        ]
+        return cls({product_id: candles}, **kwargs)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}{self.PATH_PREFIX}{{product_id}}/candles"
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake.requests += 1
+                status, payload = fake.handle(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-candles", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, path):
+        parts = urlsplit(path)
+        if not parts.path.startswith(self.PATH_PREFIX) or not parts.path.endswith("/candles"):
+            return 404, {"error": "NOT_FOUND"}
+
+        product_id = parts.path[len(self.PATH_PREFIX):-len("/candles")]
+        if product_id not in self.fixtures:
+            return 404, {"error": "NOT_FOUND", "message": f"unknown product {product_id}"}
+
+        query = parse_qs(parts.query)
+        try:
+            start = int(query["start"][0])
+            end = int(query["end"][0])
+        except (KeyError, ValueError):
+            return 400, {"error": "INVALID_ARGUMENT", "message": "start and end are required"}
+
+        candles = [c for c in self.fixtures[product_id] if start <= int(c["start"]) <= end]
+        if len(candles) > self.MAX_CANDLES:
+            return 400, {"error": "INVALID_ARGUMENT", "message": "number of candles requested should be less than 350"}
+
+        candles.sort(key=lambda c: int(c["start"]), reverse=True)
+        return 200, {"candles": candles}
+
+
+class FakePriceServer:
+    # Serves the spot, ticker and product_book price endpoints for one or
+    # more products, with per-endpoint delay, price offset, quote age and
+    # failures, so PriceAggregator's hedging and outlier handling can be
+    # exercised offline.
+    #
+    #   server = FakePriceServer({"ETH-USD": 2500.0}).start()
+    #   server.delays["spot"] = 0.5         # slow source
+    #   server.offsets["book"] = 0.05       # 5% off (outlier)
+    #   server.ages["ticker"] = 60          # stale quote
+    #   server.failing.add("spot")          # HTTP 503
+    #   PriceAggregator(server.sources())
+
+    ENDPOINTS = ("spot", "ticker", "book")
+
+    def __init__(self, prices=None, host="127.0.0.1", port=0, spread=0.0):
+        self.prices = dict(prices or {})
+        self.host = host
+        self.port = port
+        self.spread = spread
+        self.delays = {}
+        self.offsets = {}
+        self.ages = {}
+        self.failing = set()
+        self.requests = {name: 0 for name in self.ENDPOINTS}
+        self._server = None
+
+    @property
+    def base(self):
+        return f"http://{self.host}:{self.port}"
+
+    def urls(self):
+        return {
+            "spot": self.base + "/v2/prices/{product_id}/spot",
+            "ticker": self.base + "/products/{product_id}/ticker",
+            "book": self.base + "/api/v3/brokerage/market/product_book?product_id={product_id}&limit=1",
+        }
+
+    def sources(self, transport=None):
+        from price_aggregator import default_sources
+
+        return default_sources(transport, self.urls())
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, payload = fake.handle(self.path)
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-prices", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def handle(self, path):
+        parts = urlsplit(path)
+        segments = parts.path.strip("/").split("/")
+        if parts.path.startswith("/v2/prices/") and parts.path.endswith("/spot"):
+            endpoint, product_id = "spot", segments[2]
+        elif parts.path.startswith("/products/") and parts.path.endswith("/ticker"):
+            endpoint, product_id = "ticker", segments[1]
+        elif parts.path == "/api/v3/brokerage/market/product_book":
+            endpoint, product_id = "book", parse_qs(parts.query).get("product_id", [""])[0]
+        else:
+            return 404, {"error": "NOT_FOUND"}
+
+        self.requests[endpoint] += 1
+        if self.delays.get(endpoint):
+            time.sleep(self.delays[endpoint])
+        if endpoint in self.failing:
+            return 503, {"error": "UNAVAILABLE"}
+        if product_id not in self.prices:
+            return 404, {"error": "NOT_FOUND", "message": f"unknown product {product_id}"}
+
+        price = self.prices[product_id] * (1 + self.offsets.get(endpoint, 0.0))
+        quoted = _iso(time.time() - self.ages.get(endpoint, 0.0))
+        if endpoint == "spot":
+            return 200, {"data": {"amount": str(price), "base": product_id.split("-")[0], "currency": "USD"}}
+        if endpoint == "ticker":
+            return 200, {"price": str(price), "time": quoted}
+        half = price * self.spread / 2
+        return 200, {"pricebook": {
+            "product_id": product_id,
+            "bids": [{"price": str(price - half), "size": "1"}],
+            "asks": [{"price": str(price + half), "size": "1"}],
+            "time": quoted,
+        }}
+
+
+class FakeRESTClient:
+    # In-memory stand-in for coinbase.rest.RESTClient. Orders fill against
+    # price_fn(product_id), balances are kept locally, and list_orders /
+    # get_order / get_accounts / get_best_bid_ask report what happened. Time
+    # comes from `clock` (anything with .time()), so it runs on a virtual
+    # clock for replays.
+    #
+    #   exchange = FakeRESTClient({"USD": 50.0, "ETH": 0.05}, feed.get_price, clock=clock)
+    #   exchange.create_order(client_order_id="bot_1", product_id="ETH-USD", side="BUY",
+    #                         order_configuration={"market_market_ioc": {"quote_size": "10"}})
+    #
+    # The book is price_fn +/- spread/2. Market orders take the touch:
+    # immediately, or after fill_delay seconds (the next settle() call), in
+    # fill_slices equal parts, one per settle(). Post-only limit orders
+    # (limit_limit_gtc) are rejected if they would cross and otherwise rest
+    # until price_fn trades through the limit, then fill at the limit with
+    # the maker fee. Rejections return success=False like the real API.
+
+    def __init__(self, balances, price_fn, clock=time, fee_rate=0.0, maker_fee_rate=None,
+                 spread=0.0, fill_delay=0.0, fill_slices=1):
+        self.balances = dict(balances)
+        self.price_fn = price_fn
+        self.clock = clock
+        self.fee_rate = fee_rate
+        self.maker_fee_rate = fee_rate if maker_fee_rate is None else maker_fee_rate
+        self.spread = spread
+        self.fill_delay = fill_delay
+        self.fill_slices = fill_slices
+
+        self._orders = {}          # order_id -> order dict
+        self._by_client_id = {}    # client_order_id -> order_id
+        self._fill_listeners = []
+        self._next_id = 1
+
+        self.rejected = 0
+
+    def on_fill(self, fn):
+        self._fill_listeners.append(fn)
+
+    def touch(self, product_id):
+        mid = float(self.price_fn(product_id))
+        return mid * (1 - self.spread / 2), mid * (1 + self.spread / 2)
+
+    # --------------------------
+    # Orders
+    # --------------------------
+
+    def create_order(self, client_order_id, product_id, side, order_configuration, **kwargs):
+        if client_order_id and client_order_id in self._by_client_id:
+            # Same de-duplication the exchange does on client_order_id
+            return self._success(self._orders[self._by_client_id[client_order_id]])
+
+        base, quote = product_id.split("-")
+        bid, ask = self.touch(product_id)
+        market = order_configuration.get("market_market_ioc")
+        limit = order_configuration.get("limit_limit_gtc")
+
+        if market is not None:
+            limit_price = None
+            if side == "BUY":
+                held, amount = quote, float(market["quote_size"])
+            else:
+                held, amount = base, float(market["base_size"])
+        elif limit is not None:
+            limit_price = float(limit["limit_price"])
+            size = float(limit["base_size"])
+            if limit.get("post_only") and (limit_price >= ask if side == "BUY" else limit_price <= bid):
+                return self._failure("INVALID_LIMIT_PRICE_POST_ONLY", "post-only order would cross the book")
+            if side == "BUY":
+                held, amount = quote, size * limit_price
+            else:
+                held, amount = base, size
+        else:
+            return self._failure("UNSUPPORTED_ORDER_CONFIGURATION", f"{sorted(order_configuration)}")
+
+        if amount <= 0 or self.balances.get(held, 0.0) < amount - 1e-9:
+            return self._failure("INSUFFICIENT_FUND", f"{side} {amount} {held}")
+
+        # Funds are held at placement and converted at fill
+        self.balances[held] -= amount
+
+        order_id = f"fake-{self._next_id}"
+        self._next_id += 1
+        now = self.clock.time()
+        order = {
+            "order_id": order_id,
+            "client_order_id": client_order_id or order_id,
+            "product_id": product_id,
+            "side": side,
+            "status": "OPEN",
+            "created_time": _iso(now),
+            "limit_price": limit_price,
+            "amount": amount,
+            "remaining": amount,
+            "filled_size": 0.0,
+            "filled_value": 0.0,
+            "average_filled_price": 0.0,
+            "total_fees": 0.0,
+            "fill_at": now + self.fill_delay,
+        }
+        self._orders[order_id] = order
+        self._by_client_id[order["client_order_id"]] = order_id
+
+        if limit_price is None and self.fill_delay <= 0:
+            while order["status"] == "OPEN":
+                self._fill_slice(order, bid, ask)
+        return self._success(order)
+
+    def market_order_buy(self, client_order_id=None, product_id=None, quote_size=None, **kwargs):
+        return self.create_order(
+            client_order_id, product_id, "BUY", {"market_market_ioc": {"quote_size": quote_size}}, **kwargs
+        )
+
+    def market_order_sell(self, client_order_id=None, product_id=None, base_size=None, **kwargs):
+        return self.create_order(
+            client_order_id, product_id, "SELL", {"market_market_ioc": {"base_size": base_size}}, **kwargs
+        )
+
+    def cancel_orders(self, order_ids, **kwargs):
+        results = []
+        for order_id in order_ids:
+            order = self._orders.get(order_id)
+            ok = order is not None and order["status"] == "OPEN"
+            if ok:
+                base, quote = order["product_id"].split("-")
+                held = quote if order["side"] == "BUY" else base
+                self.balances[held] += order["remaining"]
+                order["remaining"] = 0.0
+                order["status"] = "CANCELLED"
+            results.append(SimpleNamespace(success=ok, order_id=order_id,
+                                           failure_reason=None if ok else "UNKNOWN_CANCEL_ORDER"))
+        return SimpleNamespace(results=results)
+
+    def settle(self, now=None):
+        now = self.clock.time() if now is None else now
+        for order in list(self._orders.values()):
+            if order["status"] != "OPEN":
+                continue
+            bid, ask = self.touch(order["product_id"])
+            if order["limit_price"] is None:
+                if order["fill_at"] <= now:
+                    self._fill_slice(order, bid, ask)
+            else:
+                mid = (bid + ask) / 2
+                crossed = mid <= order["limit_price"] if order["side"] == "BUY" else mid >= order["limit_price"]
+                if crossed:
+                    self._fill_slice(order, bid, ask)
+
+    def _fill_slice(self, order, bid, ask):
+        base, quote = order["product_id"].split("-")
+        maker = order["limit_price"] is not None
+        price = order["limit_price"] if maker else (ask if order["side"] == "BUY" else bid)
+        fee_rate = self.maker_fee_rate if maker else self.fee_rate
+
+        part = min(order["amount"] / self.fill_slices, order["remaining"])
+        if order["remaining"] - part < 1e-12:
+            part = order["remaining"]
+        order["remaining"] -= part
+
+        if order["side"] == "BUY":
+            # part is quote currency
+            fee = part * fee_rate
+            size = (part - fee) / price
+            self.balances[base] = self.balances.get(base, 0.0) + size
+        else:
+            size = part
+            fee = size * price * fee_rate
+            self.balances[quote] = self.balances.get(quote, 0.0) + size * price - fee
+
+        order["filled_size"] += size
+        order["filled_value"] += size * price
+        order["average_filled_price"] = order["filled_value"] / order["filled_size"]
+        order["total_fees"] += fee
+        if order["remaining"] <= 0:
+            order["status"] = "FILLED"
+        for fn in self._fill_listeners:
+            fn(self._order_view(order))
+
+    # --------------------------
+    # Reads
+    # --------------------------
+
+    def list_orders(self, product_ids=None, order_status=None, start_date=None, cursor=None, **kwargs):
+        since = datetime.fromisoformat(start_date.replace("Z", "+00:00")).timestamp() if start_date else None
+        orders = [
+            self._order_view(o)
+            for o in self._orders.values()
+            if (not product_ids or o["product_id"] in product_ids)
+            and (not order_status or o["status"] in order_status)
+            and (since is None or datetime.fromisoformat(o["created_time"][:-1] + "+00:00").timestamp() >= since)
+        ]
+        return SimpleNamespace(orders=orders, has_next=False, cursor="")
+
+    def get_order(self, order_id):
+        return SimpleNamespace(order=self._order_view(self._orders[order_id]))
+
+    def get_best_bid_ask(self, product_ids=None, **kwargs):
+        books = []
+        for product_id in product_ids or []:
+            bid, ask = self.touch(product_id)
+            books.append(SimpleNamespace(
+                product_id=product_id,
+                bids=[{"price": str(bid), "size": "1"}],
+                asks=[{"price": str(ask), "size": "1"}],
+            ))
+        return SimpleNamespace(pricebooks=books)
+
+    def get_accounts(self, limit=250, cursor=None, **kwargs):
+        accounts = [
+            SimpleNamespace(currency=cur, available_balance={"value": str(value), "currency": cur})
+            for cur, value in sorted(self.balances.items())
+        ]
+        return SimpleNamespace(accounts=accounts, has_next=False, cursor="")
+
+    def get_balances(self):
+        return dict(self.balances)
+
+    def orders(self):
+        return [dict(o) for o in self._orders.values()]
+
+    def _order_view(self, order):
+        hidden = ("amount", "remaining", "filled_value", "fill_at", "limit_price")
+        return SimpleNamespace(**{k: v for k, v in order.items() if k not in hidden})
+
+    def _success(self, order):
+        return SimpleNamespace(
+            success=True,
+            order_id=order["order_id"],
+            success_response={"order_id": order["order_id"], "client_order_id": order["client_order_id"]},
+        )
+
+    def _failure(self, error, message):
+        self.rejected += 1
+        return SimpleNamespace(
+            success=False,
+            failure_reason=error,
+            error_response={"error": error, "message": message},
+        )
+
+
+def _iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
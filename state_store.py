@@ -0,0 +1,147 @@
+import atexit
+import json
+import sqlite3
+import threading
+import time
+
+# ==========================
+# PERSISTENT STRATEGY STATE
+# ==========================
+#
+# Small key/value store on SQLite in WAL mode. put() only records the latest
+# value for a key in memory; a background thread writes everything pending
+# in one transaction every flush_interval seconds (write-behind), so the
+# trading loop never waits on disk. load() is used once at startup.
+#
+#   STATE = StateStore("eth_bot_state.db")
+#   saved = STATE.load()            # {"trades": {...}, "indicators": {...}}
+#   STATE.put("trades", {...})      # O(1), no I/O
+
+
+class StateStore:
+    def __init__(self, path, flush_interval=1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+
+        self.writes = 0
+        self.flushes = 0
+        self.flush_errors = 0
+        self.last_flush_ms = 0.0
+
+        conn = self._connect()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        conn.commit()
+        conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across process crashes in WAL mode; only an OS
+        # crash / power loss can drop the last flush.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # --------------------------
+    # Read (startup)
+    # --------------------------
+
+    def load(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT key, value, updated FROM state").fetchall()
+        finally:
+            conn.close()
+
+        state = {}
+        for key, value, updated in rows:
+            try:
+                state[key] = json.loads(value)
+            except ValueError:
+                continue
+            state[f"{key}.updated"] = updated
+        return state
+
+    # --------------------------
+    # Write-behind
+    # --------------------------
+
+    def put(self, key, value):
+        with self._lock:
+            self._pending[key] = (value, time.time())
+            self.writes += 1
+        if self._thread is None:
+            self.start()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="state-store", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO state (key, value, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                    [(k, json.dumps(v), t) for k, (v, t) in pending.items()],
+                )
+        except Exception:
+            # Put the batch back unless newer values arrived meanwhile
+            with self._lock:
+                for k, v in pending.items():
+                    self._pending.setdefault(k, v)
+            self.flush_errors += 1
+            raise
+        finally:
+            conn.close()
+
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def close(self):
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(5)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[STATE ERROR] {e}")
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "writes": self.writes,
+            "flushes": self.flushes,
+            "flush_errors": self.flush_errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
@@ -0,0 +1,495 @@
+import threading
+from array import array
+from math import isfinite
+
+import numpy as np
+
+
+# ==========================
+# UNIFIED VARIANCE ENGINE (ETH‑TUNED)
+# ==========================
+#
+# The last `window` variances live in a preallocated array ring (no deque,
+# no per-tick allocation). The mean |variance| is summed over the ring oldest
+# first: the same additions in the same order as the deque-based engine, so
+# thresholds are bit-identical to it (a running sum would drift by rounding
+# and cannot be). update_many() and batch_thresholds() do those additions
+# with NumPy, one vector add per window slot, and return the same bits.
+#
+# A NaN or infinite variance (e.g. from a bad candle) is skipped rather than
+# pushed, so one bad tick cannot poison the window; the batched paths skip
+# it the same way.
+#
+# swap_params() retunes a live engine from another thread (see
+# reoptimizer.py). The new parameters are staged and picked up at the start
+# of the next update on the loop thread, so no tick mixes old and new values
+# and the loop never waits on a lock.
+
+# Tunable constructor arguments; the window sizes the ring and is fixed
+PARAM_NAMES = ("base_buy", "base_sell", "buy_multiplier", "sell_multiplier", "buy_clamp", "sell_clamp")
+
+
+class UnifiedVarianceEngine:
+    __slots__ = (
+        "base_buy", "base_sell", "window",
+        "buy_multiplier", "sell_multiplier",
+        "buy_clamp_min", "buy_clamp_max", "sell_clamp_min", "sell_clamp_max",
+        "_values", "_pos", "_count",
+        "_pending", "_swap_lock", "swaps",
+    )
+
+    def __init__(
+        self,
+        base_buy=-0.0065,      # -0.65%
+        base_sell=0.0075,      # +0.75%
+        window=12,
+        buy_multiplier=14,
+        sell_multiplier=12,
+        buy_clamp=(-0.012, -0.005),   # -1.2% to -0.5%
+        sell_clamp=(0.006, 0.014)     # +0.6% to +1.4%
+    ):
+        self.base_buy = base_buy
+        self.base_sell = base_sell
+        self.window = window
+
+        self.buy_multiplier = buy_multiplier
+        self.sell_multiplier = sell_multiplier
+
+        self.buy_clamp_min, self.buy_clamp_max = buy_clamp
+        self.sell_clamp_min, self.sell_clamp_max = sell_clamp
+
+        self._pending = None
+        self._swap_lock = threading.Lock()
+        self.swaps = 0
+        self._load(())
+
+    # --------------------------
+    # State
+    # --------------------------
+
+    def _load(self, values, count=None):
+        # Ring holds the last `window` variances; _pos is the next slot
+        values = list(values)[-self.window:]
+        self._values = array("d", [0.0] * self.window)
+        self._pos = 0
+        self._count = 0
+        for v in values:
+            if isfinite(v):
+                self._push(v)
+        if count is not None:
+            self._count = count
+
+    def _push(self, v):
+        pos = self._pos
+        self._values[pos] = v
+        self._pos = pos + 1 if pos + 1 < self.window else 0
+        self._count += 1
+
+    def __len__(self):
+        return min(self._count, self.window)
+
+    @property
+    def recent_variances(self):
+        return self.get_state()
+
+    def get_state(self):
+        # Oldest first, like the deque it replaces
+        n = len(self)
+        start = self._pos - n
+        return [self._values[i] for i in range(start, start + n)]
+
+    def set_state(self, recent_variances):
+        self._load(recent_variances)
+
+    # --------------------------
+    # Parameters
+    # --------------------------
+
+    def get_params(self):
+        return {
+            "base_buy": self.base_buy,
+            "base_sell": self.base_sell,
+            "window": self.window,
+            "buy_multiplier": self.buy_multiplier,
+            "sell_multiplier": self.sell_multiplier,
+            "buy_clamp": (self.buy_clamp_min, self.buy_clamp_max),
+            "sell_clamp": (self.sell_clamp_min, self.sell_clamp_max),
+        }
+
+    def swap_params(self, params):
+        # Any thread. Applied by the next update(); a later swap before then
+        # replaces this one.
+        unknown = set(params) - set(PARAM_NAMES) - {"window"}
+        if unknown:
+            raise ValueError(f"Unknown engine parameters: {sorted(unknown)}")
+        if params.get("window", self.window) != self.window:
+            raise ValueError("The engine window cannot be hot-swapped")
+        with self._swap_lock:
+            self._pending = dict(params)
+
+    def _apply_pending(self):
+        with self._swap_lock:
+            params, self._pending = self._pending, None
+        if params is None:
+            return
+        for name in ("base_buy", "base_sell", "buy_multiplier", "sell_multiplier"):
+            if name in params:
+                setattr(self, name, params[name])
+        if "buy_clamp" in params:
+            self.buy_clamp_min, self.buy_clamp_max = params["buy_clamp"]
+        if "sell_clamp" in params:
+            self.sell_clamp_min, self.sell_clamp_max = params["sell_clamp"]
+        self.swaps += 1
+
+    def clamp(self, value, min_v, max_v):
+        return max(min_v, min(value, max_v))
+
+    def get_direction(self):
+        if len(self) < 4:
+            return "flat"
+
+        last = self._values[self._pos - 1]
+        prev = self._values[self._pos - 4]
+
+        if last > prev:
+            return "rising"
+        elif last < prev:
+            return "shrinking"
+        return "flat"
+
+    # --------------------------
+    # Streaming
+    # --------------------------
+
+    def update(self, current_variance, current_exposure_pct):
+        # _push() and get_direction() inlined: this runs on every tick
+        if self._pending is not None:
+            self._apply_pending()
+        values = self._values
+        w = self.window
+        if isfinite(current_variance):
+            pos = self._pos
+            values[pos] = current_variance
+            self._pos = pos + 1 if pos + 1 < w else 0
+            self._count += 1
+        else:
+            # Not pushed: thresholds from the window as it stands
+            pos = self._pos - 1
+        n = self._count if self._count < w else w
+
+        if n < 3:
+            return self.base_buy, self.base_sell
+
+        # 1. VOLATILITY SCALING (oldest first, like sum() over the deque)
+        start = self._pos - n
+        avg_var = sum(abs(values[i]) for i in range(start, start + n)) / n
+
+        buy_var = self.base_buy * (1 + avg_var * self.buy_multiplier)
+        sell_var = self.base_sell * (1 + avg_var * self.sell_multiplier)
+
+        # 2. DIRECTION ADJUSTMENT
+        if n >= 4:
+            last = values[pos]
+            prev = values[pos - 3]
+            if last > prev:
+                buy_var *= 1.20
+                sell_var *= 0.80
+            elif last < prev:
+                buy_var *= 0.80
+                sell_var *= 1.20
+
+        # 3. EXPOSURE WEIGHTING
+        buy_var *= (1 + current_exposure_pct)
+
+        # 4. FINAL CLAMP
+        buy_var = max(self.buy_clamp_min, min(buy_var, self.buy_clamp_max))
+        sell_var = max(self.sell_clamp_min, min(sell_var, self.sell_clamp_max))
+
+        return buy_var, sell_var
+
+    # --------------------------
+    # Batched (NumPy)
+    # --------------------------
+
+    def _window_stats(self, variances):
+        # Per-tick window mean |v|, window length and direction for a series
+        # (or rows of series, last axis is time) fed after the current state.
+        # Depends only on the window, so batch_thresholds shares it between
+        # engines.
+        v = np.asarray(variances, dtype=np.float64)
+        state = np.asarray(self.get_state(), dtype=np.float64)
+        w = self.window
+        h = len(state)
+        m = v.shape[-1]
+
+        # Non-finite variances are skipped like update() skips them: the
+        # finite ones move to the front of each row (stable), and each tick
+        # reads the window ending at the last value pushed by then
+        ok = np.isfinite(v)
+        skipped = not ok.all()
+        pushed = np.cumsum(ok, axis=-1)
+        if skipped:
+            v = np.take_along_axis(v, np.argsort(~ok, axis=-1, kind="stable"), axis=-1)
+
+        # Zero padding in front: 0.0 + 0.0 + |v0| + ... adds up exactly like
+        # sum() over a shorter deque. Column s of the *_c arrays is the
+        # window after s values of this series (s = 0: the state alone).
+        pad = max(w, 4)
+        history = np.broadcast_to(state, v.shape[:-1] + (h,))
+        full = np.concatenate((np.zeros(v.shape[:-1] + (pad,)), history, v), axis=-1)
+        a = np.abs(full)
+        base = pad + h
+        total_c = a[..., base - w:base - w + m + 1].copy()
+        for j in range(1, w):
+            total_c += a[..., base - w + j:base - w + j + m + 1]
+        last_c = full[..., base - 1:base + m]
+        prev_c = full[..., base - 4:base + m - 3]
+
+        if skipped:
+            total = np.take_along_axis(total_c, pushed, axis=-1)
+            last = np.take_along_axis(last_c, pushed, axis=-1)
+            prev = np.take_along_axis(prev_c, pushed, axis=-1)
+        else:
+            total, last, prev = total_c[..., 1:], last_c[..., 1:], prev_c[..., 1:]
+
+        n = np.minimum(h + pushed, w)
+        avg_var = total / np.maximum(n, 1)
+        rising = (n >= 4) & (last > prev)
+        shrinking = (n >= 4) & (last < prev)
+        count = int(pushed[-1]) if v.ndim == 1 and m else 0
+        tail = np.concatenate((state, v[:count]))[-w:] if v.ndim == 1 else None
+        return avg_var, n, rising, shrinking, tail, count
+
+    def _series(self, stats):
+        # Buy threshold before exposure/clamp and the final sell threshold;
+        # warm-up ticks (fewer than 3 values) get the raw bases
+        if self._pending is not None:
+            self._apply_pending()
+        avg_var, n, rising, shrinking = stats[:4]
+
+        buy_var = self.base_buy * (1 + avg_var * self.buy_multiplier)
+        sell_var = self.base_sell * (1 + avg_var * self.sell_multiplier)
+
+        buy_var = np.where(rising, buy_var * 1.20, np.where(shrinking, buy_var * 0.80, buy_var))
+        sell_var = np.where(rising, sell_var * 0.80, np.where(shrinking, sell_var * 1.20, sell_var))
+
+        sell_var = np.maximum(self.sell_clamp_min, np.minimum(sell_var, self.sell_clamp_max))
+
+        warm = n < 3
+        buy_var[..., warm] = self.base_buy
+        sell_var[..., warm] = self.base_sell
+        return buy_var, sell_var, warm
+
+    def _finish(self, stats):
+        # Advance past a 1-D series: its finite values join the window
+        self._load(stats[4].tolist(), self._count + stats[5])
+
+    def threshold_series(self, variances):
+        # update() for a whole series minus the exposure weighting: returns
+        # the buy threshold before exposure/clamp and the final sell
+        # threshold, and advances the engine past the series
+        stats = self._window_stats(variances)
+        buy_var, sell_var, _ = self._series(stats)
+        self._finish(stats)
+        return buy_var, sell_var
+
+    def threshold_matrix(self, variances):
+        # threshold_series for many independent series at once (rows of a 2-D
+        # array, e.g. Monte Carlo paths), each continuing from the current
+        # state. The engine itself is not advanced.
+        buy_var, sell_var, _ = self._series(self._window_stats(variances))
+        return buy_var, sell_var
+
+    def update_many(self, variances, exposure_pct=0.0):
+        # update() for a whole series; exposure_pct is a scalar or per-tick
+        # array. Same thresholds, bit for bit, and the same final state.
+        stats = self._window_stats(variances)
+        buy_var, sell_var, warm = self._series(stats)
+        self._finish(stats)
+        return self._weighted(buy_var, warm, exposure_pct), sell_var
+
+    def _weighted(self, buy_var, warm, exposure_pct):
+        # Steps 3 and 4 of update() for the buy side
+        buy_var = buy_var * (1 + np.asarray(exposure_pct, dtype=np.float64))
+        buy_var = np.maximum(self.buy_clamp_min, np.minimum(buy_var, self.buy_clamp_max))
+        buy_var[..., warm] = self.base_buy
+        return buy_var
+
+
+def batch_thresholds(engines, variances, exposure_pct=0.0):
+    # update_many() for several engines over the same series, as
+    # (len(engines), len(variances)) arrays. Engines with the same window and
+    # state share one pass over the window sums.
+    shared = {}
+    buys, sells = [], []
+    for engine in engines:
+        key = (engine.window, tuple(engine.get_state()))
+        if key not in shared:
+            shared[key] = engine._window_stats(variances)
+        stats = shared[key]
+
+        buy_var, sell_var, warm = engine._series(stats)
+        engine._finish(stats)
+        buys.append(engine._weighted(buy_var, warm, exposure_pct))
+        sells.append(sell_var)
+    return np.array(buys).reshape(len(buys), -1), np.array(sells).reshape(len(sells), -1)
+
+
+# ==========================
+# HYBRID PROTECTION SETTINGS
+# ==========================
+
+# -----------------------------
+# Adaptive risk + behavior engine
+# -----------------------------
+
+def get_adaptive_exposure(
+    balance,
+    exposure_percent=0.30,       # 30% of balance
+    min_exposure=3.00,           # never go below this
+    max_exposure=25.00,          # absolute ceiling
+):
+    adaptive = balance * exposure_percent
+    return max(min_exposure, min(adaptive, max_exposure))
+
+
+def get_adaptive_buffer(
+    balance,
+    buffer_percent=0.08,         # 8% of balance
+    min_buffer=1.00,             # never keep less than $1
+    max_buffer=5.00,             # never keep more than $5
+):
+    adaptive = balance * buffer_percent
+    return max(min_buffer, min(adaptive, max_buffer))
+
+
+def get_adaptive_cooldown(balance):
+    # Faster when small, slower when large
+    if balance < 25:
+        return 20          # seconds
+    elif balance < 100:
+        return 45
+    else:
+        return 90
+
+
+def get_adaptive_variance(balance):
+    # Range: 0.4% to 1.0%
+    MIN_VAR = 0.004        # 0.4%
+    MAX_VAR = 0.010        # 1.0%
+
+    # Scale variance based on balance (caps at 100 USD)
+    scale = min(balance / 100.0, 1.0)
+    return MIN_VAR + (MAX_VAR - MIN_VAR) * scale
+
+
+
+def get_adaptive_sell_threshold(balance):
+    MIN_SELL = 0.008   # 0.8%
+    MAX_SELL = 0.020   # 2.0%
+
+    # Scale based on balance (caps at 100 USD)
+    scale = min(balance / 100.0, 1.0)
+
+    return MIN_SELL + (MAX_SELL - MIN_SELL) * scale
+
+def get_adaptive_buy_threshold(balance):
+    MIN_BUY = -0.003   # -0.3%
+    MAX_BUY = -0.010   # -1.0%
+
+    # Scale based on balance (caps at 100 USD)
+    scale = min(balance / 100.0, 1.0)
+
+    return MIN_BUY + (MAX_BUY - MIN_BUY) * scale
+
+def get_adaptive_buy_size(
+    total_equity,
+    variance,
+    recent_wins,
+    recent_losses,
+    base_pct=0.10,               # Base: 10% of equity
+    vol_scale=10,
+    vol_min=0.5,
+    vol_max=1.5,
+    streak_step=0.05,
+    trend_min=0.7,
+    trend_max=1.3,
+    max_pct=0.20,                # Cap at 20% of equity
+):
+    # Volatility factor (lower volatility = bigger buys)
+    # variance is usually between -0.02 and +0.02
+    vol_factor = max(vol_min, min(vol_max, 1 - abs(variance) * vol_scale))
+
+    # Trend factor (winning streak = confidence)
+    trend_factor = 1 + (recent_wins * streak_step) - (recent_losses * streak_step)
+    trend_factor = max(trend_min, min(trend_max, trend_factor))
+
+    # Combine
+    pct = base_pct * vol_factor * trend_factor
+
+    # Cap at max_pct of equity
+    pct = min(pct, max_pct)
+
+    return total_equity * pct
+
+
+# Tunable keyword arguments of the adaptive helpers, so a flat risk_params
+# dict (backtests, sweeps) can be routed to the right function.
+EXPOSURE_PARAMS = ("exposure_percent", "min_exposure", "max_exposure")
+BUFFER_PARAMS = ("buffer_percent", "min_buffer", "max_buffer")
+BUY_SIZE_PARAMS = ("base_pct", "vol_scale", "vol_min", "vol_max", "streak_step", "trend_min", "trend_max", "max_pct")
+
+
+def risk_kwargs(risk_params, names):
+    if not risk_params:
+        return {}
+    return {k: risk_params[k] for k in names if k in risk_params}
+
+
+# ==========================
+# HYBRID PROTECTION LOGIC
+# ==========================
+
+def check_buy(
+    current_price,
+    usd_balance,
+    base_balance,
+    now,
+    last_buy_time,
+    last_buy_price,
+    cooldown_seconds,
+    variance_drop_required,
+    max_exposure_usd=None,
+    usd_buffer=None,
+    risk_params=None,
+):
+    # Pure version of the bot's buy gate so the live loop and the backtester
+    # apply exactly the same rules. Fixed exposure/buffer limits (bot.py
+    # style) can be passed in; otherwise the adaptive ones are used.
+
+    # --- ADAPTIVE LIMITS ---
+    if max_exposure_usd is None:
+        max_exposure_usd = get_adaptive_exposure(usd_balance, **risk_kwargs(risk_params, EXPOSURE_PARAMS))
+    if usd_buffer is None:
+        usd_buffer = get_adaptive_buffer(usd_balance, **risk_kwargs(risk_params, BUFFER_PARAMS))
+
+    # --- EXPOSURE CAP ---
+    base_value = base_balance * current_price
+    if base_value >= max_exposure_usd:
+        return False, "Exposure cap reached"
+
+    # --- USD BUFFER PROTECTION ---
+    if usd_balance - current_price < usd_buffer:
+        return False, "USD buffer protection triggered"
+
+    # --- COOLDOWN ---
+    if now - last_buy_time < cooldown_seconds:
+        return False, "Cooldown active"
+
+    # --- VARIANCE DROP CHECK ---
+    if last_buy_price is not None:
+        drop = (last_buy_price - current_price) / last_buy_price
+        if drop < variance_drop_required:
+            return False, "Variance drop not enough"
+
+    return True, "OK to buy"
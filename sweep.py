@@ -0,0 +1,238 @@
+import argparse
+import csv
+import itertools
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from backtest import (
+    BUY_COOLDOWN_SECONDS,
+    START_BASE,
+    START_USD,
+    VARIANCE_DROP_REQUIRED,
+    WINDOW,
+    load_ticks,
+    run_backtest,
+)
+from indicators import ema_batch
+
+# ==========================
+# PARAMETER SWEEP
+# ==========================
+#
+# Grid or random search over UnifiedVarianceEngine settings, the adaptive
+# risk constants and the buy gate, replayed through backtest.run_backtest on
+# every core. Prices, timestamps and the EMA variance series live in one
+# shared-memory block that workers map without copying.
+#
+# Parameter names:
+#   engine.<arg>   -> UnifiedVarianceEngine(...)
+#   risk.<arg>     -> get_adaptive_exposure / _buffer / _buy_size keywords
+#   cooldown_seconds, variance_drop_required, fee_rate -> run_backtest(...)
+
+PARAM_SPACE = {
+    "engine.base_buy": [-0.004, -0.0065, -0.009],
+    "engine.base_sell": [0.005, 0.0075, 0.010],
+    "engine.window": [8, 12, 20],
+    "engine.buy_multiplier": [8, 14, 20],
+    "engine.sell_multiplier": [8, 12, 16],
+    "engine.buy_clamp": [(-0.012, -0.005), (-0.015, -0.004)],
+    "engine.sell_clamp": [(0.006, 0.014), (0.005, 0.018)],
+    "risk.exposure_percent": [0.20, 0.30, 0.40],
+    "risk.buffer_percent": [0.05, 0.08],
+    "risk.base_pct": [0.05, 0.10, 0.15],
+    "risk.max_pct": [0.20, 0.30],
+    "cooldown_seconds": [60, 180, 600],
+    "variance_drop_required": [0.0025, 0.005, 0.01],
+}
+
+RESULT_COLUMNS = ["rank", "pnl", "max_drawdown", "trades", "win_rate", "wins", "losses", "final_equity"]
+
+# Worker-side views of the shared block
+_SHM = None
+_DATA = None
+_BASE_CONFIG = None
+
+
+# --------------------------
+# Search spaces
+# --------------------------
+
+def grid(space):
+    names = list(space)
+    for values in itertools.product(*(space[n] for n in names)):
+        yield dict(zip(names, values))
+
+
+def random_search(space, samples, seed=None):
+    # List entries are sampled as choices, (low, high) float pairs uniformly.
+    rng = random.Random(seed)
+    for _ in range(samples):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple) and len(values) == 2 and all(isinstance(v, float) for v in values):
+                params[name] = rng.uniform(*values)
+            else:
+                params[name] = rng.choice(values)
+        yield params
+
+
+def split_params(params):
+    engine, risk, run = {}, {}, {}
+    for name, value in params.items():
+        if name.startswith("engine."):
+            engine[name[7:]] = value
+        elif name.startswith("risk."):
+            risk[name[5:]] = value
+        else:
+            run[name] = value
+    return engine, risk, run
+
+
+# --------------------------
+# Shared arrays
+# --------------------------
+
+def _share(arrays):
+    # One shared-memory block holding equal-length float64 arrays
+    n = len(arrays[0])
+    shm = shared_memory.SharedMemory(create=True, size=max(1, 8 * n * len(arrays)))
+    view = np.ndarray((len(arrays), n), dtype=np.float64, buffer=shm.buf)
+    for i, arr in enumerate(arrays):
+        view[i] = arr
+    return shm, n
+
+
+def _init_worker(shm_name, rows, n, base_config):
+    global _SHM, _DATA, _BASE_CONFIG
+    _SHM = shared_memory.SharedMemory(name=shm_name)
+    _DATA = np.ndarray((rows, n), dtype=np.float64, buffer=_SHM.buf)
+    _BASE_CONFIG = base_config
+
+
+def _evaluate(params):
+    timestamps, prices, variance = _DATA[0], _DATA[1], _DATA[2]
+
+    engine, risk, run = split_params(params)
+    kwargs = dict(_BASE_CONFIG)
+    kwargs.update(run)
+
+    result = run_backtest(
+        timestamps,
+        prices,
+        engine_params=engine,
+        risk_params=risk,
+        variance=variance,
+        **kwargs,
+    )
+    return params, {
+        "pnl": result["pnl"],
+        "max_drawdown": result["max_drawdown"],
+        "trades": len(result["trades"]),
+        "win_rate": result["win_rate"],
+        "wins": result["wins"],
+        "losses": result["losses"],
+        "final_equity": result["final_equity"],
+    }
+
+
+# --------------------------
+# Sweep
+# --------------------------
+
+def run_sweep(
+    timestamps,
+    prices,
+    candidates,
+    window=WINDOW,
+    workers=None,
+    rank_by="pnl",
+    chunksize=4,
+    **base_config,
+):
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    prices = np.asarray(prices, dtype=np.float64)
+    _, variance, _ = ema_batch(prices, window)
+
+    base_config = dict(
+        {
+            "window": window,
+            "usd_balance": START_USD,
+            "base_balance": START_BASE,
+            "cooldown_seconds": BUY_COOLDOWN_SECONDS,
+            "variance_drop_required": VARIANCE_DROP_REQUIRED,
+        },
+        **base_config,
+    )
+
+    shm, n = _share([timestamps, prices, variance])
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(shm.name, 3, n, base_config),
+        ) as pool:
+            results = list(pool.map(_evaluate, candidates, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Lower is better for drawdown, higher for everything else
+    reverse = rank_by != "max_drawdown"
+    results.sort(key=lambda r: r[1][rank_by], reverse=reverse)
+    return [dict(metrics, rank=i + 1, params=params) for i, (params, metrics) in enumerate(results)]
+
+
+def write_results(rows, path):
+    names = sorted({k for r in rows for k in r["params"]})
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(RESULT_COLUMNS + names)
+        for r in rows:
+            writer.writerow([r[c] for c in RESULT_COLUMNS] + [r["params"].get(n) for n in names])
+
+
+def format_table(rows, top=10):
+    lines = [f"{'#':>3} {'PnL':>10} {'MaxDD':>7} {'Trades':>7} {'Win%':>6}  Params"]
+    for r in rows[:top]:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        lines.append(
+            f"{r['rank']:>3} {r['pnl']:>10.2f} {r['max_drawdown'] * 100:>6.2f}% "
+            f"{r['trades']:>7} {r['win_rate']:>5.1f}%  {params}"
+        )
+    return "\n".join(lines)
+
+
+# ==========================
+# CLI
+# ==========================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep for the EMA + UnifiedVarianceEngine strategy.")
+    parser.add_argument("path", help="CSV, Parquet, .npy, .npz or .ticks price file")
+    parser.add_argument("--mode", choices=("grid", "random"), default="random")
+    parser.add_argument("--samples", type=int, default=200, help="random mode only")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rank", default="pnl", choices=("pnl", "max_drawdown", "trades", "win_rate", "final_equity"))
+    parser.add_argument("--out", default="sweep_results.csv")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    timestamps, prices = load_ticks(args.path)
+    if args.mode == "grid":
+        candidates = grid(PARAM_SPACE)
+    else:
+        candidates = random_search(PARAM_SPACE, args.samples, args.seed)
+
+    rows = run_sweep(timestamps, prices, candidates, workers=args.workers, rank_by=args.rank)
+    write_results(rows, args.out)
+    print(format_table(rows, args.top))
+    print(f"\n{len(rows)} runs written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import pytest
+
+from account import AccountState
+
+
+class Exchange:
+    def __init__(self):
+        self.balances = {"USD": 50.0, "ETH": 0.05}
+        self.calls = 0
+        self.down = False
+
+    def get_balances(self):
+        self.calls += 1
+        if self.down:
+            raise ConnectionError("exchange unavailable")
+        return dict(self.balances)
+
+
+def test_one_fetch_per_tick():
+    exchange = Exchange()
+    account = AccountState(exchange.get_balances)
+    account.begin_tick()
+    assert account.balance("USD") == 50.0
+    assert account.balance("ETH") == 0.05
+    assert account.balance("BTC") == 0.0
+    assert exchange.calls == 1
+
+    account.on_fill()
+    exchange.balances["USD"] = 30.0
+    assert account.balance("USD") == 30.0
+    assert exchange.calls == 2
+
+
+def test_failed_refresh_serves_the_last_good_snapshot():
+    exchange = Exchange()
+    account = AccountState(exchange.get_balances)
+    account.begin_tick()
+    account.snapshot()
+
+    exchange.down = True
+    account.begin_tick()
+    assert account.balance("USD") == 50.0
+    assert account.balance("ETH") == 0.05
+    # The stale snapshot covers the rest of the tick: no retry per read
+    assert exchange.calls == 2
+    assert account.stats()["refresh_errors"] == 1
+
+    exchange.down = False
+    exchange.balances["USD"] = 40.0
+    account.begin_tick()
+    assert account.balance("USD") == 40.0
+
+
+def test_first_fetch_failure_raises():
+    exchange = Exchange()
+    exchange.down = True
+    account = AccountState(exchange.get_balances)
+    with pytest.raises(ConnectionError):
+        account.balance("USD")
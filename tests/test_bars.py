@@ -0,0 +1,109 @@
+from bars import BarBuilder, BarSeries
+
+DAY = 19675 * 86400                      # 2023-11-14 00:00 UTC
+
+
+class Clock:
+    def __init__(self, now=DAY):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _rows(bars):
+    # (start, open, high, low, close, volume, ticks) tuples
+    return bars.tolist()
+
+
+def test_bars_align_to_utc():
+    builder = BarBuilder(["ETH-USD"], clock=Clock(DAY + 437.5))
+    builder.on_price("ETH-USD", 2000.0)
+
+    assert builder.current("ETH-USD", 15)["start"] == DAY + 435
+    assert builder.current("ETH-USD", 60)["start"] == DAY + 420
+    assert builder.current("ETH-USD", 300)["start"] == DAY + 300
+    assert builder.next_close("ETH-USD", 300) == DAY + 600
+
+
+def test_silent_periods_become_flat_bars():
+    series = BarSeries(60)
+    series.update(DAY + 5, 10.0, 1.0)
+    series.update(DAY + 10, 12.0)
+    series.update(DAY + 30, 9.0, 0.5)
+    assert series.update(DAY + 200, 20.0) == 3
+
+    assert _rows(series.bars()) == [
+        (DAY, 10.0, 12.0, 9.0, 9.0, 1.5, 3),
+        (DAY + 60, 9.0, 9.0, 9.0, 9.0, 0.0, 0),
+        (DAY + 120, 9.0, 9.0, 9.0, 9.0, 0.0, 0),
+    ]
+    # roll() closes the open bar and fills up to now without a tick
+    assert series.roll(DAY + 310) == 2
+    assert _rows(series.bars(2)) == [
+        (DAY + 180, 20.0, 20.0, 20.0, 20.0, 0.0, 1),
+        (DAY + 240, 20.0, 20.0, 20.0, 20.0, 0.0, 0),
+    ]
+    assert series.current() is None and series.next_close() == DAY + 360
+
+
+def test_late_ticks_are_dropped():
+    series = BarSeries(60)
+    series.update(DAY + 10, 10.0)
+    series.update(DAY + 70, 11.0)
+    # Older than the open bar
+    assert series.update(DAY + 50, 99.0) == 0
+    assert series.current()["high"] == 11.0
+
+    # For a bar roll() already closed
+    series.roll(DAY + 130)
+    assert series.update(DAY + 100, 99.0) == 0
+    assert series.late == 2
+    assert series.current() is None
+    assert series.closes().tolist() == [10.0, 11.0]
+
+
+def test_ring_wraps_in_bars_and_since():
+    series = BarSeries(60, capacity=5)
+    for i in range(9):
+        series.update(DAY + i * 60, float(i))
+    assert series.count == 8 and len(series) == 5
+
+    assert series.bars()["start"].tolist() == [DAY + i * 60 for i in range(3, 8)]
+    assert series.closes(3).tolist() == [5.0, 6.0, 7.0]
+
+    # Bars overwritten in the ring are lost, the cursor still moves past them
+    bars, cursor = series.since(0)
+    assert bars["close"].tolist() == [3.0, 4.0, 5.0, 6.0, 7.0] and cursor == 8
+    bars, cursor = series.since(6)
+    assert bars["close"].tolist() == [6.0, 7.0] and cursor == 8
+    assert len(series.since(8)[0]) == 0
+
+    # A gap longer than the ring only writes what fits
+    series.update(DAY + 100 * 60, 50.0)
+    assert series.count == 100
+    assert series.bars()["start"].tolist() == [DAY + i * 60 for i in range(95, 100)]
+    assert series.closes().tolist() == [8.0] * 5
+
+
+def test_seed_then_live_ticks():
+    builder = BarBuilder(["ETH-USD"], timeframes=(60,), clock=Clock())
+    candles = [{"start": DAY + i * 60, "open": 10.0 + i, "high": 11.0 + i, "low": 9.0 + i,
+                "close": 10.5 + i, "volume": 2.0} for i in range(3)]
+    builder.seed("ETH-USD", 60, candles)
+    cursor = builder.cursor("ETH-USD", 60)
+    assert cursor == 3
+
+    # Inside a seeded bar: late; then a gap filled at the last seeded close
+    builder.on_trade("ETH-USD", 99.0, t=DAY + 150)
+    builder.on_trade("ETH-USD", 20.0, size=0.25, t=DAY + 250)
+    builder.on_trade("ETH-USD", 21.0, t=DAY + 310)
+
+    bars, cursor = builder.since("ETH-USD", 60, cursor)
+    assert _rows(bars) == [
+        (DAY + 180, 12.5, 12.5, 12.5, 12.5, 0.0, 0),
+        (DAY + 240, 20.0, 20.0, 20.0, 20.0, 0.25, 1),
+    ]
+    assert cursor == 5
+    assert builder.closes("ETH-USD", 60).tolist() == [10.5, 11.5, 12.5, 12.5, 20.0]
+    assert builder.stats()["bars"]["ETH-USD"][60] == {"closed": 5, "late": 1}
@@ -0,0 +1,46 @@
+import pytest
+
+from candles import MAX_CANDLES_PER_REQUEST, bootstrap, fetch_candles
+from standins import FakeCandlesServer
+from transport import Transport
+
+END = 1_700_000_000 + 30          # mid-way through a minute
+
+
+@pytest.fixture
+def server():
+    first = END // 60 * 60 - 2000 * 60
+    # Includes the candle still in progress at END
+    timestamps = range(first, END // 60 * 60 + 60, 60)
+    server = FakeCandlesServer.from_prices("ETH-USD", timestamps, [t / 1e6 for t in timestamps]).start()
+    yield server
+    server.stop()
+
+
+def test_pages_at_the_request_limit(server):
+    count = 2 * MAX_CANDLES_PER_REQUEST + 100
+    candles = fetch_candles("ETH-USD", count, end=END, base_url=server.base_url, transport=Transport())
+
+    # The server answers 400 to any page over the limit
+    assert server.requests == 3
+    assert len(candles) == count
+    starts = [c["start"] for c in candles]
+    assert all(b - a == 60 for a, b in zip(starts, starts[1:]))
+    assert candles[-1]["close"] == pytest.approx(starts[-1] / 1e6)
+
+
+def test_exact_multiple_of_the_limit(server):
+    candles = fetch_candles("ETH-USD", MAX_CANDLES_PER_REQUEST, end=END, base_url=server.base_url, transport=Transport())
+    assert server.requests == 1
+    assert len(candles) == MAX_CANDLES_PER_REQUEST
+
+
+def test_in_progress_candle_is_left_out(server):
+    candles = fetch_candles("ETH-USD", 10, end=END, base_url=server.base_url, transport=Transport())
+    assert candles[-1]["start"] == END // 60 * 60 - 60
+
+
+def test_bootstrap_maps_failing_products_to_empty(server):
+    result = bootstrap(["ETH-USD", "XRP-USD"], 5, end=END, base_url=server.base_url, transport=Transport())
+    assert len(result["ETH-USD"]) == 5
+    assert result["XRP-USD"] == []
@@ -0,0 +1,137 @@
+import requests
+
+from execution import CANCELLED, FILLED, REJECTED, SUBMITTED, ExecutionEngine, OrderIds
+from standins import FakeRESTClient
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+
+def make(balances=None, price=2000.0, **kwargs):
+    clock = Clock()
+    prices = {"ETH-USD": price}
+    exchange = FakeRESTClient(balances or {"USD": 100.0, "ETH": 1.0}, prices.get, clock=clock,
+                              spread=kwargs.pop("spread", 0.0), fill_slices=kwargs.pop("fill_slices", 1))
+    fills = []
+    engine = ExecutionEngine(exchange, ids=OrderIds("t", session="test"), on_fill=fills.append, clock=clock, **kwargs)
+    return engine, exchange, prices, clock, fills
+
+
+def test_post_only_reject_falls_back_to_market():
+    # No spread: a limit at the bid would cross the ask, so the exchange rejects it
+    engine, exchange, _, _, fills = make(post_only=True)
+    order = engine.buy("ETH-USD", 20.0)
+
+    assert exchange.rejected == 1
+    assert engine.fallbacks == 1
+    assert order.kind == "market"
+    assert order.parent == "t-test-1"
+    assert order.status == FILLED
+    assert len(fills) == 1
+    assert exchange.get_balances()["USD"] == 80.0
+
+
+def test_resting_post_only_fills_at_maker_price():
+    engine, exchange, prices, _, fills = make(post_only=True, spread=0.001)
+    order = engine.sell("ETH-USD", 0.5)
+    assert order.kind == "post_only" and order.status == "ACKED"
+
+    prices["ETH-USD"] = 2010.0
+    exchange.settle()
+    engine.poll()
+
+    assert order.status == FILLED
+    assert fills[0].average_price == order.limit_price
+    assert engine.live_orders() == []
+
+
+def test_partial_fill_and_fallback_report_one_fill():
+    engine, exchange, prices, clock, fills = make(post_only=True, spread=0.001, fill_slices=2, limit_timeout=30)
+    resting = engine.sell("ETH-USD", 0.5)
+    prices["ETH-USD"] = 2010.0
+    exchange.settle()                      # half the limit fills
+    clock.now += 31
+    prices["ETH-USD"] = 1990.0
+    engine.poll()                          # times out -> cancel -> market remainder
+    exchange.settle()
+    engine.poll()
+
+    assert resting.status == CANCELLED
+    assert len(fills) == 1
+    fill = fills[0]
+    assert fill.filled_size == 0.5
+    parts = [(o["filled_size"], o["average_filled_price"]) for o in exchange.orders()]
+    expected = sum(size * price for size, price in parts) / 0.5
+    assert abs(fill.average_price - expected) < 1e-9
+
+
+def test_ambiguous_failure_is_reconciled_by_client_order_id():
+    engine, exchange, _, clock, fills = make()
+
+    def create_then_time_out(**kwargs):
+        FakeRESTClient.create_order(exchange, **kwargs)
+        raise requests.Timeout("read timed out")
+
+    exchange.create_order = create_then_time_out
+    order = engine.buy("ETH-USD", 10.0)
+    assert order.status == SUBMITTED and order.order_id is None
+
+    clock.now += 1
+    engine.poll()
+    assert order.status == FILLED
+    assert order.order_id == "fake-1"
+    assert len(fills) == 1
+
+
+def test_unplaced_order_is_rejected_after_reconcile_timeout():
+    engine, exchange, _, clock, _ = make(reconcile_timeout=60)
+
+    def refuse(**kwargs):
+        raise requests.ConnectionError("connection refused")
+
+    exchange.create_order = refuse
+    order = engine.buy("ETH-USD", 10.0)
+    clock.now += 5
+    engine.poll()
+    assert order.status == SUBMITTED
+    clock.now += 60
+    engine.poll()
+    assert order.status == REJECTED
+    assert engine.live_orders() == []
+
+
+def test_failure_after_ack_rejects_the_order():
+    engine, exchange, _, _, fills = make(post_only=True, spread=0.001)
+    order = engine.sell("ETH-USD", 0.5)
+    assert order.kind == "post_only" and order.status == "ACKED"
+
+    exchange._orders[order.order_id]["status"] = "FAILED"
+    engine.poll()
+
+    assert order.status == REJECTED
+    assert engine.stale_events == 0
+    assert engine.live_orders() == []
+    assert fills == []
+
+
+def test_failure_after_partial_fill_reports_the_filled_part():
+    engine, exchange, prices, _, fills = make(post_only=True, spread=0.001, fill_slices=2)
+    order = engine.sell("ETH-USD", 0.5)
+    prices["ETH-USD"] = 2010.0
+    exchange.settle()
+    engine.poll()
+    assert order.status == "PARTIALLY_FILLED"
+
+    exchange._orders[order.order_id]["status"] = "FAILED"
+    engine.poll()
+
+    assert order.status == REJECTED
+    assert len(fills) == 1 and fills[0].filled_size == 0.25
@@ -0,0 +1,54 @@
+import numpy as np
+
+from indicators import EMAState, ema_batch, ema_matrix
+
+
+def _prices(n, seed=7):
+    rng = np.random.default_rng(seed)
+    return 2000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+
+
+def _stream(prices, window):
+    state = EMAState(window)
+    ema, variance, ew_var = [], [], []
+    for p in prices.tolist():
+        value = state.update(p)
+        ema.append(np.nan if value is None else value)
+        variance.append(np.nan if value is None else state.variance)
+        ew_var.append(np.nan if value is None else state.ew_var)
+    return np.array(ema), np.array(variance), np.array(ew_var), state
+
+
+def test_batch_matches_streaming_bit_for_bit():
+    prices = _prices(5000)
+    ema, variance, ew_var, state = _stream(prices, 20)
+    b_ema, b_variance, b_ew_var = ema_batch(prices, 20)
+
+    # array_equal with equal_nan: same warm-up NaNs, every float identical
+    assert np.array_equal(ema, b_ema, equal_nan=True)
+    assert np.array_equal(variance, b_variance, equal_nan=True)
+    assert np.array_equal(ew_var, b_ew_var, equal_nan=True)
+    assert np.isnan(b_ema[:19]).all() and not np.isnan(b_ema[19:]).any()
+
+
+def test_batch_continues_a_streaming_state():
+    prices = _prices(1000)
+    _, _, _, streamed = _stream(prices, 20)
+
+    state = EMAState(20)
+    state.seed(prices[:137])
+    ema_batch(prices[137:600], state=state)
+    b_ema, _, _ = ema_batch(prices[600:], state=state)
+
+    assert state.get_state() == streamed.get_state()
+    assert state.variance == streamed.variance
+    assert b_ema[-1] == streamed.ema
+
+
+def test_matrix_rows_match_batch():
+    rows = np.stack([_prices(800, seed=s) for s in range(4)])
+    ema, variance = ema_matrix(rows, 20)
+    for row, row_ema, row_variance in zip(rows, ema, variance):
+        b_ema, b_variance, _ = ema_batch(row, 20)
+        assert np.array_equal(row_ema, b_ema, equal_nan=True)
+        assert np.array_equal(row_variance, b_variance, equal_nan=True)
@@ -0,0 +1,67 @@
+import numpy as np
+
+from journal import (
+    DECISION_BUY,
+    DECISION_BUY_BLOCKED,
+    DECISION_NONE,
+    GROW_RECORDS,
+    REASONS,
+    UNKNOWN_REASON,
+    TickJournal,
+    journal_files,
+    load_ticks,
+    read_journal,
+)
+
+DAY = 19675 * 86400                      # 2023-11-14 00:00 UTC
+
+
+def test_append_and_memmap_read(tmp_path):
+    journal = TickJournal(str(tmp_path), "eth")
+    journal.append(DAY + 1.0, 2000.5, 1999.0, 0.00075, -0.0065, 0.0075, 0.25)
+    journal.append(DAY + 16.0, 1980.0, 1998.0, -0.009, -0.0065, 0.0075, 0.25, DECISION_BUY)
+    journal.append(DAY + 31.0, 1979.0, 1997.0, -0.0092, -0.0065, 0.0075, 0.3,
+                   DECISION_BUY_BLOCKED, "Cooldown active")
+    journal.append(DAY + 46.0, 1978.0, 1996.0, -0.0093, -0.0065, 0.0075, 0.3,
+                   DECISION_BUY_BLOCKED, "some new reason")
+
+    # Readable while the writer still has the file mapped
+    rows = read_journal(journal.path_for(DAY // 86400))
+    assert isinstance(rows, np.memmap)
+    assert len(rows) == 4
+    assert rows["price"].tolist() == [2000.5, 1980.0, 1979.0, 1978.0]
+    assert rows["variance"][1] == -0.009
+    assert rows["decision"].tolist() == [DECISION_NONE, DECISION_BUY, DECISION_BUY_BLOCKED, DECISION_BUY_BLOCKED]
+    assert rows["reason"].tolist() == [0, 0, REASONS["Cooldown active"], UNKNOWN_REASON]
+    journal.close()
+
+
+def test_reopen_appends_and_days_split(tmp_path):
+    journal = TickJournal(str(tmp_path), "eth")
+    for i in range(3):
+        journal.append(DAY + i, 2000.0 + i, 2000.0, 0.0, -0.0065, 0.0075, 0.0)
+    journal.close()
+
+    journal = TickJournal(str(tmp_path), "eth")
+    journal.append(DAY + 3, 2003.0, 2000.0, 0.0, -0.0065, 0.0075, 0.0)
+    journal.append(DAY + 86400, 2100.0, 2000.0, 0.0, -0.0065, 0.0075, 0.0)
+    journal.close()
+
+    files = journal_files(str(tmp_path), "eth")
+    assert [f[-14:] for f in files] == ["20231114.ticks", "20231115.ticks"]
+    timestamps, prices = load_ticks(str(tmp_path), "eth")
+    assert timestamps.tolist() == [DAY, DAY + 1, DAY + 2, DAY + 3, DAY + 86400]
+    assert prices.tolist() == [2000.0, 2001.0, 2002.0, 2003.0, 2100.0]
+
+
+def test_grows_past_the_initial_mapping(tmp_path):
+    journal = TickJournal(str(tmp_path), "eth")
+    n = GROW_RECORDS + 10
+    for i in range(n):
+        journal.append(DAY + i * 0.5, float(i), 0.0, 0.0, 0.0, 0.0, 0.0)
+    journal.flush()
+
+    rows = read_journal(journal.path_for(DAY // 86400))
+    assert len(rows) == n
+    assert rows["price"][-1] == n - 1
+    journal.close()
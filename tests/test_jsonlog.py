@@ -0,0 +1,74 @@
+import glob
+import gzip
+import json
+import os
+
+from jsonlog import JsonLog
+
+DAY = 19675 * 86400                      # 2023-11-14 00:00 UTC
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def _records(path):
+    lines = []
+    for rotated in sorted(glob.glob(path + ".*.gz")):
+        with gzip.open(rotated, "rt", encoding="utf-8") as f:
+            lines += f.read().splitlines()
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            lines += f.read().splitlines()
+    return [json.loads(line) for line in lines]
+
+
+def test_rotates_by_size_and_prunes(tmp_path):
+    path = str(tmp_path / "bot.jsonl")
+    log = JsonLog(path, max_bytes=400, backups=3, echo=False, clock=Clock(DAY + 60))
+    for i in range(40):
+        log.log("tick", f"tick {i}", price=2000.0 + i)
+        log.flush()
+    log.stop()
+
+    rotated = glob.glob(path + ".*.gz")
+    assert log.rotations > 3 and len(rotated) == 3
+    assert os.path.getsize(path) <= 400
+    kept = _records(path)
+    # Oldest files were pruned; what is left is whole, ordered JSON lines
+    assert kept[-1] == {"ts": "2023-11-14T00:01:00.000Z", "level": "info", "event": "tick",
+                        "msg": "tick 39", "price": 2039.0}
+    assert [r["price"] for r in kept] == list(range(2040 - len(kept), 2040))
+
+
+def test_rotates_at_midnight_utc(tmp_path):
+    path = str(tmp_path / "bot.jsonl")
+    clock = Clock(DAY - 5)
+    log = JsonLog(path, echo=False, compress=False, clock=clock)
+    log.log("log", "before midnight")
+    log.flush()
+    clock.now = DAY + 5
+    log.log("log", "after midnight")
+    log.stop()
+
+    assert sorted(os.listdir(tmp_path)) == ["bot.jsonl", "bot.jsonl.20231113-235955"]
+    with open(path + ".20231113-235955", encoding="utf-8") as f:
+        assert json.loads(f.read())["msg"] == "before midnight"
+    with open(path, encoding="utf-8") as f:
+        assert json.loads(f.read())["msg"] == "after midnight"
+
+
+def test_sampling_keeps_warnings(tmp_path):
+    path = str(tmp_path / "bot.jsonl")
+    log = JsonLog(path, sample={"tick": 3}, echo=False, clock=Clock(DAY))
+    kept = [log.log("tick", f"tick {i}", asset="ETH-USD") for i in range(9)]
+    log.log("tick", "spike", level="warning", asset="ETH-USD")
+    log.stop()
+
+    assert kept == [True, False, False] * 3
+    assert [r["msg"] for r in _records(path)] == ["tick 0", "tick 3", "tick 6", "spike"]
+    assert log.stats()["sampled_out"] == 6
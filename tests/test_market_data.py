@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from market_data import TickerFeed
+from standins import FakeTickerServer
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.fixture
+def server():
+    server = FakeTickerServer().start()
+    yield server
+    server.stop()
+
+
+def make_feed(server, fallback_prices, stale_after=10.0):
+    def fallback(product_id):
+        fallback_prices.append(product_id)
+        return 1234.5
+
+    feed = TickerFeed(["ETH-USD"], url=server.url, stale_after=stale_after, fallback=fallback, backoff_initial=0.05)
+    feed.start()
+    assert wait_for(lambda: server.client_count() == 1)
+    return feed
+
+
+def test_streamed_price_is_served_without_rest(server):
+    calls = []
+    feed = make_feed(server, calls)
+    try:
+        server.push("ETH-USD", 2500.0)
+        assert wait_for(lambda: feed.latest("ETH-USD") is not None)
+        assert feed.get_price("ETH-USD") == 2500.0
+        assert feed.sequence("ETH-USD") == 1
+        assert calls == []
+        assert server.subscriptions[0]["product_ids"] == ["ETH-USD"]
+    finally:
+        feed.stop()
+
+
+def test_reconnects_after_dropped_connection(server):
+    feed = make_feed(server, [])
+    try:
+        server.drop_connections()
+        assert wait_for(lambda: feed.connects >= 2 and server.client_count() == 1)
+        server.push("ETH-USD", 2600.0)
+        assert wait_for(lambda: feed.latest("ETH-USD") is not None)
+        assert feed.get_price("ETH-USD") == 2600.0
+        assert server.connections >= 2
+    finally:
+        feed.stop()
+
+
+def test_stale_stream_falls_back_to_rest(server):
+    calls = []
+    feed = make_feed(server, calls, stale_after=0.3)
+    try:
+        server.push("ETH-USD", 2500.0)
+        assert wait_for(lambda: feed.latest("ETH-USD") is not None)
+        server.silent = True
+        assert wait_for(lambda: not feed.is_fresh("ETH-USD"))
+
+        assert feed.get_price("ETH-USD") == 1234.5
+        assert calls == ["ETH-USD"]
+        assert feed.fallbacks == 1
+        # A silent stream counts as dead and is reconnected
+        assert wait_for(lambda: feed.connects >= 2)
+    finally:
+        feed.stop()
+
+
+def test_no_fallback_raises_when_stale(server):
+    feed = TickerFeed(["ETH-USD"], url=server.url, fallback=None)
+    feed.start()
+    try:
+        with pytest.raises(RuntimeError):
+            feed.get_price("ETH-USD")
+    finally:
+        feed.stop()
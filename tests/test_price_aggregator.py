@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from price_aggregator import PriceAggregator
+from standins import FakePriceServer
+from transport import Transport
+
+
+@pytest.fixture
+def server():
+    server = FakePriceServer({"ETH-USD": 2500.0}).start()
+    yield server
+    server.stop()
+
+
+def aggregator(server, **kwargs):
+    return PriceAggregator(server.sources(Transport()), **kwargs)
+
+
+def test_median_drops_an_outlier(server):
+    server.offsets["book"] = 0.05
+    prices = aggregator(server, mode="median")
+    try:
+        assert prices.get_price("ETH-USD") == pytest.approx(2500.0)
+        stats = prices.stats()["sources"]
+        assert stats["book"]["outliers"] == 1
+        assert stats["spot"]["wins"] == stats["ticker"]["wins"] == 1
+    finally:
+        prices.close()
+
+
+def test_first_mode_does_not_wait_for_a_slow_source(server):
+    server.delays["spot"] = 1.0
+    prices = aggregator(server, timeout=3.0)
+    try:
+        start = time.perf_counter()
+        assert prices.get_price("ETH-USD") == pytest.approx(2500.0)
+        assert time.perf_counter() - start < 0.9
+    finally:
+        prices.close()
+
+
+def test_slow_source_is_demoted_to_hedge(server):
+    server.delays["spot"] = 0.3
+    prices = aggregator(server, timeout=1.0, probe_every=0)
+    try:
+        for _ in range(3):
+            prices.get_price("ETH-USD")
+        time.sleep(0.4)                    # let the slow answers land
+        leaders, hedges = prices.ranked()
+        assert [s.name for s in hedges] == ["spot"]
+        assert "spot" not in [s.name for s in leaders]
+    finally:
+        prices.close()
+
+
+def test_failing_and_stale_sources_are_skipped(server):
+    server.failing.add("spot")
+    server.ages["ticker"] = 60
+    # Median mode waits for every answer, so all three are counted
+    prices = aggregator(server, mode="median")
+    try:
+        assert prices.get_price("ETH-USD") == pytest.approx(2500.0)
+        stats = prices.stats()["sources"]
+        assert stats["book"]["wins"] == 1
+        assert stats["spot"]["errors"] == 1
+        assert stats["ticker"]["stale"] == 1
+    finally:
+        prices.close()
+
+
+def test_no_usable_source_raises(server):
+    server.failing.update(FakePriceServer.ENDPOINTS)
+    prices = aggregator(server, timeout=1.0)
+    try:
+        with pytest.raises(RuntimeError):
+            prices.get_price("ETH-USD")
+        assert prices.failures == 1
+    finally:
+        prices.close()
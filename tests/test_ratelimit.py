@@ -0,0 +1,111 @@
+import pytest
+
+from ratelimit import (
+    CLOSED,
+    CRITICAL,
+    HALF_OPEN,
+    LOW,
+    NORMAL,
+    OPEN,
+    CircuitOpenError,
+    RateLimitedError,
+    RateLimiter,
+)
+
+HOST = "api.coinbase.com"
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _taken(limiter, priority):
+    # Calls this priority gets through before the bucket would make it wait
+    n = 0
+    while True:
+        try:
+            limiter.acquire("test.host", "e", priority=priority, max_wait=0)
+        except RateLimitedError:
+            return n
+        n += 1
+
+
+def test_priorities_leave_headroom():
+    limiter = RateLimiter(endpoint_limits={"e": (1, 10)}, clock=Clock())
+    # Burst 10: LOW must leave 4 tokens, NORMAL 2, CRITICAL none
+    assert _taken(limiter, LOW) == 6
+    assert _taken(limiter, NORMAL) == 2
+    assert _taken(limiter, CRITICAL) == 2
+    assert limiter.rejected == 3
+
+
+def test_breaker_opens_half_opens_and_closes():
+    clock = Clock()
+    limiter = RateLimiter(failure_threshold=3, reset_timeout=10.0, clock=clock)
+    for _ in range(3):
+        limiter.record(HOST, ok=False)
+    assert limiter.state(HOST) == OPEN
+    assert limiter.retry_in(HOST) == 10.0
+    with pytest.raises(CircuitOpenError):
+        limiter.acquire(HOST, "accounts")
+
+    # One probe after the timeout; a failed probe re-opens for twice as long
+    clock.now += 10.0
+    limiter.acquire(HOST, "accounts")
+    assert limiter.state(HOST) == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        limiter.acquire(HOST, "accounts")
+    limiter.record(HOST, ok=False)
+    assert limiter.state(HOST) == OPEN
+    assert limiter.retry_in(HOST) == 20.0
+
+    clock.now += 19.0
+    with pytest.raises(CircuitOpenError):
+        limiter.acquire(HOST, "accounts")
+    clock.now += 1.0
+    limiter.acquire(HOST, "accounts")
+    limiter.record(HOST, ok=True)
+    assert limiter.state(HOST) == CLOSED
+    assert limiter.retry_in(HOST) == 0.0
+
+    # Closing resets the timeout back to reset_timeout
+    for _ in range(3):
+        limiter.record(HOST, ok=False)
+    assert limiter.retry_in(HOST) == 10.0
+    assert limiter.stats()["breakers"][HOST]["trips"] == 3
+
+
+def test_critical_calls_pass_an_open_breaker():
+    limiter = RateLimiter(failure_threshold=1, clock=Clock())
+    limiter.record(HOST, ok=False)
+    assert limiter.state(HOST) == OPEN
+
+    assert limiter.acquire(HOST, "order_create") == 0.0
+    assert limiter.acquire(HOST, "order_status") == 0.0
+    with pytest.raises(CircuitOpenError):
+        limiter.acquire(HOST, "orders")
+    assert limiter.stats()["breakers"][HOST]["shed"] == 1
+
+
+def test_retry_after_pauses_the_next_acquire():
+    clock = Clock()
+    limiter = RateLimiter(clock=clock)
+    limiter.acquire(HOST, "order_create")
+    limiter.record(HOST, ok=False, retry_after=2.0)
+
+    with pytest.raises(RateLimitedError):
+        limiter.acquire(HOST, "order_create", max_wait=1.0)
+    assert clock.sleeps == []
+
+    assert limiter.acquire(HOST, "order_create") == 2.0
+    assert clock.sleeps == [2.0]
+    assert limiter.stats()["hosts"][HOST]["waits"] == 1
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+from replay import compare_decisions, replay, write_decisions
+
+
+def _series(n=1500, seed=3):
+    rng = np.random.default_rng(seed)
+    prices = 2000.0 * np.exp(np.cumsum(rng.normal(0, 0.003, n)))
+    timestamps = 1_700_000_000.0 + np.arange(n) * 15.0
+    return timestamps, prices
+
+
+def test_same_input_same_decisions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    timestamps, prices = _series()
+
+    first = replay(timestamps, prices, fee_rate=0.006)
+    path = str(tmp_path / "decisions.csv")
+    write_decisions(first["decisions"], path)
+    second = replay(timestamps, prices, fee_rate=0.006)
+
+    assert len(first["decisions"]) > 1000
+    assert compare_decisions(second["decisions"], path) == []
+    assert first["orders"] == second["orders"]
+    assert first["balances"] == second["balances"]
+    # Nothing but the decisions file: replay opens no state on disk
+    assert os.listdir(tmp_path) == ["decisions.csv"]
+
+
+def test_different_input_is_reported(tmp_path):
+    timestamps, prices = _series()
+    path = str(tmp_path / "decisions.csv")
+    write_decisions(replay(timestamps, prices)["decisions"], path)
+
+    prices = prices.copy()
+    prices[700] *= 0.97
+    diffs = compare_decisions(replay(timestamps, prices)["decisions"], path)
+    assert diffs and diffs[0][0] > 0
@@ -0,0 +1,109 @@
+import pytest
+
+from risk import ASSET_BLOCKED, BUFFER_BLOCKED, EXPOSURE_BLOCKED, TOTAL_PENDING, TOTAL_VALUE, PortfolioRisk
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def book(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "risk.bin")
+    books = []
+
+    def open_book(**kwargs):
+        books.append(PortfolioRisk(path, clock=clock, **kwargs))
+        return books[-1]
+
+    yield open_book, clock
+    for b in books:
+        b.close()
+
+
+def test_reserve_is_seen_by_another_instance(book):
+    open_book, _ = book
+    eth_bot, runner = open_book(), open_book(asset_limits={"XRP": 9.35})
+    eth_bot.sync({"USD": 100.0, "ETH": 0.0})
+    eth_bot.on_price("ETH", 2000.0)
+
+    # Exposure cap is min(30% of 100, 25) = 25
+    assert eth_bot.reserve("ETH", 20.0) == (True, "OK to buy")
+    assert runner.snapshot()["pending"] == 20.0
+    assert runner.check("XRP", 10.0) == (False, EXPOSURE_BLOCKED)
+    assert runner.check("XRP", 5.0) == (True, "OK to buy")
+
+    runner.release("ETH")
+    assert eth_bot.snapshot()["pending"] == 0.0
+    assert runner.check("XRP", 9.0) == (True, "OK to buy")
+    assert runner.check("XRP", 9.5) == (False, ASSET_BLOCKED)
+
+
+def test_buffer_limit_counts_pending_buys(book):
+    open_book, _ = book
+    risk = open_book()
+    risk.sync({"USD": 3.5})
+    # Buffer is max(1, 8% of 3.5) = 1; exposure cap is max(3, 30% of 3.5) = 3
+    assert risk.reserve("ETH", 2.0) == (True, "OK to buy")
+    assert risk.check("XRP", 1.0) == (False, BUFFER_BLOCKED)
+    assert risk.check("XRP", 0.5) == (True, "OK to buy")
+
+
+def test_buy_fill_releases_value_and_fees(book):
+    open_book, _ = book
+    risk = open_book()
+    risk.sync({"USD": 100.0, "ETH": 0.0})
+    risk.on_price("ETH", 2000.0)
+    risk.reserve("ETH", 20.0)
+
+    risk.on_fill("ETH", "BUY", 0.00995, 2000.0, fees=0.1)
+    snap = risk.snapshot()
+    assert snap["pending"] == pytest.approx(0.0, abs=1e-12)
+    assert snap["cash"] == pytest.approx(80.0)
+    assert snap["exposure"] == pytest.approx(19.9)
+    assert snap["assets"]["ETH"]["qty"] == 0.00995
+
+    risk.on_fill("ETH", "SELL", 0.00995, 2010.0, fees=0.1)
+    snap = risk.snapshot()
+    assert snap["exposure"] == 0.0
+    assert snap["cash"] == pytest.approx(80.0 + 0.00995 * 2010.0 - 0.1)
+
+
+def test_holds_expire_after_the_ttl(book):
+    open_book, clock = book
+    risk = open_book(reserve_ttl=120.0)
+    risk.sync({"USD": 100.0})
+    risk.reserve("ETH", 20.0)
+
+    clock.now += 119
+    assert risk.check("ETH", 10.0) == (False, EXPOSURE_BLOCKED)
+    clock.now += 2
+    assert risk.check("ETH", 10.0) == (True, "OK to buy")
+    assert risk.snapshot()["pending"] == 0.0
+    assert risk.stats()["expired"] == 1
+
+
+def test_sync_re_sums_the_totals(book):
+    open_book, _ = book
+    eth_bot, runner = open_book(), open_book()
+    eth_bot.on_price("ETH", 2000.0)
+    runner.on_price("XRP", 0.5)
+    runner.sync({"USD": 50.0})
+    assert runner.reserve("XRP", 1.0) == (True, "OK to buy")
+
+    # Knock the running totals off, as a crashed writer could leave them
+    with eth_bot._locked():
+        eth_bot._set(TOTAL_VALUE, 1234.0)
+        eth_bot._set(TOTAL_PENDING, -7.0)
+
+    eth_bot.sync({"USD": 50.0, "ETH": 0.01, "XRP": 10.0})
+    snap = runner.snapshot()
+    assert snap["cash"] == 50.0
+    assert snap["exposure"] == 0.01 * 2000.0 + 10.0 * 0.5
+    assert snap["pending"] == 1.0
+    assert snap["assets"]["XRP"]["qty"] == 10.0
@@ -0,0 +1,39 @@
+import asyncio
+import threading
+
+from scheduler import EventScheduler
+
+
+def test_wait_async_holds_no_executor_thread():
+    # More waiting strategies than default executor workers: every one is
+    # woken by a price on the feed thread, and to_thread calls still run
+    async def main():
+        schedulers = [EventScheduler(min_interval=0.0) for _ in range(64)]
+        for s in schedulers:
+            s.arm("ETH-USD", 2000.0, 0.0, -0.01, 0.01)
+        waits = [asyncio.create_task(s.wait_async("ETH-USD", 10.0)) for s in schedulers]
+        await asyncio.sleep(0.05)
+
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), 1.0) == "free"
+        feed = threading.Thread(target=lambda: [s.on_price("ETH-USD", 1970.0) for s in schedulers])
+        feed.start()
+        reasons = await asyncio.wait_for(asyncio.gather(*waits), 2.0)
+        feed.join()
+        return schedulers, reasons
+
+    schedulers, reasons = asyncio.run(main())
+    assert reasons == ["trigger"] * 64
+    assert all(not s._watch("ETH-USD").waiters for s in schedulers)
+
+
+def test_wait_async_wake_and_timeout():
+    async def main():
+        s = EventScheduler()
+        waiting = asyncio.create_task(s.wait_async("ETH-USD", 10.0, triggers=False))
+        await asyncio.sleep(0.01)
+        threading.Thread(target=s.wake, args=("ETH-USD",)).start()
+        return await asyncio.wait_for(waiting, 2.0), await s.wait_async("ETH-USD", 0.01), s
+
+    woke, timed_out, s = asyncio.run(main())
+    assert (woke, timed_out) == ("wake", "timeout")
+    assert (s.wakes, s.timeouts) == (1, 1)
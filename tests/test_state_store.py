@@ -0,0 +1,57 @@
+from indicators import EMAState
+from state_store import StateStore
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = StateStore(path)
+    store.put("trades", {"last_buy_time": 1.5, "last_buy_price": None, "total_wins": 3})
+    store.put("indicators", {"ema": 2000.125, "engine": [0.001, -0.002]})
+    store.put("trades", {"last_buy_time": 2.5, "last_buy_price": 1999.75, "total_wins": 4})
+    store.close()
+
+    saved = StateStore(path).load()
+    # Latest put per key wins; floats survive exactly
+    assert saved["trades"] == {"last_buy_time": 2.5, "last_buy_price": 1999.75, "total_wins": 4}
+    assert saved["indicators"] == {"ema": 2000.125, "engine": [0.001, -0.002]}
+    assert saved["trades.updated"] > 0
+
+
+def test_put_is_written_behind(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = StateStore(path, flush_interval=60)
+    store.put("trades", {"total_wins": 1})
+    assert store.stats()["pending"] == 1
+    assert StateStore(path).load() == {}
+
+    store.flush()
+    assert StateStore(path).load()["trades"] == {"total_wins": 1}
+    store.close()
+
+
+def test_bot_warm_restart(tmp_path, monkeypatch):
+    import eth_bot_backup as bot
+
+    monkeypatch.setattr(bot, "STATE", StateStore(str(tmp_path / "state.db")))
+    monkeypatch.setattr(bot, "ENGINE", bot.UnifiedVarianceEngine())
+    monkeypatch.setattr(bot, "last_buy_time", 1_700_000_000.0)
+    monkeypatch.setattr(bot, "last_buy_price", 2001.5)
+    monkeypatch.setattr(bot, "TOTAL_WINS", 7)
+    ema = EMAState(bot.WINDOW)
+    ema.seed([2000.0 + i for i in range(40)])
+    for v in (0.001, -0.003, 0.002):
+        bot.ENGINE.update(v, 0.0)
+    bot.save_trade_state()
+    bot.save_indicator_state(ema)
+    bot.STATE.close()
+
+    monkeypatch.setattr(bot, "STATE", StateStore(str(tmp_path / "state.db")))
+    monkeypatch.setattr(bot, "ENGINE", bot.UnifiedVarianceEngine())
+    monkeypatch.setattr(bot, "last_buy_price", None)
+    monkeypatch.setattr(bot, "TOTAL_WINS", 0)
+    restored = EMAState(bot.WINDOW)
+    assert bot.restore_state(restored).startswith("Restored state")
+
+    assert restored.get_state() == ema.get_state()
+    assert bot.ENGINE.get_state() == [0.001, -0.003, 0.002]
+    assert (bot.last_buy_price, bot.TOTAL_WINS) == (2001.5, 7)
@@ -0,0 +1,117 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from strategy import UnifiedVarianceEngine, batch_thresholds
+
+
+class DequeEngine:
+    # The original deque-based UnifiedVarianceEngine.update, kept verbatim
+    # as the reference the ring engine must match bit for bit
+    def __init__(self, base_buy=-0.0065, base_sell=0.0075, window=12, buy_multiplier=14,
+                 sell_multiplier=12, buy_clamp=(-0.012, -0.005), sell_clamp=(0.006, 0.014)):
+        self.base_buy = base_buy
+        self.base_sell = base_sell
+        self.buy_multiplier = buy_multiplier
+        self.sell_multiplier = sell_multiplier
+        self.buy_clamp_min, self.buy_clamp_max = buy_clamp
+        self.sell_clamp_min, self.sell_clamp_max = sell_clamp
+        self.recent_variances = deque(maxlen=window)
+
+    def clamp(self, value, min_v, max_v):
+        return max(min_v, min(value, max_v))
+
+    def get_direction(self):
+        if len(self.recent_variances) < 4:
+            return "flat"
+        last = self.recent_variances[-1]
+        prev = self.recent_variances[-4]
+        if last > prev:
+            return "rising"
+        elif last < prev:
+            return "shrinking"
+        return "flat"
+
+    def update(self, current_variance, current_exposure_pct):
+        self.recent_variances.append(current_variance)
+        if len(self.recent_variances) < 3:
+            return self.base_buy, self.base_sell
+
+        avg_var = sum(abs(v) for v in self.recent_variances) / len(self.recent_variances)
+        buy_var = self.base_buy * (1 + avg_var * self.buy_multiplier)
+        sell_var = self.base_sell * (1 + avg_var * self.sell_multiplier)
+
+        direction = self.get_direction()
+        if direction == "rising":
+            buy_var *= 1.20
+            sell_var *= 0.80
+        elif direction == "shrinking":
+            buy_var *= 0.80
+            sell_var *= 1.20
+
+        buy_var *= (1 + current_exposure_pct)
+        buy_var = self.clamp(buy_var, self.buy_clamp_min, self.buy_clamp_max)
+        sell_var = self.clamp(sell_var, self.sell_clamp_min, self.sell_clamp_max)
+        return buy_var, sell_var
+
+
+def _series(n=5000, seed=11):
+    rng = np.random.default_rng(seed)
+    # Mixed scales so the window sums round differently from a running sum
+    variance = rng.normal(0, 0.004, n) * rng.choice([0.1, 1.0, 7.0], n)
+    exposure = rng.uniform(0, 0.6, n)
+    return variance, exposure
+
+
+@pytest.mark.parametrize("window", [12, 20, 3])
+def test_update_matches_the_deque_engine_exactly(window):
+    variance, exposure = _series()
+    ring = UnifiedVarianceEngine(window=window)
+    reference = DequeEngine(window=window)
+
+    for i, (v, e) in enumerate(zip(variance.tolist(), exposure.tolist())):
+        assert ring.update(v, e) == reference.update(v, e), i
+    assert ring.get_state() == list(reference.recent_variances)
+
+
+def test_batched_paths_match_update_exactly():
+    variance, exposure = _series()
+    ring = UnifiedVarianceEngine()
+    expected = [ring.update(v, e) for v, e in zip(variance.tolist(), exposure.tolist())]
+    buy = np.array([b for b, _ in expected])
+    sell = np.array([s for _, s in expected])
+
+    engine = UnifiedVarianceEngine()
+    first = engine.update_many(variance[:1234], exposure[:1234])
+    rest = engine.update_many(variance[1234:], exposure[1234:])
+    assert np.array_equal(np.concatenate((first[0], rest[0])), buy)
+    assert np.array_equal(np.concatenate((first[1], rest[1])), sell)
+    assert engine.get_state() == ring.get_state()
+
+    buys, sells = batch_thresholds([UnifiedVarianceEngine(), UnifiedVarianceEngine()], variance, exposure)
+    assert np.array_equal(buys[1], buy) and np.array_equal(sells[0], sell)
+
+    _, matrix_sell = UnifiedVarianceEngine().threshold_matrix(np.stack([variance, variance]))
+    assert np.array_equal(matrix_sell[1], sell)
+
+
+def test_non_finite_variances_are_skipped_the_same_everywhere():
+    variance, exposure = _series(200)
+    variance[[1, 20, 21, 90]] = [np.nan, np.nan, np.inf, -np.inf]
+
+    stream = UnifiedVarianceEngine()
+    expected = [stream.update(v, e) for v, e in zip(variance.tolist(), exposure.tolist())]
+    # A skipped tick reads the window as it stands
+    assert expected[20][1] == expected[19][1]
+
+    batch = UnifiedVarianceEngine()
+    buy, sell = batch.update_many(variance, exposure)
+    assert np.array_equal(buy, [b for b, _ in expected])
+    assert np.array_equal(sell, [s for _, s in expected])
+    assert batch.get_state() == stream.get_state()
+    assert len(stream) == 12 and stream._count == 196
+
+    rows = np.stack([variance, np.where(np.isfinite(variance), variance, 0.001)])
+    _, matrix_sell = UnifiedVarianceEngine().threshold_matrix(rows)
+    assert np.array_equal(matrix_sell[0], sell)
@@ -0,0 +1,218 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ratelimit import RateLimiter, sdk_endpoint
+
+# ==========================
+# SHARED HTTP TRANSPORT
+# ==========================
+#
+# One pooled requests.Session for every outbound call (spot price, Discord
+# webhooks, Coinbase REST). Each call gets connect/read timeouts for its
+# endpoint class, transient failures are retried with jittered exponential
+# backoff, and latency/error counters are kept per host.
+#
+# Every attempt (retries included) first passes the process-wide
+# RateLimiter: token buckets per host and endpoint class, order placement
+# ahead of polling, and a per-host circuit breaker (see ratelimit.py).
+
+TIMEOUTS = {
+    "default": (3.05, 10),
+    "price": (2, 3),
+    "webhook": (3.05, 10),
+    "orders": (3.05, 10),
+    "order_create": (3.05, 15),
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+COINBASE_HOST = "api.coinbase.com"
+
+
+class HostStats:
+    __slots__ = ("requests", "errors", "retries", "total_latency", "max_latency", "last_error")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.last_error = None
+
+    def as_dict(self):
+        avg = self.total_latency / self.requests if self.requests else 0.0
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency_ms": avg * 1000,
+            "max_latency_ms": self.max_latency * 1000,
+            "last_error": self.last_error,
+        }
+
+
+class Transport:
+    def __init__(self, pool_size=10, retries=3, backoff_base=0.25, backoff_max=8.0, timeouts=None, limiter=None):
+        # limiter: ratelimit.RateLimiter (None = no client-side limits)
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeouts = dict(TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.limiter = limiter
+
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    # --------------------------
+    # Plain HTTP
+    # --------------------------
+
+    def request(self, method, url, endpoint="default", retry=True, **kwargs):
+        kwargs.setdefault("timeout", self.timeout(endpoint))
+        host = urlsplit(url).netloc
+        return self._with_retries(host, endpoint, None, retry, self.session.request, method, url, **kwargs)
+
+    def get(self, url, endpoint="default", **kwargs):
+        return self.request("GET", url, endpoint=endpoint, **kwargs)
+
+    def post(self, url, endpoint="default", **kwargs):
+        return self.request("POST", url, endpoint=endpoint, **kwargs)
+
+    # --------------------------
+    # SDK calls (RESTClient)
+    # --------------------------
+
+    def attach(self, client, endpoint="orders"):
+        # Route a coinbase RESTClient through the pooled session
+        client.session = self.session
+        client.timeout = self.timeout(endpoint)[1]
+        return client
+
+    def call(self, host, fn, *args, retry=True, endpoint=None, priority=None, **kwargs):
+        # Times/retries an SDK call such as client.list_orders(...). Only pass
+        # retry=True for idempotent calls (reads, or orders with a
+        # client_order_id the exchange de-duplicates on). The endpoint class
+        # (rate limits, priority) follows from the method name by default.
+        endpoint = endpoint or sdk_endpoint(fn)
+        return self._with_retries(host, endpoint, priority, retry, fn, *args, **kwargs)
+
+    # --------------------------
+    # Stats / config
+    # --------------------------
+
+    def timeout(self, endpoint):
+        return self.timeouts.get(endpoint, self.timeouts["default"])
+
+    def host_stats(self):
+        with self._lock:
+            return {host: s.as_dict() for host, s in self._hosts.items()}
+
+    def retry_in(self, host):
+        # Seconds until the host's circuit breaker lets normal calls through
+        return self.limiter.retry_in(host) if self.limiter is not None else 0.0
+
+    def backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    # --------------------------
+    # Internals
+    # --------------------------
+
+    def _stats(self, host):
+        with self._lock:
+            stats = self._hosts.get(host)
+            if stats is None:
+                stats = self._hosts[host] = HostStats()
+            return stats
+
+    def _with_retries(self, host, endpoint, priority, retry, fn, *args, **kwargs):
+        stats = self._stats(host)
+        attempts = self.retries + 1 if retry else 1
+
+        for attempt in range(attempts):
+            if self.limiter is not None:
+                self.limiter.acquire(host, endpoint, priority)
+            start = time.perf_counter()
+            error = None
+            retry_after = None
+            try:
+                result = fn(*args, **kwargs)
+                status = getattr(result, "status_code", None)
+                if status in RETRY_STATUSES:
+                    error = f"HTTP {status}"
+                    retry_after = _retry_after(result)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                result = None
+                error = e
+            except requests.HTTPError as e:
+                status = getattr(e.response, "status_code", None)
+                if status not in RETRY_STATUSES:
+                    self._record(stats, time.perf_counter() - start, e, host)
+                    raise
+                result = None
+                error = e
+                retry_after = _retry_after(e.response)
+            except Exception as e:
+                self._record(stats, time.perf_counter() - start, e, host)
+                raise
+
+            self._record(stats, time.perf_counter() - start, error, host, transient=True, retry_after=retry_after)
+
+            if error is None:
+                return result
+
+            if attempt + 1 >= attempts:
+                if result is not None:
+                    return result
+                raise error if isinstance(error, Exception) else requests.HTTPError(error)
+
+            with self._lock:
+                stats.retries += 1
+            # With a limiter, Retry-After has paused the host bucket and the
+            # next acquire() waits it out; sleeping here as well would wait twice
+            if retry_after is None or self.limiter is None:
+                time.sleep(self.backoff_delay(attempt, retry_after))
+
+    def _record(self, stats, elapsed, error, host, transient=False, retry_after=None):
+        # Only transient errors count against the circuit breaker: a 400 or
+        # an SDK exception still means the host answered
+        if self.limiter is not None:
+            failed = transient and error is not None
+            self.limiter.record(host, ok=not failed, retry_after=retry_after if failed else None)
+        with self._lock:
+            stats.requests += 1
+            stats.total_latency += elapsed
+            if elapsed > stats.max_latency:
+                stats.max_latency = elapsed
+            if error is not None:
+                stats.errors += 1
+                stats.last_error = str(error)
+
+
+def _retry_after(response):
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+TRANSPORT = Transport(limiter=RateLimiter())